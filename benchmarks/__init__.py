@@ -0,0 +1 @@
+"""Load benchmarks of the homework bot against local stand-in servers."""
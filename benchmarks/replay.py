@@ -0,0 +1,49 @@
+"""Replay a recorded log through the processing stages of the bot.
+
+Measures the CPU throughput of parse_homeworks/parse_status processing
+without any network and checks that the messages match the recorded
+ones; exits with status 1 if some chat differs.
+
+Example::
+
+    RECORD_FILE=traffic.jsonl python homework.py
+    python -m benchmarks.replay traffic.jsonl
+"""
+import argparse
+import json
+import logging
+import sys
+
+import homework
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('log', help='file written with RECORD_FILE')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    parser.add_argument('--verbose', action='store_true',
+                        help='keep the INFO logs of the bot')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    """Replay the log and print the report."""
+    args = parse_args(argv)
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO)
+    else:
+        homework.logger.setLevel(logging.WARNING)
+    report = homework.replay(args.log)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        for key, value in report.items():
+            print(f'{key:>20}: {value}')
+    if report['mismatched_chats']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
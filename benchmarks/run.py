@@ -0,0 +1,174 @@
+"""Drive the bot with N tenants against local stand-in servers.
+
+Reports API polls per second, p50/p99 notification latency (from a
+status change on the Practicum stand-in to its arrival at the Telegram
+stand-in) and peak memory of the bot process. The stand-ins run in a
+separate process so they do not compete with the bot for the GIL.
+
+Example::
+
+    python -m benchmarks.run --tenants 1000 --duration 30
+        --api-latency 0.05 --api-error-rate 0.01 --telegram-429-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import urllib.request
+
+import homework
+from benchmarks import stubs
+from homework_bot.engine import Tenant
+from homework_bot.quota import RequestQuota
+from homework_bot.scheduler import AdaptivePolicy
+from homework_bot.storage import StateStore
+
+PATCHED_SETTINGS = (
+    'ENDPOINT', 'TELEGRAM_API_URL', 'TELEGRAM_TOKEN', 'POLL_CONCURRENCY',
+    'TELEGRAM_GLOBAL_RATE', 'http_client', 'api_quota', 'recorder',
+    'RECORD_FILE', 'TELEGRAM_COMMANDS',
+)
+
+
+def run_stubs(args: argparse.Namespace, ports: multiprocessing.Queue) -> None:
+    """Serve both stand-ins and report their ports (child process)."""
+    world = stubs.World(args.tenants, args.change_interval, args.seed)
+    practicum = stubs.serve(stubs.PracticumHandler, world, stubs.Faults(
+        args.api_latency, args.api_error_rate, args.api_429_rate
+    ))
+    telegram = stubs.serve(stubs.TelegramHandler, world, stubs.Faults(
+        args.telegram_latency, args.telegram_error_rate,
+        args.telegram_429_rate
+    ))
+    ports.put((practicum.server_address[1], telegram.server_address[1]))
+    while True:
+        time.sleep(1)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--change-interval', type=float, default=5,
+                        help='seconds between status changes of a homework')
+    parser.add_argument('--interval', type=float, default=2,
+                        help='base polling interval of the bot')
+    parser.add_argument('--reviewing-interval', type=float, default=0.5)
+    parser.add_argument('--telegram-rate', type=float, default=1000,
+                        help='global message rate limit of the bot')
+    parser.add_argument('--api-rate', type=float, default=10000,
+                        help='Practicum API budget, requests/s, both global '
+                             'and per token')
+    parser.add_argument('--api-latency', type=float, default=0.02)
+    parser.add_argument('--api-error-rate', type=float, default=0)
+    parser.add_argument('--api-429-rate', type=float, default=0)
+    parser.add_argument('--telegram-latency', type=float, default=0.01)
+    parser.add_argument('--telegram-error-rate', type=float, default=0)
+    parser.add_argument('--telegram-429-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', metavar='FILE',
+                        help='record the traffic for benchmarks.replay')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    parser.add_argument('--verbose', action='store_true',
+                        help='keep the INFO logs of the bot')
+    return parser.parse_args(argv)
+
+
+async def drive(args: argparse.Namespace, store: StateStore) -> None:
+    """Run the bot for the benchmark duration."""
+    tenants = [Tenant(f'token-{i}', str(i)) for i in range(args.tenants)]
+    policy = AdaptivePolicy(
+        interval=args.interval,
+        reviewing_interval=args.reviewing_interval,
+        error_interval=args.interval,
+        max_interval=args.interval * 4,
+    )
+    bot = homework.init_bot()
+    try:
+        await asyncio.wait_for(
+            homework.run_bot(bot, tenants, store, policy), args.duration
+        )
+    except asyncio.TimeoutError:
+        pass
+
+
+def benchmark(args: argparse.Namespace) -> dict:
+    """Run the benchmark and return the report."""
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=run_stubs, args=(args, ports), daemon=True
+    )
+    server.start()
+    practicum_port, telegram_port = ports.get(timeout=10)
+    saved = {name: getattr(homework, name) for name in PATCHED_SETTINGS}
+    try:
+        homework.ENDPOINT = (
+            f'http://127.0.0.1:{practicum_port}'
+            f'/api/user_api/homework_statuses/'
+        )
+        homework.TELEGRAM_API_URL = f'http://127.0.0.1:{telegram_port}/bot'
+        homework.TELEGRAM_TOKEN = homework.TELEGRAM_TOKEN or '1234:bench'
+        homework.POLL_CONCURRENCY = args.concurrency
+        homework.TELEGRAM_COMMANDS = False
+        homework.TELEGRAM_GLOBAL_RATE = args.telegram_rate
+        homework.api_quota = RequestQuota(
+            args.api_rate, args.api_rate, args.api_rate
+        )
+        homework.init_http_client()
+        if args.record:
+            homework.RECORD_FILE = args.record
+            homework.init_recorder()
+        with tempfile.TemporaryDirectory() as directory:
+            store = StateStore(os.path.join(directory, 'state.sqlite3'))
+            started = time.monotonic()
+            asyncio.run(drive(args, store))
+            elapsed = time.monotonic() - started
+            store.close()
+        with urllib.request.urlopen(
+            f'http://127.0.0.1:{practicum_port}/stats'
+        ) as response:
+            report = json.load(response)
+    finally:
+        server.terminate()
+        if homework.http_client is not None:
+            homework.http_client.close()
+        if args.record and homework.recorder is not None:
+            homework.recorder.close()
+        for name, value in saved.items():
+            setattr(homework, name, value)
+    report['tenants'] = args.tenants
+    report['duration'] = round(elapsed, 2)
+    report['polls_per_second'] = round(report['api_requests'] / elapsed, 1)
+    report['max_rss_mb'] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+    return report
+
+
+def main(argv=None) -> None:
+    """Run the benchmark and print the report."""
+    args = parse_args(argv)
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO)
+    else:
+        homework.logger.setLevel(logging.WARNING)
+    report = benchmark(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        if isinstance(value, float) and key.startswith('latency'):
+            value = f'{value * 1000:.0f} ms'
+        print(f'{key:>20}: {value}')
+
+
+if __name__ == '__main__':
+    main()
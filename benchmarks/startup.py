@@ -0,0 +1,94 @@
+"""Measure how long ``import homework`` takes in a fresh interpreter.
+
+Short-lived invocations pay the import on every run, so the import has a
+time budget and must not load the HTTP and Telegram clients, which are
+imported on first use. Exits with status 1 when the median import time
+exceeds the budget or a deferred module got loaded.
+
+Example::
+
+    python -m benchmarks.startup --runs 10 --budget 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budget for the median cumulative import time of homework, milliseconds
+IMPORT_BUDGET_MS = 150
+
+# Submodules executed only once their package is really loaded
+DEFERRED_MODULES = ('requests.adapters', 'telegram.bot', 'http.server')
+
+PROBE = (
+    'import sys, json, homework; '
+    'print(json.dumps(sorted(sys.modules)))'
+)
+
+
+def measure_once() -> Tuple[float, List[str]]:
+    """Import time of homework in milliseconds and the loaded modules."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    import_ms = None
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == 'homework':
+            import_ms = int(fields[1]) / 1000
+    if import_ms is None:
+        raise RuntimeError('В выводе -X importtime нет модуля homework')
+    return import_ms, json.loads(result.stdout)
+
+
+def measure(runs: int) -> Dict:
+    """Import time statistics over ``runs`` fresh interpreters."""
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        import_ms, modules = measure_once()
+        times.append(import_ms)
+        loaded.update(name for name in modules if name in DEFERRED_MODULES)
+    return {
+        'runs': runs,
+        'import_ms_median': round(statistics.median(times), 1),
+        'import_ms_min': round(min(times), 1),
+        'import_ms_max': round(max(times), 1),
+        'deferred_loaded': sorted(loaded),
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5,
+                        help='fresh interpreters to measure')
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_MS,
+                        help='budget for the median import time, ms')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    """Measure the import time and check it against the budget."""
+    args = parse_args(argv)
+    report = measure(args.runs)
+    report['budget_ms'] = args.budget
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f'{key:>20}: {value}')
+    if report['import_ms_median'] > args.budget or report['deferred_loaded']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""Local stand-ins for the Practicum API and the Telegram Bot API.
+
+Both servers share a World: tenant ``i`` has token ``token-i``, chat
+``i`` and one homework ``hw-i`` whose status cycles through STATUS_CYCLE
+every ``change_interval`` seconds. The Telegram stand-in matches every
+received notification with the status change it reports and records the
+notification latency.
+
+Run standalone with ``python -m benchmarks.stubs``.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+STATUS_CYCLE = ('reviewing', 'rejected', 'reviewing', 'approved')
+VERDICTS = {
+    'Работа взята на проверку ревьюером.': 'reviewing',
+    'Работа проверена: у ревьюера есть замечания.': 'rejected',
+    'Работа проверена: ревьюеру всё понравилось. Ура!': 'approved',
+}
+NOTIFICATION = re.compile(r'"hw-(\d+)"\. (.+)')
+
+
+class World:
+    """Homework statuses of all tenants and the received notifications.
+
+    Args:
+        tenants (int): number of tenants
+        change_interval (float): seconds between status changes
+        seed (int): seed of the random generator
+
+    """
+
+    def __init__(self, tenants: int, change_interval: float = 5,
+                 seed: int = 0) -> None:
+        rng = random.Random(seed)
+        self.started = time.time()
+        self.change_interval = change_interval
+        self.offsets = [
+            self.started + rng.random() * change_interval
+            for _ in range(tenants)
+        ]
+        self.lock = threading.Lock()
+        self.api_requests = 0
+        self.api_errors = 0
+        self.api_throttled = 0
+        self.messages = 0
+        self.notifications = 0
+        self.telegram_throttled = 0
+        self.latencies: List[float] = []
+
+    def status(self, index: int, now: float) -> Optional[Tuple[str, float]]:
+        """Current status of tenant homework and when it was set."""
+        step = math.floor((now - self.offsets[index]) / self.change_interval)
+        if step < 0:
+            return None
+        changed_at = self.offsets[index] + step * self.change_interval
+        return STATUS_CYCLE[step % len(STATUS_CYCLE)], changed_at
+
+    def changed_at(self, index: int, status: str,
+                   now: float) -> Optional[float]:
+        """Time of the latest change of tenant homework to the status."""
+        step = math.floor((now - self.offsets[index]) / self.change_interval)
+        for candidate in range(step, max(step - len(STATUS_CYCLE), -1), -1):
+            if STATUS_CYCLE[candidate % len(STATUS_CYCLE)] == status:
+                return self.offsets[index] + candidate * self.change_interval
+        return None
+
+    def record_message(self, text: str, now: float) -> None:
+        """Match notifications of a message with status changes."""
+        with self.lock:
+            self.messages += 1
+            for line in text.split('\n\n'):
+                match = NOTIFICATION.search(line)
+                if match is None or match.group(2) not in VERDICTS:
+                    continue
+                changed_at = self.changed_at(
+                    int(match.group(1)), VERDICTS[match.group(2)], now
+                )
+                self.notifications += 1
+                if changed_at is not None:
+                    self.latencies.append(now - changed_at)
+
+    def stats(self) -> Dict[str, object]:
+        """Counters and notification latency percentiles."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                'api_requests': self.api_requests,
+                'api_errors': self.api_errors,
+                'api_throttled': self.api_throttled,
+                'messages': self.messages,
+                'notifications': self.notifications,
+                'telegram_throttled': self.telegram_throttled,
+                'latency_p50': percentile(latencies, 50),
+                'latency_p99': percentile(latencies, 99),
+            }
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """Percentile of sorted values, None for an empty list."""
+    if not values:
+        return None
+    index = min(len(values) - 1, math.ceil(percent / 100 * len(values)) - 1)
+    return values[max(index, 0)]
+
+
+class Faults:
+    """Latency and failures injected by a stand-in server.
+
+    Args:
+        latency (float): seconds added to every response
+        error_rate (float): share of requests answered with HTTP 500
+        throttle_rate (float): share of requests answered with HTTP 429
+        retry_after (int): Retry-After of throttled responses, seconds
+
+    """
+
+    def __init__(self, latency: float = 0, error_rate: float = 0,
+                 throttle_rate: float = 0, retry_after: int = 1) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+    def pick(self) -> Optional[int]:
+        """Sleep for the latency and choose an injected error code."""
+        if self.latency:
+            time.sleep(self.latency)
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Keep-alive JSON handler shared by both stand-ins."""
+
+    protocol_version = 'HTTP/1.1'
+    world: World
+    faults: Faults
+
+    def reply(self, code: int, data: object,
+              headers: Optional[Dict[str, str]] = None) -> None:
+        """Send JSON response."""
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        """Do not log every request."""
+
+
+class PracticumHandler(StubHandler):
+    """``GET /api/user_api/homework_statuses/?from_date=...``."""
+
+    def do_GET(self) -> None:
+        """Answer with homeworks changed since ``from_date``."""
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self.reply(200, self.world.stats())
+            return
+        world = self.world
+        with world.lock:
+            world.api_requests += 1
+        fault = self.faults.pick()
+        if fault == 429:
+            with world.lock:
+                world.api_throttled += 1
+            self.reply(429, {'code': 'throttled'},
+                       {'Retry-After': str(self.faults.retry_after)})
+            return
+        if fault:
+            with world.lock:
+                world.api_errors += 1
+            self.reply(fault, {'code': 'internal_error'})
+            return
+        token = self.headers.get('Authorization', '').split('token-')[-1]
+        from_date = int(parse_qs(url.query).get('from_date', ['0'])[0])
+        now = time.time()
+        homeworks = []
+        current = None
+        if token.isdigit():
+            current = world.status(int(token), now)
+        if current is not None and current[1] >= from_date:
+            homeworks.append({
+                'id': int(token),
+                'homework_name': f'hw-{token}',
+                'status': current[0],
+                'date_updated': time.strftime(
+                    '%Y-%m-%dT%H:%M:%SZ', time.gmtime(current[1])
+                ),
+            })
+        self.reply(200, {'homeworks': homeworks, 'current_date': int(now)})
+
+
+class TelegramHandler(StubHandler):
+    """``POST /bot<token>/sendMessage`` and friends."""
+
+    def do_POST(self) -> None:
+        """Accept a message unless a fault is injected."""
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        fault = self.faults.pick()
+        if fault == 429:
+            with self.world.lock:
+                self.world.telegram_throttled += 1
+            retry_after = self.faults.retry_after
+            self.reply(429, {
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            })
+            return
+        if fault:
+            self.reply(fault, {
+                'ok': False, 'error_code': fault,
+                'description': 'Internal Server Error',
+            })
+            return
+        if self.path.endswith('/sendMessage'):
+            self.world.record_message(payload.get('text', ''), time.time())
+        chat_id = payload.get('chat_id', 0)
+        self.reply(200, {'ok': True, 'result': {
+            'message_id': 1, 'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': payload.get('text', ''),
+        }})
+
+
+def serve(handler: type, world: World, faults: Faults,
+          port: int = 0) -> ThreadingHTTPServer:
+    """Start a stand-in server in a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer: running server, ``server_address`` has the
+        chosen port
+
+    """
+    handler = type(handler.__name__, (handler,), {
+        'world': world, 'faults': faults
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    """Run both stand-ins until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--change-interval', type=float, default=5)
+    parser.add_argument('--practicum-port', type=int, default=8001)
+    parser.add_argument('--telegram-port', type=int, default=8002)
+    args = parser.parse_args()
+    world = World(args.tenants, args.change_interval)
+    serve(PracticumHandler, world, Faults(), args.practicum_port)
+    serve(TelegramHandler, world, Faults(), args.telegram_port)
+    print(f'Practicum: http://127.0.0.1:{args.practicum_port}'
+          f'/api/user_api/homework_statuses/')
+    print(f'Telegram: http://127.0.0.1:{args.telegram_port}/bot')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
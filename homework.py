@@ -1,26 +1,116 @@
-import requests
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
 import time
 import os
-import telegram
+import socket
+import sys
 import logging
-from telegram import Bot
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from operator import attrgetter
 from dotenv import load_dotenv
 from http import HTTPStatus
-from typing import Union, List, Dict
+from typing import (
+    TYPE_CHECKING, Awaitable, Callable, Union, List, Dict, Optional, Tuple
+)
+
+from homework_bot.lazy import lazy_import
+from homework_bot.clock import SystemClock
+from homework_bot.commands import CommandListener, StatusCache
+from homework_bot.cursor import CursorManager
+from homework_bot.decoding import BodyDecoder, load_backend
+from homework_bot.delivery import DeliveryQueue
+from homework_bot.diff import diff_statuses
+from homework_bot.engine import PollingEngine, Tenant
+from homework_bot.model import (
+    STATUSES, Homework, HomeworkStatus, homework_list, parse_response
+)
+from homework_bot.pipeline import Pipeline, Stage
+from homework_bot.storage import Notification, StateStore, TenantState
+from homework_bot import breaker, logs, metrics, recording, scheduler
+from homework_bot.alerts import AlertThrottle, fingerprint
+from homework_bot.breaker import (
+    CircuitBreaker, CircuitOpenError, EndpointError, breaker_for
+)
+from homework_bot.lease import Lease
+from homework_bot.recording import Recorder, Transcript
+from homework_bot.sharding import HashRing, ShardCoordinator, WorkerRegistry
+from homework_bot.quota import (
+    RateLimitedError, RequestQuota, parse_retry_after
+)
+
+if TYPE_CHECKING:
+    from telegram import Bot
+    from homework_bot.client import HttpClient
+
+requests = lazy_import('requests')
+telegram = lazy_import('telegram')
 
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv('PRAKTIKUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('CHAT_ID')
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+STATE_DB = os.getenv('STATE_DB', 'bot_state.sqlite3')
+METRICS_PORT = os.getenv('METRICS_PORT')
+LOG_FILE = os.getenv('LOG_FILE', 'api_bot.log')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN')
+RECORD_FILE = os.getenv('RECORD_FILE')
+WORKER_ID = os.getenv('WORKER_ID')
+LEADER_LEASE = os.getenv('LEADER_LEASE', 'true').lower() != 'false'
+TELEGRAM_COMMANDS = os.getenv('TELEGRAM_COMMANDS', 'true').lower() != 'false'
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', 100))
+API_GLOBAL_RATE = float(os.getenv('API_GLOBAL_RATE', 20))
+API_TOKEN_RATE = float(os.getenv('API_TOKEN_RATE', 1 / 30))
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+CURSOR_OVERLAP = int(os.getenv('CURSOR_OVERLAP', 60))
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', 0))
+DIGEST_SIZE = int(os.getenv('DIGEST_SIZE', 10))
 
 RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+REVIEWING_RETRY_TIME = 60
+ERROR_RETRY_TIME = 60
+MAX_RETRY_TIME = 3600
+API_CONNECT_TIMEOUT = 3.05
+API_READ_TIMEOUT = 10
+API_DEADLINE = 30
+TELEGRAM_GLOBAL_RATE = 25
+TELEGRAM_CHAT_RATE = 1
+DELIVERY_WORKERS = 8
+PIPELINE_QUEUE_SIZE = 1000
+OUTBOX_RETENTION = 7 * 24 * 60 * 60
+BREAKER_FAILURES = 5
+BREAKER_RESET_TIME = 60
+ALERT_INTERVAL = 60 * 60
+API_TOKEN_BURST = 2
+COMMANDS_TIMEOUT = 30
+HEARTBEAT_INTERVAL = 5
+WORKER_TTL = 15
+LEASE_TTL = 10
+LEASE_RENEW_INTERVAL = 2
+LEASE_HOLDER = f'{socket.gethostname()}:{os.getpid()}'
+HISTORY_SIZE = 10
+API_RETRY_AFTER = 60
+DECODE_CACHE_SIZE = 1024
+MAX_CLOCK_SKEW = 300
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
 
-REVIEWING = 'reviewing'
-APPROVED = 'approved'
-REJECTED = 'rejected'
+REVIEWING = HomeworkStatus.REVIEWING
+APPROVED = HomeworkStatus.APPROVED
+REJECTED = HomeworkStatus.REJECTED
 
 HOMEWORK_STATUSES = {
     APPROVED: 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -28,6 +118,11 @@ HOMEWORK_STATUSES = {
     REJECTED: 'Работа проверена: у ревьюера есть замечания.'
 }
 
+COMMANDS_HELP = ('Команды бота:\n'
+                 '/status — текущие статусы работ\n'
+                 '/history — последние изменения статусов\n'
+                 '/check — проверить работы прямо сейчас')
+
 TOKENS = {
     'PRACTICUM_TOKEN': PRACTICUM_TOKEN,
     'TELEGRAM_TOKEN': TELEGRAM_TOKEN,
@@ -38,27 +133,82 @@ TOKENS = {
 def init_logger():
     """Initiating and creating instance of logger object.
 
+    Records are handed to a background thread writing them to LOG_FILE
+    (rotated by LOG_MAX_BYTES or LOG_ROTATE_WHEN, old files gzipped) and
+    to stderr, so logging never waits for disk I/O. LOG_FORMAT=json
+    switches both outputs to JSON lines. Called by main(), so importing
+    the module opens no files and starts no threads.
+
     Returns: logger object
 
     """
-    logging.basicConfig(
-        level=logging.DEBUG,
-        filename='api_bot.log',
-        format='%(asctime)s, %(levelname)s, %(message)s, %(name)s'
+    logs.setup_logging(
+        LOG_FILE,
+        json_format=LOG_FORMAT == 'json',
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        when=LOG_ROTATE_WHEN,
     )
-
     logger_init = logging.getLogger(__name__)
     logger_init.setLevel(logging.INFO)
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter(
-        '%(asctime)s %(levelname)s %(message)s'
-    )
-    handler.setFormatter(formatter)
-    logger_init.addHandler(handler)
     return logger_init
 
 
-logger = init_logger()
+logger = logging.getLogger(__name__)
+
+API_LATENCY = metrics.Histogram(
+    'homework_api_request_seconds', 'Duration of Practicum API requests'
+)
+SEND_LATENCY = metrics.Histogram(
+    'homework_send_message_seconds', 'Duration of Telegram sendMessage calls'
+)
+POLL_ERRORS = metrics.Counter(
+    'homework_poll_errors_total', 'Failed polls by error class', ['error']
+)
+MESSAGES_SENT = metrics.Counter(
+    'homework_messages_sent_total', 'Messages delivered by chat', ['chat_id']
+)
+API_CIRCUIT_OPEN = metrics.Gauge(
+    'homework_api_circuit_open', 'Whether the Practicum API circuit is open'
+)
+QUEUE_DEPTH = metrics.Gauge(
+    'homework_queue_depth', 'Items waiting in pipeline and delivery queues',
+    ['queue']
+)
+
+http_client: Optional[HttpClient] = None
+fetch_executor: Optional[ThreadPoolExecutor] = None
+json_decoder: Optional[BodyDecoder] = None
+recorder: Optional[Recorder] = None
+clock = SystemClock()
+status_cache = StatusCache(HISTORY_SIZE)
+alert_throttle = AlertThrottle(ALERT_INTERVAL, clock=clock.monotonic)
+api_quota = RequestQuota(
+    API_GLOBAL_RATE, API_TOKEN_RATE, API_TOKEN_BURST, clock=clock.monotonic
+)
+cursors = CursorManager(CURSOR_OVERLAP, MAX_CLOCK_SKEW, clock=clock.time)
+
+
+def set_clock(new_clock) -> None:
+    """Make the bot follow another clock, e.g. a VirtualClock.
+
+    Replaces alert_throttle, api_quota and cursors and moves the circuit
+    breaker of ENDPOINT to the new clock. run_bot has to be run by
+    ``new_clock.run`` so that its timers follow the clock too.
+
+    Args:
+        new_clock: SystemClock or VirtualClock
+
+    """
+    global clock, alert_throttle, api_quota, cursors
+    clock = new_clock
+    alert_throttle = AlertThrottle(ALERT_INTERVAL, clock=clock.monotonic)
+    api_quota = RequestQuota(
+        API_GLOBAL_RATE, API_TOKEN_RATE, API_TOKEN_BURST,
+        clock=clock.monotonic
+    )
+    cursors = CursorManager(CURSOR_OVERLAP, MAX_CLOCK_SKEW, clock=clock.time)
+    api_breaker().clock = clock.monotonic
 
 
 def send_message(bot: Bot, message: str) -> None:
@@ -75,13 +225,86 @@ def send_message(bot: Bot, message: str) -> None:
     Raises:
         Exception: An error occurred during sending message to telegram chat
 
+    """
+    send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_chat_message(bot: Bot, chat_id: Union[str, int],
+                      message: str) -> None:
+    """Sending message from bot to the given chat.
+
+    Args:
+        bot: class Bot(TelegramObject) instance
+        chat_id (str, int): telegram chat of the tenant
+        message (str): message to telegram chat
+
+    Returns:
+        None
+
+    Raises:
+        Exception: An error occurred during sending message to telegram chat
+
     """
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        with SEND_LATENCY.time():
+            bot.send_message(chat_id, message)
+        MESSAGES_SENT.inc(chat_id=chat_id)
+        if recorder is not None:
+            recorder.send(chat_id, message)
     except Exception as error:
         message = f'Ошибка при отправке сообщения: {error}'
         logger.error(message)
-        raise Exception(message)
+        raise Exception(message) from error
+
+
+def api_breaker() -> CircuitBreaker:
+    """Circuit breaker of ENDPOINT shared by all tenants."""
+    return breaker_for(
+        ENDPOINT, failure_threshold=BREAKER_FAILURES,
+        reset_timeout=BREAKER_RESET_TIME, clock=clock.monotonic
+    )
+
+
+def api_executor() -> ThreadPoolExecutor:
+    """Threads running API requests, created on first use.
+
+    Requests may block for API_DEADLINE seconds, so they do not share
+    the default executor with Telegram delivery, state flushes and the
+    lease.
+    """
+    global fetch_executor
+    if fetch_executor is None:
+        fetch_executor = ThreadPoolExecutor(
+            max_workers=POLL_CONCURRENCY, thread_name_prefix='fetch'
+        )
+    return fetch_executor
+
+
+def answer_decoder() -> BodyDecoder:
+    """Decoder of API answers, created with JSON_BACKEND on first use."""
+    global json_decoder
+    if json_decoder is None:
+        json_decoder = BodyDecoder(
+            load_backend(JSON_BACKEND)[1], cache_size=DECODE_CACHE_SIZE
+        )
+    return json_decoder
+
+
+def decode_answer(practicum_token: str, response) -> Dict:
+    """Decode the body of an API answer.
+
+    The body goes through answer_decoder, so an answer equal to the last
+    one of the token is not decoded again. Responses without a raw body
+    are decoded by their own json() method.
+
+    Raises:
+        ValueError: The body is not valid JSON
+
+    """
+    content = getattr(response, 'content', None)
+    if not isinstance(content, bytes):
+        return response.json()
+    return answer_decoder().decode(practicum_token, content)
 
 
 def get_api_answer(current_timestamp: int) -> Dict[str, Union[List, int]]:
@@ -97,17 +320,77 @@ def get_api_answer(current_timestamp: int) -> Dict[str, Union[List, int]]:
         Exception: An error occurred during api request
 
     """
-    timestamp = current_timestamp or int(time.time())
+    return request_homework_statuses(PRACTICUM_TOKEN, current_timestamp)
+
+
+def request_homework_statuses(
+        practicum_token: str,
+        current_timestamp: Optional[int]) -> Dict[str, Union[List, int]]:
+    """Requesting answer from api (ENDPOINT url) on behalf of a tenant.
+
+    Args:
+        practicum_token (str): OAuth token of the tenant
+        current_timestamp: (int): Unix timestamp
+
+    Returns:
+        dict: Result of api request to ENDPOINT
+
+    Raises:
+        Exception: An error occurred during api request
+        RateLimitedError: The API answered 429 Too Many Requests
+
+    Requests go through the pooled http_client once main() has created
+    it, and through a one-off requests.get call otherwise. Transport
+    errors and 5xx answers trip the circuit breaker shared by all
+    tenants (api_breaker); while it is open requests fail fast with
+    CircuitOpenError. A 429 answer blocks the token in api_quota for the
+    time given by Retry-After. Transport errors and 5xx answers, the
+    failures counted by the breaker, raise EndpointError. Bodies are
+    decoded by decode_answer.
+
+    """
+    if current_timestamp is None:
+        timestamp = int(clock.time())
+    else:
+        timestamp = current_timestamp
+    headers = {'Authorization': f'OAuth {practicum_token}'}
     params = {'from_date': timestamp}
-    try:
-        homework_status = requests.get(
-            ENDPOINT, headers=HEADERS, params=params
+    transport = http_client or requests
+    circuit = api_breaker()
+    if not circuit.allow():
+        raise CircuitOpenError(
+            f'Основное API недоступно, запрос к {ENDPOINT} не отправлен'
         )
+    try:
+        with API_LATENCY.time():
+            homework_status = transport.get(
+                ENDPOINT, headers=headers, params=params,
+                timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
+            )
     except Exception as error:
+        circuit.record_failure()
         message = (f'Ошибка при запросе к основному API. '
                    f'Описание ошибки {error}')
         logger.error(message)
-        raise Exception(message)
+        raise EndpointError(message) from error
+    if homework_status.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        circuit.record_failure()
+        message = (f'Ошибка при запросе к основному API. Эндпоинт {ENDPOINT}'
+                   f'вернул код {homework_status.status_code}')
+        logger.error(message)
+        raise EndpointError(message)
+    circuit.record_success()
+    if homework_status.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+        headers = getattr(homework_status, 'headers', None) or {}
+        retry_after = parse_retry_after(
+            headers.get('Retry-After'), default=API_RETRY_AFTER,
+            now=clock.time
+        )
+        api_quota.throttle(practicum_token, retry_after)
+        message = (f'Основное API ограничило частоту запросов, '
+                   f'следующий запрос через {retry_after:.0f} с')
+        logger.warning(message)
+        raise RateLimitedError(message, retry_after)
     if homework_status.status_code != HTTPStatus.OK:
         message = (f'Ошибка при запросе к основному API. Эндпоинт {ENDPOINT}'
                    f'вернул код {homework_status.status_code}, '
@@ -115,13 +398,13 @@ def get_api_answer(current_timestamp: int) -> Dict[str, Union[List, int]]:
         logger.error(message)
         raise Exception(message)
     try:
-        return homework_status.json()
+        return decode_answer(practicum_token, homework_status)
     except ValueError as error:
         message = (f'Ошибка при запросе к основному API. Эндпоинт {ENDPOINT}'
                    f'Не удалось привести API ответ к типу данных python.'
                    f'Описание ошибки {error}')
         logger.error(message)
-        raise ValueError(message)
+        raise ValueError(message) from error
 
 
 def check_response(response: Dict[str, Union[List, int]]) -> List[Dict]:
@@ -138,23 +421,43 @@ def check_response(response: Dict[str, Union[List, int]]) -> List[Dict]:
 
     """
     try:
-        response['homeworks']
-    except KeyError as error:
-        message = f'Ключ {error} не присутствует в словаре'
-        logger.error(message)
-        raise KeyError(message)
-    if not isinstance(response['homeworks'], list):
-        message = 'Ответ с домашними заданиями пришел не в виде списка'
-        logger.error(message)
-        raise TypeError(message)
-    return response['homeworks']
+        return homework_list(response)
+    except (KeyError, TypeError) as error:
+        logger.error(error.args[0])
+        raise
+
+
+def parse_homeworks(response: Dict[str, Union[List, int]]) -> List[Homework]:
+    """Check response and every homework in it in a single pass.
+
+    Used by the pipeline in place of check_response followed by
+    parse_status of every homework.
 
+    Args:
+        response (dict): response from api request (function get_api_answer)
+
+    Returns:
+        list: Homework records of available homeworks
+
+    Raises:
+        KeyError: A key is missing or a status is unknown
+        TypeError: The response or a homework has a wrong type
 
-def parse_status(homework: Dict[str, Union[str, int]]) -> str:
+    """
+    try:
+        return parse_response(response)
+    except (KeyError, TypeError) as error:
+        logger.error(error.args[0])
+        raise
+
+
+def parse_status(homework: Union[Homework, Dict[str, Union[str, int]]]
+                 ) -> str:
     """Parse status from homework.
 
     Args:
-        homework (dict): information about homework (name, status and so on)
+        homework (Homework, dict): information about homework (name,
+            status and so on), a dict is validated first
 
     Returns:
         str: Message for user
@@ -164,16 +467,14 @@ def parse_status(homework: Dict[str, Union[str, int]]) -> str:
         Exception: Another error occurred during parsing status
 
     """
-    homework_name = homework.get('homework_name')
-    homework_status = homework.get('status')
-    try:
-        verdict = HOMEWORK_STATUSES[homework_status]
-        return f'Изменился статус проверки работы "{homework_name}". {verdict}'
-    except KeyError:
-        message = (f'Ключ {homework_status} не присутствует '
-                   f'в словаре HOMEWORK_STATUSES')
-        logger.error(message)
-        raise KeyError(message)
+    if not isinstance(homework, Homework):
+        try:
+            homework = Homework.from_dict(homework)
+        except (KeyError, TypeError) as error:
+            logger.error(error.args[0])
+            raise
+    verdict = HOMEWORK_STATUSES[homework.status]
+    return f'Изменился статус проверки работы "{homework.name}". {verdict}'
 
 
 def check_tokens() -> bool:
@@ -186,60 +487,1132 @@ def check_tokens() -> bool:
     return all([TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, PRACTICUM_TOKEN])
 
 
-def main():
+def notification_key(tenant: Tenant, homework: Homework,
+                     transition: int = 0) -> str:
+    """Idempotency key of a status change notification.
+
+    Without ``date_updated`` a status the homework returns to (X -> Y ->
+    X) would repeat the key of its first notification, so the number of
+    the transition takes the place of the update time.
+
+    Args:
+        tenant (Tenant): notified tenant
+        homework (Homework): homework with the new status
+        transition (int): number of the status change of the homework
+
+    Returns:
+        str: key unique for the tenant, homework, status and update time
+
+    """
+    event = (
+        f'{tenant.key}:{homework.key}:{homework.status.value}:'
+        f'{homework.date_updated}'
+    )
+    if homework.date_updated is None:
+        event += f':{transition}'
+    return hashlib.sha1(event.encode()).hexdigest()
+
+
+def load_tenants(path: Optional[str] = None) -> List[Tenant]:
+    """Load tenants served by the bot.
+
+    Tenants are read from the JSON file ``path`` (TENANTS_FILE by
+    default), a list of objects with ``practicum_token`` and ``chat_id``
+    keys. Without the file the bot serves the single tenant given by
+    PRACTICUM_TOKEN and TELEGRAM_CHAT_ID.
+
+    Returns:
+        list: tenants to poll
+
+    """
+    path = path or TENANTS_FILE
+    if not path:
+        return [Tenant(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)]
+    with open(path, encoding='utf-8') as file:
+        return [
+            Tenant(item['practicum_token'], str(item['chat_id']))
+            for item in json.load(file)
+        ]
+
+
+@dataclass
+class PollJob:
+    """Single poll of a tenant travelling through the pipeline stages."""
+
+    tenant: Tenant
+    state: TenantState
+    done: Optional[asyncio.Future] = None
+    response: Optional[Dict] = None
+    changed: List[Homework] = field(default_factory=list)
+    notifications: List[Notification] = field(default_factory=list)
+    outcome: Optional[str] = None
+    requested_at: float = 0.0
+
+    def finish(self, outcome: str) -> None:
+        """Set outcome of the poll and wake up whoever waits for it."""
+        self.outcome = outcome
+        if self.done is not None and not self.done.done():
+            self.done.set_result(outcome)
+
+
+def fetch_homeworks(job: PollJob) -> PollJob:
+    """Fetch stage: request api answer - request_homework_statuses.
+
+    Blocking, runs in the default executor. The request window starts
+    CURSOR_OVERLAP seconds before the cursor of the tenant (see
+    CursorManager). Answers and errors are written to the recorder when
+    recording is on.
+    """
+    tenant = job.tenant
+    timestamp = cursors.window(job.state.current_timestamp)
+    job.requested_at = clock.time()
+    try:
+        job.response = request_homework_statuses(
+            tenant.practicum_token, timestamp
+        )
+    except Exception as error:
+        if recorder is not None:
+            recorder.api(tenant.key, tenant.chat_id, timestamp, error=error)
+        raise
+    if recorder is not None:
+        recorder.api(
+            tenant.key, tenant.chat_id, timestamp, response=job.response
+        )
+    return job
+
+
+def validate_homeworks(job: PollJob) -> PollJob:
+    """Validate stage: check answer - parse_homeworks function.
+
+    Also finds homeworks whose status changed since the last poll
+    - diff_statuses function, and refreshes status_cache. Entries
+    repeated by the overlap of request windows are recognised by their
+    update time.
+    """
+    homeworks = parse_homeworks(job.response)
+    key = attrgetter('key')
+    status_cache.update(job.tenant.key, homeworks, key, clock.time())
+    job.changed = diff_statuses(
+        job.state.statuses, homeworks, key, attrgetter('status'),
+        updated=job.state.updated, date=attrgetter('date_updated')
+    )
+    return job
+
+
+def render_messages(job: PollJob) -> PollJob:
+    """Render stage: message for each changed homework - parse_status.
+
+    Homeworks were validated by parse_homeworks, so rendering cannot
+    fail; the tenant state (statuses and cursor) is updated together
+    with the poll outcome.
+    """
+    tenant = job.tenant
+    state = job.state
+    now = clock.time()
+    for homework in job.changed:
+        transition = state.transitions.get(homework.key, 0) + 1
+        state.transitions[homework.key] = transition
+        job.notifications.append(Notification(
+            notification_key(tenant, homework, transition), tenant.chat_id,
+            parse_status(homework)
+        ))
+        state.statuses[homework.key] = homework.status.value
+        state.names[homework.key] = homework.name
+        if homework.date_updated is None:
+            state.updated.pop(homework.key, None)
+        else:
+            state.updated[homework.key] = str(homework.date_updated)
+        status_cache.record_change(tenant.key, homework, now)
+    if not job.changed:
+        logger.debug('В ответе нет новых статусов')
+    state.current_timestamp = cursors.advance(
+        state.current_timestamp, job.response, job.requested_at
+    )
+    if REVIEWING in state.statuses.values():
+        job.outcome = scheduler.REVIEWING
+    elif job.changed:
+        job.outcome = scheduler.CHANGED
+    else:
+        job.outcome = scheduler.IDLE
+    return job
+
+
+def commit_notifications(store: StateStore, job: PollJob) -> None:
+    """Deliver stage: write notifications to the outbox.
+
+    They are committed together with the new tenant state and sent once
+    committed (see StateStore.autoflush), so a crash cannot lose a status
+    change. Delivery is at-least-once: a message sent just before a
+    crash, whose delivery mark was not flushed yet, is sent again from
+    the outbox after the restart.
+    """
+    store.checkpoint(
+        job.tenant.key, job.state, notifications=job.notifications
+    )
+    for notification in job.notifications:
+        logger.info(
+            f'Бот поставил в очередь сообщение: "{notification.text}"'
+        )
+    job.finish(job.outcome)
+
+
+def queue_messages(delivery: DeliveryQueue, job: PollJob) -> None:
+    """Queue one message per status change straight for delivery."""
+    for notification in job.notifications:
+        delivery.put(notification.chat_id, notification.text)
+        logger.info(
+            f'Бот поставил в очередь сообщение: "{notification.text}"'
+        )
+
+
+def report_error(delivery: DeliveryQueue, job: PollJob,
+                 error: Exception,
+                 throttle: Optional[AlertThrottle] = None) -> None:
+    """Tell the tenant about a failed poll.
+
+    Errors are compared by fingerprint: an alert of the same kind is sent
+    to a tenant at most once per ALERT_INTERVAL, and a repeated error is
+    reported as still unresolved. Failures of the API itself
+    (EndpointError) and polls skipped by an open circuit are not reported
+    to tenants, the outage is announced once by report_outage; neither
+    are rate limited polls, which are simply retried later. ``throttle``
+    replaces the global alert_throttle.
+    """
+    POLL_ERRORS.inc(error=type(error.__cause__ or error).__name__)
+    job.finish(scheduler.ERROR)
+    if isinstance(error, (EndpointError, CircuitOpenError,
+                          RateLimitedError)):
+        logger.debug(f'Опрос {job.tenant.key} пропущен: {error}')
+        return
+    state = job.state
+    error_fingerprint = fingerprint(error)
+    repeated = state.last_error == error_fingerprint
+    state.last_error = error_fingerprint
+    throttle = throttle or alert_throttle
+    if not throttle.allow(job.tenant.key, error_fingerprint):
+        logger.debug(f'Повторное оповещение о сбое подавлено: {error}')
+        return
+    if repeated:
+        message = (f'Ошибка {error} по-прежнему не решена. '
+                   f'Программу останавливаем')
+        logger.error(message)
+    else:
+        message = f'Сбой в работе программы: {error}'
+    delivery.put(job.tenant.chat_id, message)
+    logger.info(f'Бот поставил в очередь сообщение: "{message}"')
+
+
+def report_outage(delivery: DeliveryQueue, state: str) -> None:
+    """Tell the operator chat (TELEGRAM_CHAT_ID) about the API circuit.
+
+    Args:
+        delivery (DeliveryQueue): outbound message queue
+        state (str): new state of the circuit breaker
+
+    """
+    API_CIRCUIT_OPEN.set(int(state != breaker.CLOSED))
+    if state == breaker.OPEN:
+        message = ('Основное API недоступно, опрос приостановлен. '
+                   'Проверяем доступность раз в '
+                   f'{BREAKER_RESET_TIME} секунд')
+    elif state == breaker.CLOSED:
+        message = 'Основное API снова доступно, опрос возобновлен'
+    else:
+        return
+    logger.critical(message)
+    if TELEGRAM_CHAT_ID and alert_throttle.allow('operator', state):
+        delivery.put(TELEGRAM_CHAT_ID, message)
+
+
+async def poll_tenant(delivery: DeliveryQueue, tenant: Tenant,
+                      state: TenantState) -> str:
+    """Single polling cycle for a tenant running all stages in series.
+    1. Requesting api answer - fetch_homeworks function
+    2. Check answer and find changed homeworks - validate_homeworks
+    3. Parse status of changed homeworks - render_messages
+    4. Queueing one message per status change - queue_messages
+
+    Args:
+        delivery (DeliveryQueue): outbound message queue
+        tenant (Tenant): tenant to poll
+        state (TenantState): state of the tenant, updated in place
+
+    Returns:
+        str: outcome of the poll for the scheduler - REVIEWING while a
+        known homework is under review, CHANGED when a new status
+        arrived, IDLE when nothing changed and ERROR on failures
+
+    """
+    loop = asyncio.get_running_loop()
+    job = PollJob(tenant, state)
+    try:
+        await loop.run_in_executor(api_executor(), fetch_homeworks, job)
+        render_messages(validate_homeworks(job))
+        queue_messages(delivery, job)
+    except Exception as error:
+        report_error(delivery, job, error)
+    return job.outcome
+
+
+def describe_status(homework: Homework) -> str:
+    """Homework name with the verdict of its status."""
+    return f'"{homework.name}": {HOMEWORK_STATUSES[homework.status]}'
+
+
+def format_time(timestamp: float) -> str:
+    """Local date and time for command answers."""
+    return time.strftime('%d.%m.%Y %H:%M', time.localtime(timestamp))
+
+
+def status_report(tenant: Tenant, state: Optional[TenantState] = None,
+                  checked: Optional[bool] = None) -> str:
+    """Answer to /status and /check: known homeworks of the tenant.
+
+    status_cache only holds the homeworks of the recent polls, whose
+    from_date window leaves out homeworks reviewed long ago, so the
+    saved statuses of the tenant state come first and the cache
+    overrides them.
+
+    Args:
+        tenant (Tenant): tenant to describe
+        state (TenantState): saved state of the tenant, if any
+        checked (bool): whether the poll of /check succeeded, None for
+            /status
+
+    """
+    homeworks = {}
+    if state is not None:
+        for key, status in state.statuses.items():
+            homeworks[key] = Homework(
+                key, state.names.get(key, key), STATUSES[status]
+            )
+    for homework in status_cache.homeworks(tenant.key):
+        homeworks[homework.key] = homework
+    if not homeworks:
+        if checked:
+            return 'Работ на проверке пока нет'
+        if checked is None:
+            return 'Статусы работ пока не известны, отправьте /check'
+        return 'Статусы работ пока не известны'
+    lines = '\n'.join(
+        describe_status(homework) for homework in homeworks.values()
+    )
+    updated = status_cache.updated(tenant.key)
+    if updated is None:
+        return f'Последние известные статусы работ:\n{lines}'
+    return f'Статусы работ на {format_time(updated)}:\n{lines}'
+
+
+def history_report(tenant: Tenant) -> str:
+    """Answer to /history: recent status changes of the tenant."""
+    history = status_cache.history(tenant.key)
+    if not history:
+        return 'Статусы работ пока не менялись'
+    lines = '\n'.join(
+        f'{format_time(at)} {describe_status(homework)}'
+        for at, homework in history
+    )
+    return f'Последние изменения статусов:\n{lines}'
+
+
+async def handle_command(delivery: DeliveryQueue, engine: PollingEngine,
+                         tenants_by_chat: Dict[str, List[Tenant]],
+                         chat_id: str, command: str, args: str,
+                         states: Optional[Dict[str, TenantState]] = None
+                         ) -> None:
+    """Answer a bot command sent to a chat.
+
+    /status and /history are answered from status_cache and the saved
+    tenant states without requesting the API; /check polls the tenants
+    of the chat right away (PollingEngine.poll_now) and answers with
+    their statuses. Answers go through the delivery queue like
+    notifications, but are never held in a digest window.
+
+    Args:
+        delivery (DeliveryQueue): outbound message queue
+        engine (PollingEngine): engine polling the tenants
+        tenants_by_chat (dict): tenants served in each chat
+        chat_id (str): chat the command came from
+        command (str): command name without the slash
+        args (str): text after the command
+        states (dict): saved tenant states, see status_report
+
+    """
+    states = {} if states is None else states
+    tenants = tenants_by_chat.get(chat_id)
+    if not tenants:
+        delivery.put(
+            chat_id, 'Этот чат не подписан на статусы домашних работ',
+            immediate=True
+        )
+        return
+    prefix = ''
+    checked = None
+    if command == 'check':
+        outcomes = await asyncio.gather(
+            *(engine.poll_now(tenant.key) for tenant in tenants)
+        )
+        checked = None not in outcomes
+        if not checked:
+            prefix = ('Сейчас проверить не получилось, '
+                      'последние известные данные:\n\n')
+    if command in ('status', 'check'):
+        replies = [
+            status_report(tenant, states.get(tenant.key), checked)
+            for tenant in tenants
+        ]
+    elif command == 'history':
+        replies = [history_report(tenant) for tenant in tenants]
+    else:
+        replies = [COMMANDS_HELP]
+    delivery.put(chat_id, prefix + '\n\n'.join(replies), immediate=True)
+    logger.info(f'Бот ответил на команду /{command} в чате {chat_id}')
+
+
+def build_pipeline(delivery: DeliveryQueue, store: StateStore) -> Pipeline:
+    """Staged pipeline fetch -> validate -> render -> deliver.
+
+    Stages are connected by bounded queues and have their own workers:
+    POLL_CONCURRENCY blocking fetchers in api_executor, while
+    validation, rendering and committing to the outbox are cheap and run
+    in the event loop.
+
+    Args:
+        delivery (DeliveryQueue): outbound queue for error messages
+        store (StateStore): store holding the outbox
+
+    Returns:
+        Pipeline: pipeline processing PollJob objects
+
+    """
+    return Pipeline(
+        [
+            Stage('fetch', fetch_homeworks, workers=POLL_CONCURRENCY,
+                  maxsize=POLL_CONCURRENCY, blocking=True,
+                  executor=api_executor()),
+            Stage('validate', validate_homeworks, maxsize=PIPELINE_QUEUE_SIZE),
+            Stage('render', render_messages, maxsize=PIPELINE_QUEUE_SIZE),
+            Stage('deliver', partial(commit_notifications, store),
+                  maxsize=PIPELINE_QUEUE_SIZE),
+        ],
+        on_error=partial(report_error, delivery),
+    )
+
+
+async def submit_poll(pipeline: Pipeline, store: StateStore,
+                      states: Dict[str, TenantState], tenant: Tenant) -> str:
+    """Poll the tenant through the pipeline and queue its new state.
+
+    A tenant without saved state starts from the current server time.
+
+    Returns:
+        str: outcome of the poll for the scheduler
+
+    """
+    state = states.setdefault(tenant.key, TenantState(cursors.now()))
+    job = PollJob(
+        tenant, state, done=asyncio.get_running_loop().create_future()
+    )
+    await pipeline.put(job)
+    outcome = await job.done
+    store.checkpoint(tenant.key, state)
+    return outcome
+
+
+def init_http_client() -> HttpClient:
+    """Create the pooled client used by request_homework_statuses.
+
+    Returns:
+        HttpClient: client with POLL_CONCURRENCY pooled connections
+
+    """
+    from homework_bot.client import HttpClient
+
+    global http_client
+    http_client = HttpClient(
+        pool_size=POLL_CONCURRENCY,
+        connect_timeout=API_CONNECT_TIMEOUT,
+        read_timeout=API_READ_TIMEOUT,
+        deadline=API_DEADLINE,
+    )
+    return http_client
+
+
+def init_recorder() -> Recorder:
+    """Start recording API answers and sent messages to RECORD_FILE.
+
+    Returns:
+        Recorder: recorder used by fetch_homeworks and send_chat_message
+
+    """
+    global recorder
+    recorder = Recorder(RECORD_FILE, clock=clock.time)
+    return recorder
+
+
+REPLAYED_ERRORS = {
+    'CircuitOpenError': CircuitOpenError,
+    'EndpointError': EndpointError,
+    'RateLimitedError': lambda text: RateLimitedError(text, 0),
+    'ValueError': ValueError,
+}
+
+
+def replay(path: str) -> Dict[str, Union[int, float, List[str]]]:
+    """Feed a recorded log through the processing stages offline.
+
+    Recorded API answers go through validate_homeworks and
+    render_messages (parse_homeworks, diff_statuses, parse_status),
+    recorded errors through report_error with an alert throttle following
+    the recorded time. Nothing is requested or sent; the messages
+    produced are compared per chat with the recorded deliveries.
+    Recorded digests are compared without their header (see Transcript).
+    Messages that were still queued when recording stopped, resent from
+    the outbox of an earlier run or sent to the operator about outages
+    show up as mismatches.
+
+    Args:
+        path (str): log written with RECORD_FILE
+
+    Returns:
+        dict: number of polls and messages, processing time in seconds,
+        polls per second and chats whose messages differ
+
+    """
+    events = list(recording.read_events(path))
+    recorded_at = [0.0]
+    throttle = AlertThrottle(ALERT_INTERVAL, clock=lambda: recorded_at[0])
+    replayed = Transcript()
+    recorded = Transcript()
+    states: Dict[str, TenantState] = {}
+    polls = 0
+    started = time.perf_counter()
+    for event in events:
+        if event['kind'] == recording.SEND:
+            recorded.put(event['chat_id'], event['text'])
+            continue
+        polls += 1
+        recorded_at[0] = event['time']
+        tenant = Tenant(event['tenant'], event['chat_id'])
+        state = states.setdefault(
+            event['tenant'], TenantState(event['from_date'])
+        )
+        job = PollJob(tenant, state)
+        try:
+            if 'error' in event:
+                error_class = REPLAYED_ERRORS.get(
+                    event['error_type'], Exception
+                )
+                raise error_class(event['error'])
+            job.response = event['response']
+            queue_messages(replayed, render_messages(validate_homeworks(job)))
+        except Exception as error:
+            report_error(replayed, job, error, throttle)
+    elapsed = time.perf_counter() - started
+    chats = sorted(set(recorded.messages) | set(replayed.messages))
+    return {
+        'polls': polls,
+        'messages': len(replayed),
+        'seconds': round(elapsed, 3),
+        'polls_per_second': round(polls / elapsed, 1) if elapsed else 0,
+        'mismatched_chats': [
+            chat for chat in chats
+            if recorded.text(chat) != replayed.text(chat)
+        ],
+    }
+
+
+def init_bot() -> Bot:
+    """Create the Telegram bot with a connection per delivery worker.
+
+    One more connection is kept for long polling of bot commands.
+    TELEGRAM_API_URL replaces the official Bot API url when set.
+
+    Returns:
+        Bot: bot sending messages
+
+    """
+    from telegram.utils.request import Request
+
+    return telegram.Bot(
+        token=TELEGRAM_TOKEN, base_url=TELEGRAM_API_URL,
+        request=Request(con_pool_size=DELIVERY_WORKERS + 1)
+    )
+
+
+async def run_bot(bot: Bot, tenants: List[Tenant], store: StateStore,
+                  policy: Optional[scheduler.AdaptivePolicy] = None,
+                  lease: Optional[Lease] = None) -> None:
+    """Poll tenants and deliver notifications until cancelled.
+    Every tenant is polled with at most POLL_CONCURRENCY polls in
+    flight, each poll going through the stages of build_pipeline. By
+    default a tenant is polled every REVIEWING_RETRY_TIME while its
+    homework is under review; otherwise the delay starts at RETRY_TIME
+    (ERROR_RETRY_TIME after errors) and backs off up to MAX_RETRY_TIME.
+    Notifications are committed to the outbox of the store first and
+    then go through a delivery queue limited to TELEGRAM_GLOBAL_RATE
+    messages per second for the bot and TELEGRAM_CHAT_RATE per chat;
+    notifications left undelivered by a previous run are resent.
+    Unless TELEGRAM_COMMANDS is off, bot commands are received by long
+    polling and answered by handle_command. With WORKER_ID set the
+    process only polls its shard of the tenants (see serve_shard).
+
+    Args:
+        bot: class Bot(TelegramObject) instance
+        tenants (list): tenants to poll
+        store (StateStore): store of the tenant states
+        policy (AdaptivePolicy): overrides the default polling policy
+        lease (Lease): leader lease; messages are only sent while it is
+            held (see run_leader)
+
+    """
+    send = partial(send_chat_message, bot)
+    if lease is not None:
+        send = partial(send_as_leader, lease, send)
+    delivery = DeliveryQueue(
+        send, workers=DELIVERY_WORKERS,
+        global_rate=TELEGRAM_GLOBAL_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+        on_delivered=store.mark_delivered, on_dead=store.mark_failed,
+        clock=clock.monotonic, digest_window=DIGEST_WINDOW,
+        digest_size=DIGEST_SIZE
+    )
+    loop = asyncio.get_running_loop()
+    api_breaker().on_change = lambda state: loop.call_soon_threadsafe(
+        report_outage, delivery, state
+    )
+    states = store.load()
+    store.prune(clock.time() - OUTBOX_RETENTION)
+
+    def deliver(notification: Notification) -> None:
+        delivery.put(
+            notification.chat_id, notification.text, key=notification.key
+        )
+
+    if not WORKER_ID:
+        for notification in store.pending_notifications():
+            deliver(notification)
+    pipeline = build_pipeline(delivery, store)
+    for stage in pipeline.stages:
+        QUEUE_DEPTH.set_function(
+            lambda stage=stage: stage.stats()['queued'], queue=stage.name
+        )
+    QUEUE_DEPTH.set_function(partial(len, delivery), queue='delivery')
+
+    poll = partial(submit_poll, pipeline, store, states)
+    policy = policy or scheduler.AdaptivePolicy(
+        interval=RETRY_TIME,
+        reviewing_interval=REVIEWING_RETRY_TIME,
+        error_interval=ERROR_RETRY_TIME,
+        max_interval=MAX_RETRY_TIME,
+    )
+    engine = PollingEngine(
+        [] if WORKER_ID else tenants, poll, concurrency=POLL_CONCURRENCY,
+        scheduler=scheduler.AdaptiveScheduler(policy, clock=clock.monotonic),
+        quota=api_quota
+    )
+    services = [
+        engine.run(), pipeline.run(), delivery.run(),
+        store.autoflush(on_committed=deliver)
+    ]
+    tenants_by_chat = {}
+    for tenant in tenants:
+        tenants_by_chat.setdefault(str(tenant.chat_id), []).append(tenant)
+    handle = partial(
+        handle_command, delivery, engine, tenants_by_chat, states=states
+    )
+    if WORKER_ID:
+        services.append(serve_shard(
+            bot, engine, store, states, deliver, tenants, handle
+        ))
+    elif TELEGRAM_COMMANDS:
+        listener = CommandListener(
+            bot.get_updates, handle, timeout=COMMANDS_TIMEOUT
+        )
+        services.append(listener.run())
+    await asyncio.gather(*services)
+
+
+async def wait_for_quota(practicum_token: str) -> None:
+    """Wait until api_quota lets a request of the token through."""
+    wait = api_quota.try_acquire(practicum_token)
+    while wait:
+        await asyncio.sleep(wait)
+        wait = api_quota.try_acquire(practicum_token)
+
+
+async def send_outbox(delivery: DeliveryQueue, store: StateStore,
+                      tenants: List[Tenant]) -> None:
+    """Commit queued notifications and deliver the outbox of the tenants.
+
+    Notifications an earlier run left undelivered to the same chats are
+    sent as well; returns once everything is delivered or dropped and the
+    delivery marks are committed. The queue must not retry keyed
+    messages forever: dropped ones stay pending for the next run.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, store.flush)
+    store.take_committed()
+    chats = {str(tenant.chat_id) for tenant in tenants}
+    for notification in store.pending_notifications(chats):
+        delivery.put(
+            notification.chat_id, notification.text, key=notification.key
+        )
+    await delivery.join()
+    await loop.run_in_executor(None, store.flush)
+
+
+async def run_once(bot: Bot, tenants: List[Tenant],
+                   store: StateStore) -> Dict[str, int]:
+    """Poll every tenant once, deliver the notifications and return.
+
+    Serves the poll and batch commands run by an external scheduler.
+    Tenants are polled concurrently through the stages of build_pipeline
+    within api_quota. Once every state is committed, the notifications
+    are sent within the Telegram rate limits (see send_outbox).
+
+    Args:
+        bot: class Bot(TelegramObject) instance
+        tenants (list): tenants to poll
+        store (StateStore): store of the tenant states
+
+    Returns:
+        dict: number of polls by outcome
+
+    """
+    delivery = DeliveryQueue(
+        partial(send_chat_message, bot), workers=DELIVERY_WORKERS,
+        global_rate=TELEGRAM_GLOBAL_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+        on_delivered=store.mark_delivered, on_dead=store.mark_failed,
+        clock=clock.monotonic, digest_window=DIGEST_WINDOW,
+        digest_size=DIGEST_SIZE, retry_keyed=False
+    )
+    states = store.load(tenant.key for tenant in tenants)
+    pipeline = build_pipeline(delivery, store)
+
+    async def poll(tenant: Tenant) -> str:
+        await wait_for_quota(tenant.practicum_token)
+        return await submit_poll(pipeline, store, states, tenant)
+
+    services = [
+        asyncio.create_task(pipeline.run()),
+        asyncio.create_task(delivery.run()),
+    ]
+    try:
+        outcomes = await asyncio.gather(*(poll(tenant) for tenant in tenants))
+        await send_outbox(delivery, store, tenants)
+    finally:
+        for service in services:
+            service.cancel()
+        await asyncio.gather(*services, return_exceptions=True)
+    summary = {}
+    for outcome in outcomes:
+        summary[outcome] = summary.get(outcome, 0) + 1
+    return summary
+
+
+def history_summary(statuses: Dict[str, str],
+                    latest: Optional[Homework]) -> str:
+    """Message summing up the history loaded for a tenant.
+
+    Args:
+        statuses (dict): status of every homework by homework key
+        latest (Homework): most recently updated homework, if any
+
+    Returns:
+        str: number of homeworks by status and the latest verdict
+
+    """
+    if latest is None:
+        return 'История проверок загружена: работ пока нет'
+    counts = {status: 0 for status in HomeworkStatus}
+    for status in statuses.values():
+        counts[HomeworkStatus(status)] += 1
+    return (
+        f'История проверок загружена, работ: {len(statuses)}. '
+        f'Принято: {counts[APPROVED]}, '
+        f'с замечаниями: {counts[REJECTED]}, '
+        f'на проверке: {counts[REVIEWING]}.\n'
+        f'Последнее изменение: {describe_status(latest)}'
+    )
+
+
+def backfill_tenant(tenant: Tenant,
+                    since: int) -> Tuple[TenantState, str]:
+    """Request the history of a tenant since the timestamp.
+
+    Each homework entry of the answer is validated into a Homework
+    record and folded into the statuses of the new state, the latest
+    entry of each homework winning. No messages are rendered for
+    historic status changes. Blocking, run in the default executor.
+
+    Returns:
+        tuple: state of the tenant as of the answer and its summary
+        (see history_summary)
+
+    Raises:
+        Exception: The request failed or the answer is invalid
+
+    """
+    requested_at = clock.time()
+    response = request_homework_statuses(tenant.practicum_token, since)
+    answer_decoder().forget(tenant.practicum_token)
+    state = TenantState(cursors.advance(None, response, requested_at))
+    latest = None
+    for data in homework_list(response):
+        homework = Homework.from_dict(data)
+        if latest is None:
+            latest = homework
+        if homework.key in state.statuses:
+            continue
+        state.statuses[homework.key] = homework.status.value
+        state.names[homework.key] = homework.name
+        if homework.date_updated is not None:
+            state.updated[homework.key] = str(homework.date_updated)
+    return state, history_summary(state.statuses, latest)
+
+
+async def backfill(bot: Bot, tenants: List[Tenant], store: StateStore,
+                   since: int = 0) -> Dict[str, int]:
+    """Load the history of new tenants and send each of them a summary.
+
+    Tenants without saved state are requested from ``since`` (0 for the
+    whole history) with at most POLL_CONCURRENCY requests in flight
+    within api_quota. Each state is queued together with a single
+    summary notification (see history_summary) and flushed in batches,
+    so onboarding thousands of tenants keeps only the answers in flight
+    in memory. Tenants with saved state are already tracked and skipped.
+
+    Args:
+        bot: class Bot(TelegramObject) instance
+        tenants (list): tenants to onboard
+        store (StateStore): store of the tenant states
+        since (int): from_date of the history requests
+
+    Returns:
+        dict: number of tenants loaded, skipped and failed
+
+    """
+    delivery = DeliveryQueue(
+        partial(send_chat_message, bot), workers=DELIVERY_WORKERS,
+        global_rate=TELEGRAM_GLOBAL_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+        on_delivered=store.mark_delivered, on_dead=store.mark_failed,
+        clock=clock.monotonic, retry_keyed=False
+    )
+    loop = asyncio.get_running_loop()
+    known = store.load(tenant.key for tenant in tenants)
+    semaphore = asyncio.Semaphore(POLL_CONCURRENCY)
+
+    async def load(tenant: Tenant) -> str:
+        if tenant.key in known:
+            return 'skipped'
+        async with semaphore:
+            await wait_for_quota(tenant.practicum_token)
+            try:
+                state, text = await loop.run_in_executor(
+                    None, backfill_tenant, tenant, since
+                )
+            except Exception as error:
+                logger.error(f'История {tenant.key} не загружена: {error}')
+                return 'failed'
+        key = hashlib.sha1(f'{tenant.key}:backfill'.encode()).hexdigest()
+        store.checkpoint(tenant.key, state, notifications=[
+            Notification(key, tenant.chat_id, text)
+        ])
+        return 'loaded'
+
+    service = asyncio.create_task(delivery.run())
+    try:
+        results = await asyncio.gather(*(load(tenant) for tenant in tenants))
+        await send_outbox(delivery, store, tenants)
+    finally:
+        service.cancel()
+        await asyncio.gather(service, return_exceptions=True)
+    summary = {}
+    for result in results:
+        summary[result] = summary.get(result, 0) + 1
+    return summary
+
+
+def validate_tokens(tenants: List[Tenant]) -> Dict[str, bool]:
+    """Check the tokens against the Telegram and Practicum APIs.
+
+    TELEGRAM_TOKEN must authorize the bot, which must see the chat of
+    every tenant, and the Practicum token of every tenant must be
+    accepted by the API.
+
+    Args:
+        tenants (list): tenants whose tokens are checked
+
+    Returns:
+        dict: whether the check passed, by checked item
+
+    """
+    results = {}
+    bot = init_bot()
+    try:
+        bot.get_me()
+        results['TELEGRAM_TOKEN'] = True
+    except Exception as error:
+        logger.error(f'Токен Telegram не принят: {error}')
+        results['TELEGRAM_TOKEN'] = False
+    now = int(clock.time())
+    for tenant in tenants:
+        if results['TELEGRAM_TOKEN']:
+            try:
+                bot.get_chat(tenant.chat_id)
+                results[f'chat {tenant.chat_id}'] = True
+            except Exception as error:
+                logger.error(f'Чат {tenant.chat_id} недоступен: {error}')
+                results[f'chat {tenant.chat_id}'] = False
+        try:
+            request_homework_statuses(tenant.practicum_token, now)
+            results[f'practicum {tenant.key}'] = True
+        except Exception:
+            results[f'practicum {tenant.key}'] = False
+    return results
+
+
+def send_as_leader(lease: Lease, send: Callable[[str, str], None],
+                   chat_id: str, message: str) -> None:
+    """Send a message unless the leader lease was lost meanwhile.
+
+    Raises:
+        Exception: the lease is not held, the message stays in the outbox
+        for the new leader
+
+    """
+    if not lease.held():
+        raise Exception('Сообщение не отправлено: процесс больше не ведущий')
+    send(chat_id, message)
+
+
+async def run_leader(bot: Bot, tenants: List[Tenant], store: StateStore,
+                     holder: Optional[str] = None) -> None:
+    """Run the bot whenever this replica holds the leader lease.
+
+    Replicas sharing STATE_DB compete for a lease renewed every
+    LEASE_RENEW_INTERVAL seconds; the others stand by and take over
+    within LEASE_TTL seconds after the leader stops renewing it (at once
+    if it shuts down cleanly). A leader losing the lease stops run_bot,
+    sends nothing more and drops state it has not written yet; the new
+    leader starts from the saved state and resends undelivered
+    notifications of the outbox.
+
+    Args:
+        bot: class Bot(TelegramObject) instance
+        tenants (list): tenants to poll
+        store (StateStore): store of the tenant states
+        holder (str): id of the replica, LEASE_HOLDER by default
+
+    """
+    holder = holder or LEASE_HOLDER
+    lease = Lease(STATE_DB, 'leader', holder, ttl=LEASE_TTL, clock=clock.time)
+    store.fence = lease.held
+    try:
+        while True:
+            await lease.acquire(LEASE_RENEW_INTERVAL)
+            logger.info(f'Процесс {holder} стал ведущим')
+            leading = asyncio.create_task(
+                run_bot(bot, tenants, store, lease=lease)
+            )
+            keeping = asyncio.create_task(lease.keep(LEASE_RENEW_INTERVAL))
+            try:
+                await asyncio.wait(
+                    {leading, keeping}, return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                for task in (leading, keeping):
+                    task.cancel()
+                await asyncio.gather(
+                    leading, keeping, return_exceptions=True
+                )
+            if not leading.cancelled() and leading.exception():
+                raise leading.exception()
+            store.discard_queued()
+            logger.warning(f'Процесс {holder} больше не ведущий')
+    finally:
+        lease.release()
+        lease.close()
+
+
+async def serve_shard(bot: Bot, engine: PollingEngine, store: StateStore,
+                      states: Dict[str, TenantState],
+                      deliver: Callable[[Notification], None],
+                      tenants: List[Tenant],
+                      handle: Callable[[str, str, str], Awaitable]) -> None:
+    """Poll the shard of WORKER_ID among the workers sharing STATE_DB.
+
+    Chats are assigned to live workers by a consistent hash ring
+    (homework_bot.sharding), so all tenants of a chat and its delivery
+    rate limit stay in one process, and a joining or leaving worker only
+    moves its share of the chats. A worker taking chats over reloads
+    their saved state and resends their undelivered notifications; a
+    status change committed by both the old and the new owner is
+    ignored the second time thanks to the notification key. The first
+    worker on the ring receives bot commands and hands them over to the
+    owners of the chats.
+
+    Args:
+        bot: class Bot(TelegramObject) instance
+        engine (PollingEngine): engine polling the shard
+        store (StateStore): store of the tenant states
+        states (dict): tenant states used by the polls, updated in place
+        deliver: callable queueing a committed notification
+        tenants (list): tenants of all shards
+        handle: coroutine function answering a bot command
+
+    """
+    registry = WorkerRegistry(STATE_DB, clock=clock.time)
+    listener = None
+    commands = set()
+
+    def on_command(chat_id: str, name: str, args: str) -> None:
+        task = asyncio.create_task(handle(chat_id, name, args))
+        commands.add(task)
+        task.add_done_callback(commands.discard)
+
+    def rebalance(ring: HashRing) -> None:
+        nonlocal listener
+        owned = [
+            tenant for tenant in tenants
+            if coordinator.owns(str(tenant.chat_id))
+        ]
+        acquired = engine.set_tenants(owned)
+        states.update(store.load(tenant.key for tenant in acquired))
+        chats = {str(tenant.chat_id) for tenant in acquired}
+        for notification in store.pending_notifications(chats):
+            deliver(notification)
+        logger.info(
+            f'Процесс {WORKER_ID} опрашивает {len(owned)} клиентов '
+            f'из {len(tenants)}'
+        )
+        receiving = TELEGRAM_COMMANDS and ring.nodes[0] == WORKER_ID
+        if receiving and listener is None:
+            listener = asyncio.create_task(CommandListener(
+                bot.get_updates, coordinator.forward,
+                timeout=COMMANDS_TIMEOUT
+            ).run())
+        elif not receiving and listener is not None:
+            listener.cancel()
+            listener = None
+
+    coordinator = ShardCoordinator(
+        registry, WORKER_ID, rebalance, on_command,
+        interval=HEARTBEAT_INTERVAL, ttl=WORKER_TTL
+    )
+    try:
+        await coordinator.run()
+    finally:
+        if listener is not None:
+            listener.cancel()
+        registry.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line; without a command the bot runs forever."""
+    parser = argparse.ArgumentParser(
+        description='Telegram bot reporting Practicum homework statuses'
+    )
+    parser.set_defaults(file=None)
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('run', help='poll tenants until stopped (default)')
+    commands.add_parser('poll', help='poll the tenants once and exit')
+    batch = commands.add_parser(
+        'batch', help='poll the tenants of a file once and exit'
+    )
+    batch.add_argument('file', help='JSON file in the TENANTS_FILE format')
+    commands.add_parser(
+        'validate-tokens', help='check the tokens against the APIs and exit'
+    )
+    history = commands.add_parser(
+        'backfill', help='load the history of new tenants, send summaries'
+    )
+    history.add_argument('file', nargs='?',
+                         help='JSON file in the TENANTS_FILE format')
+    history.add_argument('--since', type=int, default=0,
+                         help='from_date of the requests (default 0)')
+    args = parser.parse_args(argv)
+    args.command = args.command or 'run'
+    return args
+
+
+def require_tokens(tenants_file: Optional[str]) -> None:
+    """Stop the program when environment variables it needs are missing.
+
+    Raises:
+        Exception: a token is missing
+
+    """
+    if check_tokens() or tenants_file and TELEGRAM_TOKEN:
+        return
+    result = [k for k, v in TOKENS.items() if v is None]
+    message = (f'Отсутствует обязательная переменная окружения: {result}.'
+               f'Программа остановлена')
+    logger.critical(message)
+    raise Exception(message)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
     """Main function of bot.
-    1. Requesting api answer - get_api_answer function
-    2. Check answer - check_response function
-    3. Parse status of homework - parse_status
-    4. Sending message to user if status was updated
+    The run command (the default) serves tenants from load_tenants until
+    stopped (see run_bot). Cursors and known statuses survive restarts in
+    the STATE_DB database. With METRICS_PORT set, metrics are served on
+    http://127.0.0.1:METRICS_PORT/metrics. With RECORD_FILE set, traffic
+    is recorded for replay. Unless LEADER_LEASE is off or WORKER_ID is
+    set, replicas run as a leader and hot standbys (see run_leader).
+
+    The poll command polls the tenants once (see run_once) and batch does
+    the same for the tenants of the given file, so an external scheduler
+    can run the bot instead of a resident process. validate-tokens checks
+    the tokens (see validate_tokens), backfill onboards new tenants with
+    their whole history (see backfill).
+
+    Args:
+        argv (list): command line arguments, sys.argv by default
 
     Returns:
-        None
+        int: exit status, 1 if a poll, a history request or a token
+        check failed
 
     Raises:
         Exception: An error occurred during main function
     """
-    if not check_tokens():
-        result = [k for k, v in TOKENS.items() if v is None]
-        message = (f'Отсутствует обязательная переменная окружения: {result}.'
-                   f'Программа остановлена')
-        logger.critical(message)
-        raise Exception(message)
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    last_error = {'error': None}
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            check_response_result = check_response(response)
-            if not check_response_result:
-                message = 'В данный момент работ на проверке нет. Отдыхай'
-                send_message(bot, message)
-                logger.debug('В ответе нет новых работ')
-                logger.info(f'Бот отправил сообщение: "{message}"')
-                current_timestamp = response.get('current_date')
-                continue
-            elif not response.get('status') == REVIEWING:
-                message = parse_status(check_response_result[0])
-                send_message(bot, message)
-                logger.info(f'Бот отправил сообщение: "{message}"')
-                current_timestamp = response.get('current_date')
-                continue
-        except Exception as error:
-            if last_error['error'] == error.args:
-                message = (f'Ошибка {error} по-прежнему не решена. '
-                           f'Программу останавливаем')
-                logger.error(message)
-                send_message(bot, message)
-            else:
-                last_error['error'] = error.args
-                message = f'Сбой в работе программы: {error}'
-                send_message(bot, message)
-                logger.info(f'Бот отправил сообщение: "{message}"')
-        finally:
-            time.sleep(RETRY_TIME)
+    args = parse_args(argv)
+    init_logger()
+    require_tokens(args.file or TENANTS_FILE)
+    tenants = load_tenants(args.file)
+    if args.command == 'validate-tokens':
+        results = validate_tokens(tenants)
+        for name, passed in results.items():
+            print(f'{name}: {"ok" if passed else "ошибка"}')
+        return int(not all(results.values()))
+    bot = init_bot()
+    init_http_client()
+    if RECORD_FILE:
+        init_recorder()
+    store = StateStore(STATE_DB, clock=clock.time)
+    try:
+        if args.command == 'backfill':
+            summary = clock.run(backfill(bot, tenants, store, args.since))
+            logger.info(f'Загрузка истории клиентов, итоги: {summary}')
+            return int('failed' in summary)
+        if args.command != 'run':
+            summary = clock.run(run_once(bot, tenants, store))
+            logger.info(f'Опрошено клиентов: {len(tenants)}, итоги: {summary}')
+            return int(scheduler.ERROR in summary)
+        if METRICS_PORT:
+            metrics.start_http_server(int(METRICS_PORT))
+        if LEADER_LEASE and not WORKER_ID:
+            clock.run(run_leader(bot, tenants, store))
+        else:
+            clock.run(run_bot(bot, tenants, store))
+    finally:
+        store.close()
+        if recorder is not None:
+            recorder.close()
+    return 0
 
 
 if __name__ == '__main__':
 
-    main()
+    sys.exit(main())
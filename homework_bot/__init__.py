@@ -0,0 +1 @@
+"""Infrastructure for running the homework bot for many tenants."""
@@ -0,0 +1,59 @@
+"""Error fingerprints and rate-limited alerting."""
+import hashlib
+import re
+import threading
+import time
+from typing import Callable, Dict, Hashable, Tuple
+
+VOLATILE = re.compile(r'0x[0-9a-fA-F]+|\d+')
+
+
+def fingerprint(error: BaseException) -> str:
+    """Identify the kind of an error regardless of volatile details.
+
+    Numbers (ports, timestamps, ids, addresses) are dropped from the
+    message, and the original cause of a wrapped error decides its class.
+
+    Returns:
+        str: short stable fingerprint
+
+    """
+    origin = error.__cause__ or error
+    text = VOLATILE.sub('#', f'{type(origin).__name__}:{error}')
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class AlertThrottle:
+    """Let through one alert per scope and fingerprint per interval.
+
+    Args:
+        interval (float): seconds between two alerts of the same kind
+        clock: callable returning monotonic time in seconds
+
+    """
+
+    def __init__(self, interval: float = 3600,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.interval = interval
+        self.clock = clock
+        self._sent: Dict[Tuple[Hashable, str], float] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, scope: Hashable, error_fingerprint: str) -> bool:
+        """Whether the alert should be sent now; records it if so."""
+        now = self.clock()
+        key = (scope, error_fingerprint)
+        with self._lock:
+            sent = self._sent.get(key)
+            if sent is not None and now - sent < self.interval:
+                return False
+            self._sent[key] = now
+            if len(self._sent) > 10000:
+                self._forget(now)
+        return True
+
+    def _forget(self, now: float) -> None:
+        self._sent = {
+            key: sent for key, sent in self._sent.items()
+            if now - sent < self.interval
+        }
@@ -0,0 +1,117 @@
+"""Circuit breaker shared by all tenants calling the same endpoint."""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """The endpoint is considered down, the request was not sent."""
+
+
+class EndpointError(Exception):
+    """The request failed on the endpoint side and counts as a failure.
+
+    Transport errors and 5xx answers affect every caller alike, so they
+    are reported once per outage rather than to each caller.
+    """
+
+
+class CircuitBreaker:
+    """Stop calling an endpoint after repeated failures.
+
+    * closed - requests pass; ``failure_threshold`` failures in a row
+      open the circuit;
+    * open - requests are rejected without touching the network until
+      ``reset_timeout`` seconds have passed;
+    * half-open - a single probe request passes; its success closes the
+      circuit, its failure opens it for another ``reset_timeout``.
+
+    So an outage costs one probe per ``reset_timeout`` however many
+    tenants poll the endpoint. Methods are thread-safe.
+
+    Args:
+        name (str): endpoint name used in logs
+        failure_threshold (int): failures in a row opening the circuit
+        reset_timeout (float): seconds before a probe is let through
+        clock: callable returning monotonic time in seconds
+        on_change: callable receiving the new state on every transition
+
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5,
+                 reset_timeout: float = 60,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_change: Optional[Callable[[str], None]] = None) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.on_change = on_change
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        """Report a successful request."""
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        """Report a failed request."""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED
+                and self.failures >= self.failure_threshold
+            ):
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        logger.warning(f'Предохранитель {self.name}: состояние {state}')
+        if self.on_change is not None:
+            self.on_change(state)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(name: str, **kwargs) -> CircuitBreaker:
+    """Circuit breaker shared by every caller of the named endpoint.
+
+    Keyword arguments configure the breaker when it is created.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
@@ -0,0 +1,220 @@
+"""Pooled keep-alive HTTP client with connect/read timeouts and deadline."""
+import heapq
+import itertools
+import socket
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+CHUNK_SIZE = 64 * 1024
+
+# Delay between attempts to stop a call whose connection is not open yet
+WATCHDOG_RETRY = 0.05
+
+_calls = threading.local()
+
+
+class DeadlineExceeded(requests.Timeout):
+    """The whole request took longer than the client deadline."""
+
+
+class _Deadlines:
+    """Single thread firing the watchdogs of all calls in deadline order.
+
+    Watchdogs wait in a heap ordered by deadline; cancelled ones stay
+    there until they reach the top and are skipped. The thread is
+    started on the first call.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, 'Watchdog']] = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, deadline: float, watchdog: 'Watchdog') -> None:
+        """Fire the watchdog at the monotonic time ``deadline``."""
+        with self._condition:
+            heapq.heappush(
+                self._heap, (deadline, next(self._order), watchdog)
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='watchdog', daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def _next_due(self) -> 'Watchdog':
+        with self._condition:
+            while True:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, watchdog = self._heap[0]
+                wait = deadline - time.monotonic()
+                if watchdog.done or wait <= 0:
+                    heapq.heappop(self._heap)
+                    if not watchdog.done:
+                        return watchdog
+                else:
+                    self._condition.wait(wait)
+
+    def _run(self) -> None:
+        while True:
+            self._next_due().fire()
+
+
+_deadlines = _Deadlines()
+
+
+class Watchdog:
+    """Shut down the connection of a call once its deadline passes.
+
+    Connect and read timeouts bound each socket operation only, so a
+    server trickling the headers or the body byte by byte could hold a
+    call forever. The watchdog shuts the socket down instead, which
+    makes the blocked read fail whatever phase the call is in. Deadlines
+    of all calls are watched by one shared thread.
+
+    Args:
+        seconds (float): deadline of the call
+
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.connection: Any = None
+        self.expired = False
+        self.done = False
+        self._lock = threading.Lock()
+        _deadlines.schedule(time.monotonic() + seconds, self)
+
+    def fire(self) -> None:
+        """Shut the connection down, or retry until it is open."""
+        with self._lock:
+            if self.done:
+                return
+            self.expired = True
+            sock = getattr(self.connection, 'sock', None)
+            if sock is None:
+                _deadlines.schedule(
+                    time.monotonic() + WATCHDOG_RETRY, self
+                )
+                return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def cancel(self) -> None:
+        """Stop watching, the call is over."""
+        with self._lock:
+            self.done = True
+
+
+class _WatchedPool:
+    """Pool handing the connection of a call to the thread's watchdog."""
+
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        watchdog = getattr(_calls, 'watchdog', None)
+        if watchdog is not None:
+            watchdog.connection = connection
+        return connection
+
+
+class _WatchedHTTPConnectionPool(_WatchedPool, HTTPConnectionPool):
+    pass
+
+
+class _WatchedHTTPSConnectionPool(_WatchedPool, HTTPSConnectionPool):
+    pass
+
+
+class _WatchedAdapter(HTTPAdapter):
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _WatchedHTTPConnectionPool,
+            'https': _WatchedHTTPSConnectionPool,
+        }
+
+
+class HttpClient:
+    """Reusable HTTP client sharing keep-alive connections between polls.
+
+    Unlike bare ``requests.get`` the client keeps up to ``pool_size``
+    connections per host open, so repeated polls skip the TCP and TLS
+    handshakes. Every call is bounded by connect and read timeouts and by
+    a total deadline covering the headers and the whole body, enforced by
+    a Watchdog.
+
+    Args:
+        pool_size (int): connections kept per host, usually the number
+            of polls allowed in flight
+        connect_timeout (float): seconds to establish a connection
+        read_timeout (float): seconds to wait between two received bytes
+        deadline (float): seconds the whole call may take
+
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 10, deadline: float = 30) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.session = requests.Session()
+        adapter = _WatchedAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size,
+            pool_block=True
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url: str, deadline: Optional[float] = None,
+            **kwargs) -> requests.Response:
+        """Send GET request and read the whole body within the deadline.
+
+        Args:
+            url (str): requested url
+            deadline (float): overrides the client deadline for this call
+            **kwargs: passed to ``requests.Session.get``
+
+        Returns:
+            requests.Response: response with the body already read
+
+        Raises:
+            DeadlineExceeded: response was not received within the
+                deadline
+            requests.RequestException: any other transport error
+
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        watchdog = _calls.watchdog = Watchdog(deadline or self.deadline)
+        response = None
+        try:
+            response = self.session.get(url, stream=True, **kwargs)
+            content = b''.join(response.iter_content(CHUNK_SIZE))
+        except BaseException as error:
+            if response is not None:
+                response.close()
+            if watchdog.expired and isinstance(error, Exception):
+                raise DeadlineExceeded(
+                    f'Ответ от {url} не получен за отведенное время',
+                    response=response
+                ) from error
+            raise
+        finally:
+            watchdog.cancel()
+            _calls.watchdog = None
+        response._content = content
+        response._content_consumed = True
+        return response
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
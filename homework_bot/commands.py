@@ -0,0 +1,141 @@
+"""Telegram bot commands and the status cache answering them."""
+import asyncio
+import logging
+from collections import deque
+from functools import partial
+from typing import (
+    Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+)
+
+logger = logging.getLogger(__name__)
+
+Command = Tuple[str, str, str]
+Handler = Callable[[str, str, str], Awaitable[None]]
+
+
+class StatusCache:
+    """Last known homeworks and recent status changes of every tenant.
+
+    Kept in memory only and filled by polls, so it starts empty after a
+    restart.
+
+    Args:
+        history_size (int): status changes remembered per tenant
+
+    """
+
+    def __init__(self, history_size: int = 20) -> None:
+        self.history_size = history_size
+        self._homeworks: Dict[str, Dict[Hashable, Any]] = {}
+        self._updated: Dict[str, float] = {}
+        self._history: Dict[str, Deque[Tuple[float, Any]]] = {}
+
+    def update(self, tenant_key: str, homeworks: List[Any],
+               key: Callable[[Any], Hashable], at: float) -> None:
+        """Merge homeworks of a ``parse_homeworks`` result.
+
+        The API lists the latest update of a homework first, so it wins
+        over older entries of the same homework.
+        """
+        known = self._homeworks.setdefault(tenant_key, {})
+        for homework in reversed(homeworks):
+            known[key(homework)] = homework
+        self._updated[tenant_key] = at
+
+    def record_change(self, tenant_key: str, homework: Any,
+                      at: float) -> None:
+        """Remember a status change for ``history``."""
+        history = self._history.get(tenant_key)
+        if history is None:
+            history = self._history[tenant_key] = deque(
+                maxlen=self.history_size
+            )
+        history.append((at, homework))
+
+    def homeworks(self, tenant_key: str) -> List[Any]:
+        """Known homeworks of the tenant."""
+        return list(self._homeworks.get(tenant_key, {}).values())
+
+    def updated(self, tenant_key: str) -> Optional[float]:
+        """Time of the last successful poll of the tenant, if any."""
+        return self._updated.get(tenant_key)
+
+    def history(self, tenant_key: str) -> List[Tuple[float, Any]]:
+        """Remembered status changes, newest first."""
+        return list(reversed(self._history.get(tenant_key, ())))
+
+
+def parse_command(update: Any) -> Optional[Command]:
+    """Chat id, command name and arguments of an update with a command.
+
+    ``/status@SomeBot arg`` gives ``('<chat id>', 'status', 'arg')``;
+    updates without a command give None.
+    """
+    message = getattr(update, 'message', None)
+    text = getattr(message, 'text', None)
+    if not text or not text.startswith('/'):
+        return None
+    name, _, args = text[1:].partition(' ')
+    name = name.split('@', 1)[0].lower()
+    if not name:
+        return None
+    return str(message.chat_id), name, args.strip()
+
+
+class CommandListener:
+    """Long-poll Telegram for updates and dispatch bot commands.
+
+    Each command is handled in its own task, so a slow ``/check`` does
+    not hold up other chats. Handler errors are logged and do not stop
+    the listener.
+
+    Args:
+        get_updates: blocking ``get_updates(offset=..., timeout=...)`` of
+            telegram.Bot, run in the default executor
+        handle: coroutine function ``handle(chat_id, command, args)``
+        timeout (int): long polling timeout in seconds
+        retry_delay (float): pause after a failed request for updates
+
+    """
+
+    def __init__(self, get_updates: Callable[..., List[Any]],
+                 handle: Handler, timeout: int = 30,
+                 retry_delay: float = 5) -> None:
+        self.get_updates = get_updates
+        self.handle = handle
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.offset: Optional[int] = None
+        self._tasks = set()
+
+    async def run(self) -> None:
+        """Receive and dispatch commands forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                updates = await loop.run_in_executor(None, partial(
+                    self.get_updates, offset=self.offset,
+                    timeout=self.timeout, allowed_updates=['message']
+                ))
+            except Exception as error:
+                logger.error(f'Не удалось получить команды: {error}')
+                await asyncio.sleep(self.retry_delay)
+                continue
+            self.dispatch(updates)
+
+    def dispatch(self, updates: List[Any]) -> None:
+        """Start handling of every command among the updates."""
+        for update in updates:
+            self.offset = update.update_id + 1
+            command = parse_command(update)
+            if command is None:
+                continue
+            task = asyncio.create_task(self._handle(*command))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, chat_id: str, name: str, args: str) -> None:
+        try:
+            await self.handle(chat_id, name, args)
+        except Exception as error:
+            logger.error(f'Ошибка при обработке команды /{name}: {error}')
@@ -0,0 +1,110 @@
+"""``from_date`` windows of the polls of every tenant.
+
+The cursor of a tenant is the ``current_date`` of its last answer, a
+timestamp of the server. Each poll asks for the changes since the cursor
+minus an overlap, so an update stamped just before the previous answer
+but not visible in it yet is still fetched; the entries seen before are
+recognised by homework key and ``date_updated`` (see diff_statuses).
+
+Local time only stands in for the server time when an answer lacks
+``current_date`` or a tenant has no cursor yet. It is corrected by the
+offset between the server and local clocks measured from earlier
+answers, so a skewed local clock moves the window neither into the
+future nor far into the past. The offset is the median of the recent
+measurements, and a ``current_date`` further than ``max_offset`` from
+the local time is not taken for a measurement at all, so a single odd
+answer cannot shift the windows of every tenant.
+"""
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CursorManager:
+    """Choose request windows and advance the cursors of tenants.
+
+    Args:
+        overlap (int): seconds every window reaches back before the cursor
+        max_skew (float): offset between server and local clocks above
+            which a warning is logged
+        clock: callable returning local wall clock time in seconds
+        max_offset (float): measurements further off are ignored
+        samples (int): recent measurements the offset is the median of
+
+    """
+
+    def __init__(self, overlap: int = 60, max_skew: float = 300,
+                 clock: Callable[[], float] = time.time,
+                 max_offset: float = 24 * 60 * 60, samples: int = 5) -> None:
+        self.overlap = overlap
+        self.max_skew = max_skew
+        self.clock = clock
+        self.max_offset = max_offset
+        self.offset = 0.0
+        self._samples: Deque[float] = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def now(self) -> int:
+        """Estimated current time of the server."""
+        return int(self.clock() + self.offset)
+
+    def window(self, cursor: Optional[int]) -> int:
+        """``from_date`` of the next request of a tenant.
+
+        A tenant without a cursor starts from the current server time.
+        """
+        if cursor is None:
+            cursor = self.now()
+        return max(0, cursor - self.overlap)
+
+    def advance(self, cursor: Optional[int], response: Dict[str, Any],
+                requested_at: float) -> int:
+        """Cursor after a successful answer; it never moves back.
+
+        Args:
+            cursor (int): cursor the request was made with
+            response (dict): answer of the API
+            requested_at (float): local time when the request was sent
+
+        Returns:
+            int: ``current_date`` of the answer, or the server time of
+            the request estimated from the local clock if it is missing
+
+        """
+        current_date = response.get('current_date')
+        if isinstance(current_date, int) and not isinstance(
+                current_date, bool):
+            self._measure(current_date)
+            new_cursor = current_date
+        else:
+            new_cursor = int(requested_at + self.offset)
+            logger.warning(
+                'В ответе API нет current_date, курсор сдвинут '
+                'по локальным часам'
+            )
+        if cursor is not None:
+            new_cursor = max(new_cursor, cursor)
+        return new_cursor
+
+    def _measure(self, server_time: int) -> None:
+        sample = server_time - self.clock()
+        if abs(sample) > self.max_offset:
+            logger.warning(
+                f'current_date {server_time} отличается от локального '
+                f'времени на {sample:.0f} с, замер отброшен'
+            )
+            return
+        with self._lock:
+            self._samples.append(sample)
+            offset = statistics.median(self._samples)
+            skewed = abs(offset) > self.max_skew >= abs(self.offset)
+            self.offset = offset
+        if skewed:
+            logger.warning(
+                f'Часы сервера расходятся с локальными на {offset:.0f} с'
+            )
@@ -0,0 +1,312 @@
+"""Rate-limited outbound Telegram message queue."""
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from typing import (
+    Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+)
+
+from homework_bot.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = '\n\n'
+DIGEST_HEADER = 'Новые уведомления ({count}):'
+DIGEST_PREFIX = re.compile(
+    re.escape(DIGEST_HEADER).replace(r'\{count\}', r'\d+')
+    + re.escape(SEPARATOR)
+)
+
+Message = Tuple[str, Optional[str], bool]
+
+# Telegram errors that resending cannot fix: the bot was blocked or
+# removed from the chat, the chat does not exist or rejects the text
+PERMANENT_ERRORS = frozenset(('Unauthorized', 'Forbidden', 'BadRequest'))
+# Exponent of the backoff stops growing here, long after max_retry_delay
+MAX_BACKOFF_EXPONENT = 32
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds Telegram asked to wait before the next request, if any.
+
+    ``telegram.error.RetryAfter`` carries it in ``retry_after``; the error
+    may also be wrapped by send_message into a plain Exception.
+    """
+    while error is not None:
+        value = getattr(error, 'retry_after', None)
+        if value is not None:
+            return float(value)
+        error = error.__cause__
+    return None
+
+
+def permanent_error(error: BaseException) -> bool:
+    """Whether the error is one of PERMANENT_ERRORS.
+
+    Telegram errors are recognised by class name, so the check does not
+    import telegram; the error may be wrapped like in ``retry_after``.
+    """
+    while error is not None:
+        names = {cls.__name__ for cls in type(error).__mro__}
+        if names & PERMANENT_ERRORS:
+            return True
+        error = error.__cause__
+    return False
+
+
+class DeliveryQueue:
+    """Outbound messages delivered within Telegram flood limits.
+
+    Messages are queued per chat. A worker takes a chat, waits for a token
+    of the chat bucket and of the global bucket and sends everything
+    pending for the chat as one message (joined by SEPARATOR, up to
+    MAX_MESSAGE_LENGTH). A chat is handled by one worker at a time, so
+    messages keep their order. When Telegram answers with RetryAfter the
+    chat is paused for the requested time and the batch is resent; other
+    errors are retried with exponential backoff, the delay doubling up
+    to ``max_retry_delay``. Only messages without a key are dropped after
+    ``max_retries`` attempts: keyed messages are backed by the outbox and
+    retried until they are delivered, unless ``retry_keyed`` is off
+    because a later run resends the outbox anyway. A batch failing with
+    a permanent error (see permanent_error) is not retried at all: keys
+    of its messages go to ``on_dead`` with the error.
+
+    With a ``digest_window`` the first message of an idle chat opens a
+    window: messages queued for the chat during the window are sent
+    together as one digest under DIGEST_HEADER when it closes, or as soon
+    as ``digest_size`` messages are pending. A review burst then costs a
+    single Telegram request per chat. Messages put with ``immediate``,
+    such as replies to commands, close the window and go out on their
+    own, without the header.
+
+    Messages may carry a key (the outbox idempotency key); keys of every
+    successfully sent batch are passed to ``on_delivered``.
+
+    Args:
+        send: blocking callable ``send(chat_id, text)``, run in the
+            default executor
+        global_rate (float): messages per second for the whole bot
+        chat_rate (float): messages per second for a single chat
+        chat_burst (float): messages a chat may receive back to back
+        workers (int): messages sent concurrently
+        max_retries (int): attempts for failing messages before dropping
+            the ones without a key
+        retry_delay (float): first delay before retrying a failed send
+        max_retry_delay (float): longest delay between two retries
+        retry_keyed (bool): keep retrying keyed messages after
+            ``max_retries`` attempts
+        on_delivered: callable receiving the list of keys of delivered
+            messages
+        on_dead: callable receiving the list of keys of messages that
+            can never be delivered and the error text
+        clock: callable returning monotonic time in seconds, used by
+            the rate limits
+        digest_window (float): seconds to collect messages of a chat
+            before sending them, 0 to send right away
+        digest_size (int): pending messages closing the window early,
+            0 for no limit
+
+    """
+
+    def __init__(self, send: Callable[[Hashable, str], None],
+                 global_rate: float = 25, chat_rate: float = 1,
+                 chat_burst: float = 1, workers: int = 8,
+                 max_retries: int = 5, retry_delay: float = 1,
+                 max_retry_delay: float = 300, retry_keyed: bool = True,
+                 on_delivered: Optional[Callable[[List[str]], None]] = None,
+                 on_dead: Optional[Callable[[List[str], str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 digest_window: float = 0, digest_size: int = 0) -> None:
+        self.send = send
+        self.on_delivered = on_delivered
+        self.on_dead = on_dead
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.retry_keyed = retry_keyed
+        self.clock = clock
+        self.digest_window = digest_window
+        self.digest_size = digest_size
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self.chat_buckets: Dict[Hashable, TokenBucket] = {}
+        self._pending: Dict[Hashable, Deque[Message]] = {}
+        self._attempts: Dict[Hashable, int] = {}
+        self._scheduled: Set[Hashable] = set()
+        self._windows: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        """Number of messages waiting for delivery."""
+        return sum(len(texts) for texts in self._pending.values())
+
+    def put(self, chat_id: Hashable, text: str, key: Optional[str] = None,
+            immediate: bool = False) -> None:
+        """Queue a message for the chat without waiting for delivery.
+
+        An ``immediate`` message is not held in a digest window.
+        """
+        self._ensure_primitives()
+        messages = self._pending.setdefault(chat_id, deque())
+        messages.append((text, key, immediate))
+        self._idle.clear()
+        if immediate or 0 < self.digest_size <= len(messages):
+            window = self._windows.pop(chat_id, None)
+            if window is not None:
+                window.cancel()
+                self._scheduled.discard(chat_id)
+            self._schedule(chat_id)
+        else:
+            self._schedule(chat_id, self.digest_window, window=True)
+
+    async def run(self) -> None:
+        """Deliver queued messages forever."""
+        self._ensure_primitives()
+        await asyncio.gather(
+            *(self._worker() for _ in range(self.workers))
+        )
+
+    async def join(self) -> None:
+        """Wait until every queued message is delivered or dropped."""
+        self._ensure_primitives()
+        await self._idle.wait()
+
+    def _ensure_primitives(self) -> None:
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+            self._idle = asyncio.Event()
+            self._idle.set()
+
+    def _schedule(self, chat_id: Hashable, delay: float = 0,
+                  window: bool = False) -> None:
+        if chat_id in self._scheduled:
+            return
+        self._scheduled.add(chat_id)
+        if not delay:
+            self._ready.put_nowait(chat_id)
+        elif window:
+            self._windows[chat_id] = asyncio.get_running_loop().call_later(
+                delay, self._close_window, chat_id
+            )
+        else:
+            asyncio.get_running_loop().call_later(
+                delay, self._ready.put_nowait, chat_id
+            )
+
+    def _close_window(self, chat_id: Hashable) -> None:
+        del self._windows[chat_id]
+        self._ready.put_nowait(chat_id)
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, self.clock)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _take_batch(self, chat_id: Hashable) -> Deque[Message]:
+        messages = self._pending[chat_id]
+        digest = bool(self.digest_window)
+        limit = MAX_MESSAGE_LENGTH
+        if digest and len(messages) > 1:
+            limit -= len(DIGEST_HEADER.format(count=len(messages)))
+            limit -= len(SEPARATOR)
+        batch = deque([messages.popleft()])
+        if digest and batch[0][2]:
+            return batch
+        length = len(batch[0][0])
+        while messages and not (digest and messages[0][2]) and (
+            length + len(SEPARATOR) + len(messages[0][0]) <= limit
+        ):
+            length += len(SEPARATOR) + len(messages[0][0])
+            batch.append(messages.popleft())
+        return batch
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            chat_id = await self._ready.get()
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            batch = self._take_batch(chat_id)
+            try:
+                await loop.run_in_executor(
+                    None, self.send, chat_id, self._format(batch)
+                )
+            except Exception as error:
+                delay = self._retry_delay(chat_id, batch, error)
+            else:
+                self._attempts.pop(chat_id, None)
+                self._delivered(batch)
+                delay = 0
+            self._scheduled.discard(chat_id)
+            if self._pending[chat_id]:
+                self._schedule(chat_id, delay)
+            else:
+                del self._pending[chat_id]
+                if not self._pending:
+                    self._idle.set()
+
+    def _format(self, batch: Deque[Message]) -> str:
+        texts = [text for text, _, _ in batch]
+        if self.digest_window and len(texts) > 1:
+            texts.insert(0, DIGEST_HEADER.format(count=len(texts)))
+        return SEPARATOR.join(texts)
+
+    def _delivered(self, batch: Deque[Message]) -> None:
+        keys = [key for _, key, _ in batch if key is not None]
+        if keys and self.on_delivered is not None:
+            self.on_delivered(keys)
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before the given retry of a failing chat."""
+        exponent = min(attempt - 1, MAX_BACKOFF_EXPONENT)
+        return min(self.retry_delay * 2 ** exponent, self.max_retry_delay)
+
+    def _dead(self, chat_id: Hashable, batch: Deque[Message],
+              error: Exception) -> None:
+        logger.error(
+            f'Сообщения в чат {chat_id} не могут быть доставлены: {error}'
+        )
+        self._attempts.pop(chat_id, None)
+        keys = [key for _, key, _ in batch if key is not None]
+        if keys and self.on_dead is not None:
+            self.on_dead(keys, str(error))
+
+    def _retry_delay(self, chat_id: Hashable, batch: Deque[Message],
+                     error: Exception) -> float:
+        """Put the failed batch back and choose when to retry it."""
+        delay = retry_after(error)
+        if delay is None and permanent_error(error):
+            self._dead(chat_id, batch, error)
+            return 0
+        if delay is not None:
+            logger.warning(
+                f'Telegram просит подождать {delay} с перед отправкой '
+                f'в чат {chat_id}'
+            )
+        else:
+            attempt = self._attempts.get(chat_id, 0) + 1
+            if attempt == self.max_retries + 1:
+                logger.error(
+                    f'Сообщения в чат {chat_id} не доставлены после '
+                    f'{self.max_retries} попыток: {error}'
+                )
+            if attempt > self.max_retries:
+                batch = deque(
+                    message for message in batch
+                    if self.retry_keyed and message[1] is not None
+                )
+                if not batch:
+                    self._attempts.pop(chat_id, None)
+                    return 0
+            self._attempts[chat_id] = attempt
+            delay = self.backoff(attempt)
+        self._pending[chat_id].extendleft(reversed(batch))
+        return delay
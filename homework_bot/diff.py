@@ -0,0 +1,60 @@
+"""Detection of real homework status transitions between polls."""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+Homework = Any
+
+
+def get_status(homework: Dict[str, object]) -> object:
+    """Status of a homework given as a dict of the API answer."""
+    return homework.get('status')
+
+
+def diff_statuses(known: Dict[str, str], homeworks: Iterable[Homework],
+                  key: Callable[[Homework], str],
+                  status: Callable[[Homework], object] = get_status,
+                  updated: Optional[Dict[str, str]] = None,
+                  date: Optional[Callable[[Homework], object]] = None
+                  ) -> List[Homework]:
+    """Homeworks whose status differs from the last known one.
+
+    The API lists homeworks newest first, so when a homework appears
+    several times only its first (latest) entry is considered. The result
+    is ordered oldest first, the order in which to notify the user.
+
+    Given ``updated`` (update time of every known status) and ``date``, a
+    homework back in its known status but updated later also counts: it
+    went through another status between two polls. Entries seen by an
+    earlier poll keep their update time, so overlapping request windows
+    are not reported twice. Update times are ISO 8601 strings of the API
+    and compare as strings, the way they are stored.
+
+    Args:
+        known (dict): last known status by homework key, not modified
+        homeworks: homeworks from the api response
+        key: callable returning the key of a homework
+        status: callable returning the status of a homework, ``status``
+            item of a dict by default
+        updated (dict): update time of the known status by homework key
+        date: callable returning the update time of a homework
+
+    Returns:
+        list: one homework per real transition
+
+    """
+    seen = set()
+    changed = []
+    for homework in homeworks:
+        homework_key = key(homework)
+        if homework_key in seen:
+            continue
+        seen.add(homework_key)
+        if known.get(homework_key) != status(homework):
+            changed.append(homework)
+        elif updated is not None:
+            last = updated.get(homework_key)
+            current = date(homework)
+            if (last is not None and current is not None
+                    and str(current) > last):
+                changed.append(homework)
+    changed.reverse()
+    return changed
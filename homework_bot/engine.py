@@ -0,0 +1,197 @@
+"""Asyncio engine polling many tenants concurrently."""
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from homework_bot import metrics
+from homework_bot.quota import RequestQuota
+from homework_bot.scheduler import ERROR, AdaptiveScheduler
+
+logger = logging.getLogger(__name__)
+
+POLL_LAG = metrics.Histogram(
+    'homework_poll_lag_seconds',
+    'Delay between the scheduled and the actual start of a poll'
+)
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """Pair of Practicum token and Telegram chat served by the bot."""
+
+    practicum_token: str
+    chat_id: str
+
+    @property
+    def key(self) -> str:
+        """Stable tenant identifier that does not expose the token."""
+        digest = hashlib.sha1(
+            str(self.practicum_token).encode()
+        ).hexdigest()[:12]
+        return f'{self.chat_id}:{digest}'
+
+
+PollFunc = Callable[[Tenant], Awaitable[str]]
+
+
+class PollingEngine:
+    """Poll tenants on an adaptive schedule with bounded concurrency.
+
+    The poll function returns the outcome of the poll (see
+    homework_bot.scheduler), which decides when the tenant is polled
+    next. A single dispatcher pops due tenants from the scheduler's timer
+    heap and starts their polls as concurrency slots free up.
+
+    Blocking calls made by the poll function are expected to go through
+    an executor of its own, passed to ``run_in_executor`` explicitly and
+    sized to the concurrency limit so threads never outnumber slots; the
+    engine leaves the default executor of the loop alone.
+
+    With a request quota, a due tenant whose token (or the whole fleet)
+    is out of budget is put back on the heap for the time the budget
+    needs to refill instead of occupying a slot, and a Retry-After hold
+    on the token lengthens the next delay.
+
+    Args:
+        tenants: tenants to poll
+        poll: coroutine function polling a single tenant
+        concurrency (int): maximum number of polls in flight
+        scheduler (AdaptiveScheduler): schedule of the polls
+        quota (RequestQuota): API request budgets
+
+    """
+
+    def __init__(self, tenants: Iterable[Tenant], poll: PollFunc,
+                 concurrency: int = 100,
+                 scheduler: Optional[AdaptiveScheduler] = None,
+                 quota: Optional[RequestQuota] = None) -> None:
+        self.tenants = {tenant.key: tenant for tenant in tenants}
+        self.poll = poll
+        self.concurrency = concurrency
+        self.scheduler = scheduler or AdaptiveScheduler()
+        self.quota = quota
+        self._in_flight = set()
+        self._semaphore = None
+        self._wakeup = None
+
+    def set_tenants(self, tenants: Iterable[Tenant]) -> List[Tenant]:
+        """Replace the polled tenants, e.g. after a shard rebalance.
+
+        New tenants are polled right away; removed tenants are no longer
+        scheduled, a poll of theirs in flight is allowed to finish.
+
+        Returns:
+            list: tenants that were not polled before
+
+        """
+        tenants = {tenant.key: tenant for tenant in tenants}
+        for key in self.tenants.keys() - tenants.keys():
+            self.scheduler.remove(key)
+        added = [
+            tenant for key, tenant in tenants.items()
+            if key not in self.tenants
+        ]
+        self.tenants = tenants
+        for tenant in added:
+            if tenant.key not in self._in_flight:
+                self.scheduler.add(tenant.key)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return added
+
+    async def run_once(self) -> None:
+        """Poll all tenants once and wait for every poll to finish."""
+        self._ensure_primitives()
+        await asyncio.gather(
+            *(self._poll_tenant(tenant) for tenant in self.tenants.values())
+        )
+
+    async def run(self) -> None:
+        """Poll tenants forever following the schedule."""
+        self._ensure_primitives()
+        for key in self.tenants:
+            if key not in self.scheduler.timers:
+                self.scheduler.add(key)
+        while True:
+            for key, deadline in self.scheduler.pop_due():
+                tenant = self.tenants.get(key)
+                if tenant is None:
+                    continue
+                wait = self._try_acquire(tenant)
+                if wait:
+                    self.scheduler.add(key, wait)
+                    continue
+                self._in_flight.add(key)
+                await self._semaphore.acquire()
+                POLL_LAG.observe(max(self.scheduler.clock() - deadline, 0))
+                asyncio.create_task(self._poll_and_reschedule(tenant))
+            await self._sleep(self.scheduler.time_to_next())
+
+    async def poll_now(self, key: str) -> Optional[str]:
+        """Poll the tenant right away, out of its schedule.
+
+        The next poll is scheduled from this one as usual.
+
+        Returns:
+            str: outcome of the poll, or None if the tenant is unknown,
+            is being polled already or its request budget is spent
+
+        """
+        tenant = self.tenants.get(key)
+        if tenant is None or key in self._in_flight:
+            return None
+        if self._try_acquire(tenant):
+            return None
+        self._ensure_primitives()
+        self.scheduler.timers.discard(key)
+        self._in_flight.add(key)
+        await self._semaphore.acquire()
+        return await self._poll_and_reschedule(tenant)
+
+    def _try_acquire(self, tenant: Tenant) -> float:
+        if self.quota is None:
+            return 0
+        return self.quota.try_acquire(tenant.practicum_token)
+
+    async def _sleep(self, timeout: Optional[float]) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _ensure_primitives(self) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._wakeup = asyncio.Event()
+
+    async def _poll_and_reschedule(self, tenant: Tenant) -> str:
+        try:
+            outcome = await self._call_poll(tenant)
+        finally:
+            self._semaphore.release()
+            self._in_flight.discard(tenant.key)
+        if tenant.key not in self.tenants:
+            return outcome
+        hold = 0
+        if self.quota is not None:
+            hold = self.quota.blocked_for(tenant.practicum_token)
+        delay = self.scheduler.report(tenant.key, outcome, min_delay=hold)
+        logger.debug(f'Следующий опрос {tenant.key} через {delay:.0f} с')
+        self._wakeup.set()
+        return outcome
+
+    async def _poll_tenant(self, tenant: Tenant) -> str:
+        async with self._semaphore:
+            return await self._call_poll(tenant)
+
+    async def _call_poll(self, tenant: Tenant) -> str:
+        try:
+            return await self.poll(tenant)
+        except Exception as error:
+            logger.error(
+                f'Необработанная ошибка при опросе {tenant.key}: {error}'
+            )
+            return ERROR
@@ -0,0 +1,34 @@
+"""Deferred imports of heavy dependencies.
+
+``requests`` and python-telegram-bot take most of the import time of the
+bot, while short-lived invocations such as token validation never touch
+them. A module returned by ``lazy_import`` is registered in
+``sys.modules`` right away but executed on first attribute access, so
+``import requests`` elsewhere and ``monkeypatch.setattr(requests, ...)``
+still see the same module object.
+"""
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Module that is loaded on first attribute access.
+
+    A module that is already imported is returned as is.
+
+    Raises:
+        ModuleNotFoundError: the module is not installed
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,133 @@
+"""Leader lease kept in the SQLite state database.
+
+Replicas of the bot share the state database and compete for a named
+lease; only the holder polls and sends, the others stand by and take
+over once the holder stops renewing it.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS lease (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+'''
+
+
+class Lease:
+    """Named lease renewed by its holder.
+
+    The lease expires ``ttl`` seconds after the last renewal. The holder
+    considers it lost ``margin`` seconds earlier, so it stops sending
+    before anyone else may start. Renewals run on a thread of their own,
+    so blocking work of the bot in the default executor cannot delay
+    them past the expiry.
+
+    Args:
+        path (str): SQLite database file shared by the replicas
+        name (str): lease name
+        holder (str): id of this replica
+        ttl (float): seconds the lease lasts after a renewal
+        margin (float): safety margin of the holder, ttl / 5 by default
+        clock: callable returning wall clock time in seconds
+
+    """
+
+    def __init__(self, path: str, name: str, holder: str, ttl: float = 10,
+                 margin: Optional[float] = None,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+        self.margin = ttl / 5 if margin is None else margin
+        self.clock = clock
+        self._valid_until = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='lease')
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.executescript(SCHEMA)
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease if it is free, expired or ours."""
+        with self._lock:
+            now = self.clock()
+            connection = self._connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute(
+                    'SELECT holder, expires FROM lease WHERE name = ?',
+                    (self.name,)
+                ).fetchone()
+                free = row is None or row[0] == self.holder or row[1] <= now
+                if free:
+                    connection.execute(
+                        'INSERT OR REPLACE INTO lease (name, holder, expires) '
+                        'VALUES (?, ?, ?)',
+                        (self.name, self.holder, now + self.ttl)
+                    )
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            if free:
+                self._valid_until = now + self.ttl - self.margin
+            return free
+
+    def held(self) -> bool:
+        """Whether this replica may act as the leader right now."""
+        return self.clock() < self._valid_until
+
+    def release(self) -> None:
+        """Give the lease up so that a standby takes over at once."""
+        with self._lock:
+            self._valid_until = 0.0
+            self._connection.execute(
+                'DELETE FROM lease WHERE name = ? AND holder = ?',
+                (self.name, self.holder)
+            )
+
+    async def acquire(self, interval: float) -> None:
+        """Wait until the lease is ours, trying every ``interval`` seconds."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                acquired = await loop.run_in_executor(
+                    self._executor, self.try_acquire
+                )
+                if acquired:
+                    return
+            except sqlite3.Error as error:
+                logger.error(f'Не удалось получить аренду: {error}')
+            await asyncio.sleep(interval)
+
+    async def keep(self, interval: float) -> None:
+        """Renew the lease every ``interval`` seconds until it is lost."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await loop.run_in_executor(
+                    self._executor, self.try_acquire
+                )
+            except sqlite3.Error as error:
+                logger.error(f'Не удалось продлить аренду: {error}')
+                renewed = False
+            if not (renewed or self.held()):
+                return
+
+    def close(self) -> None:
+        """Close the database connection and the renewal thread."""
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            self._connection.close()
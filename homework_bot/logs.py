@@ -0,0 +1,144 @@
+"""Non-blocking logging with rotated, compressed log files."""
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s, %(levelname)s, %(message)s, %(name)s'
+STREAM_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, ready for log collectors."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Render the record as a JSON line."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _compress(source: str, dest: str) -> None:
+    with open(source, 'rb') as raw, gzip.open(dest, 'wb') as packed:
+        shutil.copyfileobj(raw, packed)
+    os.remove(source)
+
+
+def gzip_namer(name: str) -> str:
+    """Name rotated files with the ``.gz`` suffix."""
+    return name + '.gz'
+
+
+def gzip_rotator(source: str, dest: str) -> None:
+    """Move the full log aside and gzip it in a background thread."""
+    pending = dest + '.tmp'
+    os.replace(source, pending)
+    threading.Thread(
+        target=_compress, args=(pending, dest), name='log-compress',
+        daemon=True
+    ).start()
+
+
+def file_handler(filename: str, max_bytes: int = 0, backup_count: int = 5,
+                 when: Optional[str] = None,
+                 compress: bool = True) -> logging.Handler:
+    """File handler rotating by time when ``when`` is set, else by size.
+
+    Args:
+        filename (str): log file
+        max_bytes (int): size triggering rotation, 0 disables it
+        backup_count (int): rotated files to keep
+        when (str): TimedRotatingFileHandler interval, e.g. ``midnight``
+        compress (bool): gzip rotated files in the background
+
+    Returns:
+        logging.Handler: configured handler
+
+    """
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            filename, when=when, backupCount=backup_count, encoding='utf-8'
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count,
+            encoding='utf-8'
+        )
+    if compress:
+        handler.namer = gzip_namer
+        handler.rotator = gzip_rotator
+    return handler
+
+
+def setup_logging(filename: str, json_format: bool = False,
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  when: Optional[str] = None,
+                  stream_level: int = logging.INFO) -> None:
+    """Route all records through a queue to a background writer thread.
+
+    The root logger only gets a QueueHandler, so logging on the hot path
+    costs a queue put. A QueueListener thread writes DEBUG and above to
+    the rotated file and ``stream_level`` and above to stderr. Calling it
+    again replaces the previous configuration.
+
+    Args:
+        filename (str): log file
+        json_format (bool): write JSON lines instead of text
+        max_bytes (int): size triggering rotation, 0 disables it
+        backup_count (int): rotated files to keep
+        when (str): rotate by time instead, e.g. ``midnight``
+        stream_level (int): minimal level printed to stderr
+
+    """
+    global _listener, _queue_handler
+    shutdown()
+    to_file = file_handler(filename, max_bytes, backup_count, when)
+    to_file.setLevel(logging.DEBUG)
+    to_stream = logging.StreamHandler()
+    to_stream.setLevel(stream_level)
+    if json_format:
+        to_file.setFormatter(JsonFormatter())
+        to_stream.setFormatter(JsonFormatter())
+    else:
+        to_file.setFormatter(logging.Formatter(TEXT_FORMAT))
+        to_stream.setFormatter(logging.Formatter(STREAM_FORMAT))
+    records = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG)
+    root.addHandler(_queue_handler)
+    _listener = logging.handlers.QueueListener(
+        records, to_file, to_stream, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def shutdown() -> None:
+    """Write out queued records and stop the writer thread."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown)
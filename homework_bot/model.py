@@ -0,0 +1,115 @@
+"""Compact records of homeworks from Practicum API answers.
+
+The API answers with a list of JSON objects per poll. The bot only needs
+the key, name, status and update time of each homework, so the answer is
+validated and turned into ``Homework`` records in a single pass
+(``parse_response``); the records use slots, share the members of
+``HomeworkStatus`` and intern keys and names repeated from poll to poll.
+"""
+import sys
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+
+class HomeworkStatus(str, Enum):
+    """Review status of a homework.
+
+    Members are strings equal to the values of the API, so they can be
+    compared with and stored as plain strings.
+    """
+
+    REVIEWING = 'reviewing'
+    APPROVED = 'approved'
+    REJECTED = 'rejected'
+
+
+STATUSES: Dict[str, HomeworkStatus] = {
+    status.value: status for status in HomeworkStatus
+}
+
+
+class Homework:
+    """Homework of an API answer.
+
+    Args:
+        key (str): homework id, or its name when the id is missing
+        name (str): homework name
+        status (HomeworkStatus): review status
+        date_updated: time of the last status change given by the API
+
+    """
+
+    __slots__ = ('key', 'name', 'status', 'date_updated')
+
+    def __init__(self, key: str, name: str, status: HomeworkStatus,
+                 date_updated: Optional[str] = None) -> None:
+        self.key = key
+        self.name = name
+        self.status = status
+        self.date_updated = date_updated
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Homework':
+        """Validate a homework object of the API answer.
+
+        Raises:
+            TypeError: the homework is not an object
+            KeyError: homework_name is missing or the status is unknown
+
+        """
+        if not isinstance(data, dict):
+            raise TypeError('Домашняя работа пришла не в виде словаря')
+        name = data.get('homework_name')
+        if name is None:
+            raise KeyError("Ключ 'homework_name' не присутствует в словаре")
+        status = STATUSES.get(data.get('status'))
+        if status is None:
+            raise KeyError(f'Ключ {data.get("status")} не присутствует '
+                           f'в словаре HOMEWORK_STATUSES')
+        name = sys.intern(str(name))
+        key = data.get('id')
+        key = name if key is None else sys.intern(str(key))
+        return cls(key, name, status, data.get('date_updated'))
+
+    def __eq__(self, other: object) -> bool:
+        """Records are equal when all their fields are."""
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return (
+            self.key == other.key and self.name == other.name
+            and self.status is other.status
+            and self.date_updated == other.date_updated
+        )
+
+    def __repr__(self) -> str:
+        """Constructor-like representation for logs and tests."""
+        return (f'Homework({self.key!r}, {self.name!r}, '
+                f'{self.status.value!r}, {self.date_updated!r})')
+
+
+def homework_list(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Raw homework objects of an API answer.
+
+    Raises:
+        KeyError: the answer has no homeworks key
+        TypeError: the answer is not an object or homeworks is not a list
+
+    """
+    try:
+        homeworks = response['homeworks']
+    except KeyError as error:
+        raise KeyError(f'Ключ {error} не присутствует в словаре')
+    if not isinstance(homeworks, list):
+        raise TypeError('Ответ с домашними заданиями пришел не в виде списка')
+    return homeworks
+
+
+def parse_response(response: Dict[str, Any]) -> List[Homework]:
+    """Validate an API answer and build records of all its homeworks.
+
+    Raises:
+        KeyError: a required key is missing or a status is unknown
+        TypeError: the answer or a homework has a wrong type
+
+    """
+    return [Homework.from_dict(data) for data in homework_list(response)]
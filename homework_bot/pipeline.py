@@ -0,0 +1,148 @@
+"""Staged processing pipeline connected by bounded queues."""
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Any]
+ErrorHandler = Callable[[Any, Exception], None]
+
+
+class Stage:
+    """Pool of workers applying a handler to items of a bounded queue.
+
+    The handler returns the item to pass to the next stage or None to
+    stop processing it. Blocking handlers run in ``executor`` (the
+    default executor when omitted), the others run in the event loop and
+    must not block. A stage with its own executor cannot starve other
+    users of the default one. A full queue
+    makes ``put`` wait, so a slow stage holds back the previous one
+    instead of buffering without limit.
+
+    Args:
+        name (str): stage name used in logs and stats
+        handler: callable processing a single item
+        workers (int): items processed concurrently
+        maxsize (int): capacity of the input queue
+        blocking (bool): run the handler in an executor
+        executor: executor of a blocking handler, the default executor
+            of the loop when omitted
+
+    """
+
+    def __init__(self, name: str, handler: Handler, workers: int = 1,
+                 maxsize: int = 100, blocking: bool = False,
+                 executor: Optional[Executor] = None) -> None:
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.blocking = blocking
+        self.executor = executor
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        self.queue: Optional[asyncio.Queue] = None
+
+    def stats(self) -> Dict[str, int]:
+        """Counters and current load of the stage."""
+        return {
+            'queued': self.queue.qsize() if self.queue else 0,
+            'busy': self.busy,
+            'processed': self.processed,
+            'failed': self.failed,
+        }
+
+    async def process(self, item: Any) -> Any:
+        """Apply the handler to a single item."""
+        if self.blocking:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self.handler, item
+            )
+        return self.handler(item)
+
+
+class Pipeline:
+    """Chain of stages, each feeding the next one.
+
+    Args:
+        stages (list): stages in processing order
+        on_error: callable ``on_error(item, error)`` for items whose
+            handler raised; the item is not passed further
+
+    """
+
+    def __init__(self, stages: List[Stage],
+                 on_error: Optional[ErrorHandler] = None) -> None:
+        self.stages = stages
+        self.on_error = on_error
+
+    async def put(self, item: Any) -> None:
+        """Submit an item to the first stage, waiting for free space."""
+        self._ensure_queues()
+        await self.stages[0].queue.put(item)
+
+    async def join(self) -> None:
+        """Wait until every submitted item has left the last stage."""
+        self._ensure_queues()
+        for stage in self.stages:
+            await stage.queue.join()
+
+    async def run(self) -> None:
+        """Run workers of every stage forever."""
+        self._ensure_queues()
+        workers = []
+        for index, stage in enumerate(self.stages):
+            following = (
+                self.stages[index + 1] if index + 1 < len(self.stages)
+                else None
+            )
+            workers.extend(
+                self._worker(stage, following) for _ in range(stage.workers)
+            )
+        await asyncio.gather(*workers)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Stats of every stage by stage name."""
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def _ensure_queues(self) -> None:
+        for stage in self.stages:
+            if stage.queue is None:
+                stage.queue = asyncio.Queue(stage.maxsize)
+
+    async def _worker(self, stage: Stage,
+                      following: Optional[Stage]) -> None:
+        while True:
+            item = await stage.queue.get()
+            stage.busy += 1
+            try:
+                result = await stage.process(item)
+            except Exception as error:
+                stage.failed += 1
+                self._fail(stage, item, error)
+                result = None
+            else:
+                stage.processed += 1
+            finally:
+                stage.busy -= 1
+            try:
+                if result is not None and following is not None:
+                    await following.queue.put(result)
+            finally:
+                stage.queue.task_done()
+
+    def _fail(self, stage: Stage, item: Any, error: Exception) -> None:
+        if self.on_error is None:
+            logger.error(f'Ошибка на этапе {stage.name}: {error}')
+            return
+        try:
+            self.on_error(item, error)
+        except Exception as handler_error:
+            logger.error(
+                f'Ошибка при обработке сбоя этапа {stage.name}: '
+                f'{handler_error}'
+            )
@@ -0,0 +1,114 @@
+"""Request budgets of the Practicum API per token and for the fleet."""
+import email.utils
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from homework_bot.ratelimit import TokenBucket
+
+
+class RateLimitedError(Exception):
+    """The API answered 429 Too Many Requests.
+
+    Attributes:
+        retry_after (float): seconds to wait before the next request
+
+    """
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str], default: float = 60,
+                      now: Callable[[], float] = time.time) -> float:
+    """Seconds to wait according to a Retry-After header.
+
+    Both forms are supported: delay in seconds and HTTP date. Missing or
+    malformed values give ``default``.
+    """
+    if not value:
+        return default
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if moment is None:
+        return default
+    return max(moment.timestamp() - now(), 0)
+
+
+class RequestQuota:
+    """Global and per-token token buckets plus Retry-After holds.
+
+    ``try_acquire`` is asked before a poll is started; a token is blocked
+    entirely while a 429 answer for it asks to wait. Methods are
+    thread-safe.
+
+    Args:
+        global_rate (float): requests per second for all tokens together
+        token_rate (float): requests per second for a single token
+        token_burst (float): requests a token may make back to back
+        clock: callable returning monotonic time in seconds
+
+    """
+
+    def __init__(self, global_rate: float = 20, token_rate: float = 1 / 30,
+                 token_burst: float = 2,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.token_rate = token_rate
+        self.token_burst = token_burst
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._blocked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, token: str) -> float:
+        """Spend budget for one request of the token.
+
+        Returns:
+            float: 0 if the request may be sent now, otherwise seconds
+            until it may
+
+        """
+        with self._lock:
+            blocked = self._blocked_for(token)
+            if blocked:
+                return blocked
+            wait = self.global_bucket.try_acquire()
+            if wait:
+                return wait
+            bucket = self._buckets.get(token)
+            if bucket is None:
+                bucket = self._buckets[token] = TokenBucket(
+                    self.token_rate, self.token_burst, self.clock
+                )
+            wait = bucket.try_acquire()
+            if wait:
+                self.global_bucket.refund()
+            return wait
+
+    def throttle(self, token: str, seconds: float) -> None:
+        """Block the token for the time the API asked to wait."""
+        with self._lock:
+            until = self.clock() + seconds
+            self._blocked[token] = max(self._blocked.get(token, 0), until)
+
+    def blocked_for(self, token: str) -> float:
+        """Seconds the token stays blocked by a Retry-After, 0 if not."""
+        with self._lock:
+            return self._blocked_for(token)
+
+    def _blocked_for(self, token: str) -> float:
+        until = self._blocked.get(token)
+        if until is None:
+            return 0
+        remaining = until - self.clock()
+        if remaining <= 0:
+            del self._blocked[token]
+            return 0
+        return remaining
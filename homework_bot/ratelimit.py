@@ -0,0 +1,53 @@
+"""Token bucket rate limiter."""
+import asyncio
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """Allow ``rate`` operations per second with bursts up to ``capacity``.
+
+    Args:
+        rate (float): tokens added per second
+        capacity (float): maximum number of stored tokens
+        clock: callable returning monotonic time in seconds
+
+    """
+
+    def __init__(self, rate: float, capacity: float = 1,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds to wait
+            before they become available
+
+        """
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0
+        return (tokens - self.tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until tokens are available and take them."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def refund(self, tokens: float = 1) -> None:
+        """Return tokens taken for an operation that did not happen."""
+        self.tokens = min(self.capacity, self.tokens + tokens)
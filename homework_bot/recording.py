@@ -0,0 +1,110 @@
+"""Append-only JSON lines log of API answers and sent messages.
+
+Each line is one event: ``{"kind": "api", ...}`` for a Practicum API
+answer (or the error that replaced it) and ``{"kind": "send", ...}`` for
+a message delivered to Telegram. Tokens are never written, tenants are
+identified by their key.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from homework_bot.delivery import DIGEST_PREFIX, SEPARATOR
+
+API = 'api'
+SEND = 'send'
+
+
+class Recorder:
+    """Write events to an append-only JSON lines file.
+
+    Every event is written with a single call, so a crash loses at most
+    the event being written. Methods are thread-safe.
+
+    Args:
+        path (str): log file, appended to if it exists
+        clock: callable returning wall clock time in seconds
+
+    """
+
+    def __init__(self, path: str,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.path = path
+        self.clock = clock
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def api(self, tenant_key: str, chat_id: Union[str, int],
+            from_date: Optional[int], response: Any = None,
+            error: Optional[BaseException] = None) -> None:
+        """Record an API answer or the error raised instead of it."""
+        event = {
+            'kind': API, 'tenant': tenant_key, 'chat_id': str(chat_id),
+            'from_date': from_date,
+        }
+        if error is None:
+            event['response'] = response
+        else:
+            event['error'] = str(error)
+            event['error_type'] = type(error).__name__
+        self.write(event)
+
+    def send(self, chat_id: Union[str, int], text: str) -> None:
+        """Record a message delivered to a chat."""
+        self.write({'kind': SEND, 'chat_id': str(chat_id), 'text': text})
+
+    def write(self, event: Dict[str, Any]) -> None:
+        """Append an event stamped with the current time."""
+        event['time'] = self.clock()
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        """Close the log file."""
+        with self._lock:
+            self._file.close()
+
+
+def read_events(path: str) -> Iterator[Dict[str, Any]]:
+    """Events of a log in the order they were recorded.
+
+    A truncated last line, left by a crash, is skipped.
+    """
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                if line.endswith('\n'):
+                    raise
+
+
+class Transcript:
+    """Messages per chat, collected in place of a delivery queue.
+
+    The header of a digest (see DeliveryQueue) is dropped, so digested
+    deliveries compare equal to the messages they were made of.
+    """
+
+    def __init__(self) -> None:
+        self.messages: Dict[str, List[str]] = defaultdict(list)
+
+    def put(self, chat_id: Union[str, int], text: str,
+            key: Optional[str] = None, immediate: bool = False) -> None:
+        """Collect a message."""
+        digest = DIGEST_PREFIX.match(text)
+        if digest is not None:
+            text = text[digest.end():]
+        self.messages[str(chat_id)].append(text)
+
+    def text(self, chat_id: Union[str, int]) -> str:
+        """Everything the chat got, joined the way deliveries coalesce."""
+        return SEPARATOR.join(self.messages.get(str(chat_id), ()))
+
+    def __len__(self) -> int:
+        """Number of collected messages."""
+        return sum(map(len, self.messages.values()))
@@ -0,0 +1,185 @@
+"""Adaptive per-tenant polling schedule kept in a timer heap."""
+import heapq
+import itertools
+import random
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+REVIEWING = 'reviewing'
+CHANGED = 'changed'
+IDLE = 'idle'
+ERROR = 'error'
+
+
+class AdaptivePolicy:
+    """Delay before the next poll depending on the outcome of the last one.
+
+    * REVIEWING - a homework is under review, poll every
+      ``reviewing_interval`` seconds to notice the verdict quickly;
+    * CHANGED - a status just changed, poll again after ``interval``;
+    * IDLE - nothing happens, the delay grows from ``interval`` by
+      ``backoff`` per idle poll up to ``max_interval``;
+    * ERROR - the delay grows from ``error_interval`` by ``backoff`` per
+      failed poll up to ``max_interval``.
+
+    Every delay is spread by +/- ``jitter`` so tenants added together do
+    not keep polling in lockstep.
+
+    Args:
+        interval (float): base delay in seconds
+        reviewing_interval (float): delay while a homework is reviewed
+        error_interval (float): first delay after an error
+        max_interval (float): upper bound for backed off delays
+        backoff (float): multiplier applied per repeated outcome
+        jitter (float): relative random spread of every delay
+        rng: callable returning random floats in [0, 1)
+
+    """
+
+    def __init__(self, interval: float = 600,
+                 reviewing_interval: float = 60,
+                 error_interval: float = 60,
+                 max_interval: float = 3600,
+                 backoff: float = 2,
+                 jitter: float = 0.1,
+                 rng: Callable[[], float] = random.random) -> None:
+        self.interval = interval
+        self.reviewing_interval = reviewing_interval
+        self.error_interval = error_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.rng = rng
+
+    def delay(self, outcome: str, streak: int = 0) -> float:
+        """Seconds to wait before the next poll.
+
+        Args:
+            outcome (str): outcome of the last poll
+            streak (int): number of previous polls with the same outcome
+
+        Returns:
+            float: delay in seconds
+
+        """
+        if outcome == REVIEWING:
+            delay = self.reviewing_interval
+        elif outcome == IDLE:
+            delay = self.interval * self.backoff ** streak
+        elif outcome == ERROR:
+            delay = self.error_interval * self.backoff ** streak
+        else:
+            delay = self.interval
+        delay = min(delay, self.max_interval)
+        return delay * (1 + self.jitter * (2 * self.rng() - 1))
+
+
+class TimerHeap:
+    """Deadlines of many keys with cheap rescheduling.
+
+    Rescheduled keys leave stale entries in the heap; they are skipped
+    when popped, so both operations stay O(log n).
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, float] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        """Number of scheduled keys."""
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check whether the key is scheduled."""
+        return key in self._deadlines
+
+    def push(self, key: Hashable, deadline: float) -> None:
+        """Set deadline of the key, replacing the previous one."""
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+
+    def discard(self, key: Hashable) -> None:
+        """Forget the key if it is scheduled."""
+        self._deadlines.pop(key, None)
+
+    def next_deadline(self) -> Optional[float]:
+        """Earliest deadline or None for an empty heap."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[Tuple[Hashable, float]]:
+        """Remove and return keys whose deadline is not after ``now``.
+
+        Returns:
+            list: (key, deadline) pairs in deadline order
+
+        """
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            due.append((key, deadline))
+            self._drop_stale()
+        return due
+
+    def _drop_stale(self) -> None:
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+
+
+class AdaptiveScheduler:
+    """Timer heap driven by an adaptive policy.
+
+    Args:
+        policy (AdaptivePolicy): delay policy
+        clock: callable returning monotonic time in seconds
+
+    """
+
+    def __init__(self, policy: Optional[AdaptivePolicy] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.policy = policy or AdaptivePolicy()
+        self.clock = clock
+        self.timers = TimerHeap()
+        self._last: Dict[Hashable, Tuple[str, int]] = {}
+
+    def add(self, key: Hashable, delay: float = 0) -> None:
+        """Schedule the first poll of the key after ``delay`` seconds."""
+        self.timers.push(key, self.clock() + delay)
+
+    def remove(self, key: Hashable) -> None:
+        """Stop polling the key."""
+        self.timers.discard(key)
+        self._last.pop(key, None)
+
+    def report(self, key: Hashable, outcome: str,
+               min_delay: float = 0) -> float:
+        """Schedule the next poll of the key after a poll outcome.
+
+        ``min_delay`` overrides shorter policy delays, e.g. when the API
+        asked to retry after a given time.
+
+        Returns:
+            float: chosen delay in seconds
+
+        """
+        previous, streak = self._last.get(key, (None, -1))
+        streak = streak + 1 if previous == outcome else 0
+        self._last[key] = (outcome, streak)
+        delay = max(self.policy.delay(outcome, streak), min_delay)
+        self.timers.push(key, self.clock() + delay)
+        return delay
+
+    def pop_due(self) -> List[Tuple[Hashable, float]]:
+        """Keys due for polling with their deadlines."""
+        return self.timers.pop_due(self.clock())
+
+    def time_to_next(self) -> Optional[float]:
+        """Seconds until the earliest deadline or None if nothing is due."""
+        deadline = self.timers.next_deadline()
+        if deadline is None:
+            return None
+        return max(deadline - self.clock(), 0)
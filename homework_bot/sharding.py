@@ -0,0 +1,223 @@
+"""Sharding of tenants across worker processes sharing the state store.
+
+Workers announce themselves with heartbeats in the ``worker`` table of
+the SQLite state database; every worker builds the same consistent hash
+ring from the live workers and polls only the chats the ring assigns to
+it. When a worker joins or stops heartbeating, only the chats of the
+neighbouring ring segments move.
+
+Telegram hands bot commands to a single long-polling consumer, so the
+commands it receives are put into the ``command`` table and picked up
+by the worker owning the chat.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+Command = Tuple[str, str, str]
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS worker (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS command (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    args TEXT NOT NULL
+);
+'''
+
+
+def ring_hash(value: str) -> int:
+    """Position of the value on the ring."""
+    return int.from_bytes(hashlib.sha1(value.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring of worker ids.
+
+    Every worker is placed on the ring ``replicas`` times, so keys spread
+    evenly and a joining or leaving worker moves about 1/N of them.
+
+    Args:
+        nodes: worker ids
+        replicas (int): points per worker on the ring
+
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 100) -> None:
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (ring_hash(f'{node}#{replica}'), node)
+            for node in self.nodes for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """Worker owning the key, None for an empty ring."""
+        if not self._owners:
+            return None
+        index = bisect.bisect(self._hashes, ring_hash(key))
+        return self._owners[index % len(self._owners)]
+
+
+class WorkerRegistry:
+    """Heartbeats of workers kept in the state database.
+
+    Args:
+        path (str): SQLite database file shared by the workers
+        clock: callable returning wall clock time in seconds
+
+    """
+
+    def __init__(self, path: str,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.executescript(SCHEMA)
+
+    def heartbeat(self, worker_id: str) -> None:
+        """Record that the worker is alive."""
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO worker (worker_id, heartbeat) '
+                'VALUES (?, ?)', (worker_id, self.clock())
+            )
+
+    def alive(self, ttl: float) -> List[str]:
+        """Workers that sent a heartbeat within ``ttl`` seconds."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT worker_id FROM worker WHERE heartbeat >= ? '
+                'ORDER BY worker_id', (self.clock() - ttl,)
+            ).fetchall()
+        return [worker_id for worker_id, in rows]
+
+    def leave(self, worker_id: str) -> None:
+        """Remove the worker, so the others take over its shard at once."""
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM worker WHERE worker_id = ?', (worker_id,)
+            )
+
+    def push_command(self, chat_id: str, name: str, args: str) -> None:
+        """Hand a bot command over to the worker owning the chat."""
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO command (chat_id, name, args) VALUES (?, ?, ?)',
+                (chat_id, name, args)
+            )
+
+    def take_commands(self, owns: Callable[[str], bool]) -> List[Command]:
+        """Remove and return the commands of chats the worker owns."""
+        with self._lock:
+            connection = self._connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                rows = connection.execute(
+                    'SELECT id, chat_id, name, args FROM command ORDER BY id'
+                ).fetchall()
+                mine = [row for row in rows if owns(row[1])]
+                connection.executemany(
+                    'DELETE FROM command WHERE id = ?',
+                    [(row[0],) for row in mine]
+                )
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return [tuple(row[1:]) for row in mine]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class ShardCoordinator:
+    """Heartbeat the registry and rebalance when the live workers change.
+
+    Also passes the commands of chats owned by the worker, forwarded by
+    whichever worker receives them, to ``on_command``.
+
+    Args:
+        registry (WorkerRegistry): shared worker registry
+        worker_id (str): id of this worker
+        on_rebalance: callable receiving the new HashRing
+        on_command: callable receiving chat id, command name and args
+        interval (float): seconds between heartbeats
+        ttl (float): seconds without heartbeat after which a worker is
+            considered gone
+
+    """
+
+    def __init__(self, registry: WorkerRegistry, worker_id: str,
+                 on_rebalance: Callable[[HashRing], None],
+                 on_command: Optional[Callable[[str, str, str], None]] = None,
+                 interval: float = 5, ttl: float = 15) -> None:
+        self.registry = registry
+        self.worker_id = worker_id
+        self.on_rebalance = on_rebalance
+        self.on_command = on_command
+        self.interval = interval
+        self.ttl = ttl
+        self.workers: Tuple[str, ...] = ()
+        self.ring = HashRing(())
+
+    def owns(self, key: str) -> bool:
+        """Whether the key belongs to the shard of this worker."""
+        return self.ring.node_for(key) == self.worker_id
+
+    async def forward(self, chat_id: str, name: str, args: str) -> None:
+        """Command handler for CommandListener handing commands over."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.registry.push_command, chat_id, name, args
+        )
+
+    async def run(self) -> None:
+        """Heartbeat forever; leave the registry when cancelled."""
+        try:
+            while True:
+                await self.step()
+                await asyncio.sleep(self.interval)
+        finally:
+            self.registry.leave(self.worker_id)
+
+    async def step(self) -> None:
+        """Heartbeat, rebalance if needed and take pending commands."""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                None, self.registry.heartbeat, self.worker_id
+            )
+            workers = tuple(await loop.run_in_executor(
+                None, self.registry.alive, self.ttl
+            ))
+            if self.worker_id in workers and workers != self.workers:
+                self.workers = workers
+                self.ring = HashRing(workers)
+                logger.info(f'Процессы бота: {", ".join(workers)}')
+                self.on_rebalance(self.ring)
+            if self.on_command is None:
+                return
+            commands = await loop.run_in_executor(
+                None, self.registry.take_commands, self.owns
+            )
+        except sqlite3.Error as error:
+            logger.error(f'Не удалось обновить список процессов: {error}')
+            return
+        for command in commands:
+            self.on_command(*command)
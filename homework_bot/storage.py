@@ -0,0 +1,402 @@
+"""Durable per-tenant polling state and notification outbox in SQLite."""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+)
+
+logger = logging.getLogger(__name__)
+
+LOAD_CHUNK = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tenant_state (
+    tenant_key TEXT PRIMARY KEY,
+    from_date INTEGER,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS homework_status (
+    tenant_key TEXT NOT NULL,
+    homework_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    date_updated TEXT,
+    homework_name TEXT,
+    transitions INTEGER,
+    PRIMARY KEY (tenant_key, homework_key)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    delivered REAL,
+    failed TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (delivered, created);
+'''
+
+# Columns added after the first release: table, column and its type
+MIGRATIONS = (
+    ('homework_status', 'date_updated', 'TEXT'),
+    ('homework_status', 'homework_name', 'TEXT'),
+    ('outbox', 'failed', 'TEXT'),
+    ('homework_status', 'transitions', 'INTEGER'),
+)
+
+
+class Notification(NamedTuple):
+    """Rendered message with the idempotency key of the event it reports."""
+
+    key: str
+    chat_id: str
+    text: str
+
+
+@dataclass
+class TenantState:
+    """Polling state of a single tenant kept between polls.
+
+    Attributes:
+        current_timestamp (int): cursor of the next request, None until
+            the first answer (see CursorManager.window)
+        last_error (str): fingerprint of the last reported error
+        statuses (dict): last known status per homework key
+        updated (dict): ``date_updated`` of the known status per homework
+            key, when the API gave one
+        names (dict): homework name per homework key
+        transitions (dict): status changes notified per homework key
+
+    """
+
+    current_timestamp: Optional[int] = None
+    last_error: Optional[str] = None
+    statuses: Dict[str, str] = field(default_factory=dict)
+    updated: Dict[str, str] = field(default_factory=dict)
+    names: Dict[str, str] = field(default_factory=dict)
+    transitions: Dict[str, int] = field(default_factory=dict)
+
+
+class StateStore:
+    """Write-behind store of TenantState objects and of the outbox.
+
+    Checkpoints are only queued in memory; ``flush`` writes everything
+    queued in one transaction, and repeated checkpoints of a tenant
+    between two flushes cost a single row write. The database runs in
+    WAL mode, so a flush does not block concurrent readers.
+
+    Notifications queued with a checkpoint are committed in the same
+    transaction as the cursor that produced them, and are only handed
+    out for delivery once committed (see ``autoflush``). A notification
+    whose key is already in the outbox is ignored, so a poll repeated
+    after a crash does not send the same status change twice.
+
+    Args:
+        path (str): SQLite database file
+        batch_size (int): queued rows that trigger an immediate flush
+        clock: callable returning wall clock time, stamps outbox records
+        fence: callable telling whether this process may still write; a
+            flush while it returns False drops the queued rows instead
+
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000,
+                 clock: Callable[[], float] = time.time,
+                 fence: Optional[Callable[[], bool]] = None) -> None:
+        self.batch_size = batch_size
+        self.clock = clock
+        self.fence = fence
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, Tuple] = {}
+        self._statuses: Dict[Tuple[str, str], Tuple] = {}
+        self._notifications: Dict[str, Notification] = {}
+        self._delivered: Dict[str, Optional[str]] = {}
+        self._committed: List[Notification] = []
+        self._urgent: Optional[asyncio.Event] = None
+        self._queued: Optional[asyncio.Event] = None
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Add the columns of MIGRATIONS missing in an older database."""
+        for table, column, column_type in MIGRATIONS:
+            columns = {
+                row[1] for row in
+                self._connection.execute(f'PRAGMA table_info({table})')
+            }
+            if column not in columns:
+                self._connection.execute(
+                    f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'
+                )
+
+    def load(self, tenant_keys: Optional[Iterable[str]] = None
+             ) -> Dict[str, TenantState]:
+        """Read the saved state of every tenant or of the given ones.
+
+        Returns:
+            dict: TenantState by tenant key
+
+        """
+        if tenant_keys is None:
+            where, chunks = '', [()]
+        else:
+            keys = list(tenant_keys)
+            chunks = [
+                keys[start:start + LOAD_CHUNK]
+                for start in range(0, len(keys), LOAD_CHUNK)
+            ]
+        states = {}
+        with self._lock:
+            for chunk in chunks:
+                if chunk:
+                    marks = ', '.join('?' * len(chunk))
+                    where = f' WHERE tenant_key IN ({marks})'
+                self._load_rows(states, where, chunk)
+        return states
+
+    def _load_rows(self, states: Dict[str, TenantState], where: str,
+                   keys: Iterable[str]) -> None:
+        rows = self._connection.execute(
+            'SELECT tenant_key, from_date, last_error FROM tenant_state'
+            + where, keys
+        )
+        for tenant_key, from_date, last_error in rows:
+            states[tenant_key] = TenantState(from_date, last_error)
+        rows = self._connection.execute(
+            'SELECT tenant_key, homework_key, status, date_updated, '
+            'homework_name, transitions '
+            'FROM homework_status' + where, keys
+        )
+        for (tenant_key, homework_key, status, date_updated, name,
+             transitions) in rows:
+            state = states.setdefault(tenant_key, TenantState())
+            state.statuses[homework_key] = status
+            if date_updated is not None:
+                state.updated[homework_key] = date_updated
+            if name is not None:
+                state.names[homework_key] = name
+            if transitions is not None:
+                state.transitions[homework_key] = transitions
+
+    def pending_notifications(self, chat_ids: Optional[Set[str]] = None
+                              ) -> List[Notification]:
+        """Committed notifications that were never delivered, oldest first.
+
+        Args:
+            chat_ids (set): only notifications to these chats
+
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key, chat_id, text FROM outbox '
+                'WHERE delivered IS NULL ORDER BY created'
+            ).fetchall()
+        return [
+            Notification(*row) for row in rows
+            if chat_ids is None or row[1] in chat_ids
+        ]
+
+    def checkpoint(self, tenant_key: str, state: TenantState,
+                   homework_keys: Optional[Iterable[str]] = None,
+                   notifications: Iterable[Notification] = ()) -> None:
+        """Queue the state of a tenant for the next flush.
+
+        Args:
+            tenant_key (str): tenant identifier
+            state (TenantState): state to save
+            homework_keys: homeworks whose status changed since the last
+                checkpoint, all of them are saved when omitted
+            notifications: messages to commit together with the state
+
+        """
+        keys = state.statuses if homework_keys is None else homework_keys
+        with self._lock:
+            self._tenants[tenant_key] = (
+                state.current_timestamp, state.last_error
+            )
+            for homework_key in keys:
+                self._statuses[(tenant_key, homework_key)] = (
+                    state.statuses[homework_key],
+                    state.updated.get(homework_key),
+                    state.names.get(homework_key),
+                    state.transitions.get(homework_key)
+                )
+            for notification in notifications:
+                self._notifications[notification.key] = notification
+            pending = len(self._tenants) + len(self._statuses)
+        if self._queued is not None:
+            self._queued.set()
+        if self._notifications and self._urgent is not None:
+            self._urgent.set()
+        if pending >= self.batch_size:
+            self.flush()
+
+    def mark_delivered(self, keys: Iterable[str]) -> None:
+        """Queue delivery marks of notifications for a prompt flush.
+
+        Marks are flushed like notifications, ``commit_delay`` after
+        being queued, to keep the window in which a process taking over
+        would resend them short.
+        """
+        with self._lock:
+            self._delivered.update(dict.fromkeys(keys))
+        if self._queued is not None:
+            self._queued.set()
+            self._urgent.set()
+
+    def mark_failed(self, keys: Iterable[str], error: str) -> None:
+        """Queue dead-letter marks of notifications that cannot be sent.
+
+        They are stored like delivery marks, so the notifications are no
+        longer pending, with the error kept in the ``failed`` column.
+        """
+        with self._lock:
+            self._delivered.update(dict.fromkeys(keys, error))
+        if self._queued is not None:
+            self._queued.set()
+            self._urgent.set()
+
+    def discard_queued(self) -> None:
+        """Forget rows queued since the last flush without writing them."""
+        with self._lock:
+            self._tenants = {}
+            self._statuses = {}
+            self._notifications = {}
+            self._delivered = {}
+
+    def has_queued(self) -> bool:
+        """Whether rows are waiting for a flush."""
+        return bool(
+            self._tenants or self._statuses or self._notifications
+            or self._delivered
+        )
+
+    def flush(self) -> None:
+        """Write all queued rows in a single transaction."""
+        with self._lock:
+            tenants, self._tenants = self._tenants, {}
+            statuses, self._statuses = self._statuses, {}
+            notifications, self._notifications = self._notifications, {}
+            delivered, self._delivered = self._delivered, {}
+            if not (tenants or statuses or notifications or delivered):
+                return
+            if self.fence is not None and not self.fence():
+                logger.warning('Состояние не сохранено: процесс не ведущий')
+                return
+            try:
+                committed = self._write(
+                    tenants, statuses, notifications, delivered
+                )
+            except Exception:
+                for key, row in tenants.items():
+                    self._tenants.setdefault(key, row)
+                for key, row in statuses.items():
+                    self._statuses.setdefault(key, row)
+                for key, notification in notifications.items():
+                    self._notifications.setdefault(key, notification)
+                self._delivered.update(delivered)
+                raise
+            self._committed.extend(committed)
+        logger.debug(
+            f'Сохранено состояние {len(tenants)} клиентов, '
+            f'{len(statuses)} статусов работ и '
+            f'{len(committed)} новых уведомлений'
+        )
+
+    def _write(self, tenants: Dict[str, Tuple],
+               statuses: Dict[Tuple[str, str], Tuple],
+               notifications: Dict[str, Notification],
+               delivered: Dict[str, Optional[str]]) -> List[Notification]:
+        connection = self._connection
+        committed = []
+        connection.execute('BEGIN')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO tenant_state '
+                '(tenant_key, from_date, last_error) VALUES (?, ?, ?)',
+                [(key, *row) for key, row in tenants.items()]
+            )
+            connection.executemany(
+                'INSERT OR REPLACE INTO homework_status '
+                '(tenant_key, homework_key, status, date_updated, '
+                'homework_name, transitions) VALUES (?, ?, ?, ?, ?, ?)',
+                [(*key, *row) for key, row in statuses.items()]
+            )
+            now = self.clock()
+            for notification in notifications.values():
+                cursor = connection.execute(
+                    'INSERT OR IGNORE INTO outbox '
+                    '(key, chat_id, text, created) VALUES (?, ?, ?, ?)',
+                    (*notification, now)
+                )
+                if cursor.rowcount:
+                    committed.append(notification)
+            connection.executemany(
+                'UPDATE outbox SET delivered = ?, failed = ? WHERE key = ?',
+                [(now, failed, key) for key, failed in delivered.items()]
+            )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return committed
+
+    def take_committed(self) -> List[Notification]:
+        """Notifications committed since the last call, ready to send."""
+        with self._lock:
+            committed, self._committed = self._committed, []
+        return committed
+
+    def prune(self, older_than: float) -> None:
+        """Forget delivered notifications created before the timestamp."""
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM outbox WHERE delivered IS NOT NULL '
+                'AND created < ?', (older_than,)
+            )
+
+    async def autoflush(
+            self, interval: float = 5, commit_delay: float = 0.05,
+            on_committed: Optional[Callable[[Notification], None]] = None
+    ) -> None:
+        """Flush queued rows forever.
+
+        A flush happens every ``interval`` seconds, or ``commit_delay``
+        seconds after a notification is queued so that notifications of
+        concurrent polls share one commit. Every committed notification
+        is passed to ``on_committed``. While nothing is queued the loop
+        sleeps until something is.
+        """
+        loop = asyncio.get_running_loop()
+        self._urgent = asyncio.Event()
+        self._queued = asyncio.Event()
+        while True:
+            if not self.has_queued():
+                await self._queued.wait()
+            try:
+                await asyncio.wait_for(self._urgent.wait(), interval)
+                await asyncio.sleep(commit_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._urgent.clear()
+            self._queued.clear()
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except sqlite3.Error as error:
+                logger.error(f'Не удалось сохранить состояние: {error}')
+            for notification in self.take_committed():
+                if on_committed is not None:
+                    on_committed(notification)
+
+    def close(self) -> None:
+        """Flush queued rows and close the database."""
+        self.flush()
+        self._connection.close()
@@ -0,0 +1,35 @@
+from homework_bot.alerts import AlertThrottle, fingerprint
+from utils import FakeClock
+
+
+class TestFingerprint:
+
+    def test_volatile_numbers_are_ignored(self):
+        first = Exception('Эндпоинт вернул код 500 в 1643723456')
+        second = Exception('Эндпоинт вернул код 502 в 1643723999')
+        assert fingerprint(first) == fingerprint(second)
+
+    def test_cause_class_is_used(self):
+        try:
+            try:
+                raise KeyError('homeworks')
+            except KeyError as error:
+                raise Exception('wrapped') from error
+        except Exception as error:
+            wrapped = error
+        assert fingerprint(wrapped) != fingerprint(Exception('wrapped'))
+
+
+class TestAlertThrottle:
+
+    def test_one_alert_per_interval(self):
+        clock = FakeClock()
+        throttle = AlertThrottle(interval=60, clock=clock)
+        assert throttle.allow('tenant', 'a')
+        assert throttle.allow('tenant', 'b')
+        assert not throttle.allow('tenant', 'a'), (
+            'Проверьте, что чередующиеся ошибки не повторяются в чате'
+        )
+        assert throttle.allow('other tenant', 'a')
+        clock.now = 60
+        assert throttle.allow('tenant', 'a')
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+from benchmarks import startup, stubs
+from benchmarks.run import benchmark, parse_args
+
+
+class TestWorld:
+
+    def test_status_cycle_and_latency(self):
+        world = stubs.World(1, change_interval=10)
+        offset = world.offsets[0]
+        assert world.status(0, offset - 1) is None
+        assert world.status(0, offset + 11) == ('rejected', offset + 10)
+        world.record_message(
+            'Изменился статус проверки работы "hw-0". '
+            'Работа проверена: у ревьюера есть замечания.',
+            offset + 12
+        )
+        stats = world.stats()
+        assert stats['notifications'] == 1
+        assert abs(stats['latency_p50'] - 2) < 1e-6
+
+
+class TestBenchmark:
+
+    def test_smoke(self):
+        args = parse_args([
+            '--tenants', '5', '--duration', '2', '--change-interval', '0.5',
+            '--interval', '0.2', '--reviewing-interval', '0.1',
+        ])
+        report = benchmark(args)
+        assert report['api_requests'] > 0
+        assert report['notifications'] > 0, (
+            'Проверьте, что бот доставляет уведомления заглушке Telegram'
+        )
+
+
+class TestStartup:
+
+    def test_import_defers_clients(self):
+        report = startup.measure(1)
+        assert report['import_ms_median'] > 0
+        assert report['deferred_loaded'] == [], (
+            'Проверьте, что requests и telegram импортируются '
+            'при первом использовании'
+        )
+
+    def test_import_does_not_touch_log_file(self, tmp_path):
+        log_file = tmp_path / 'bot.log'
+        subprocess.run(
+            [sys.executable, '-c', 'import homework'], cwd=startup.ROOT,
+            env={**os.environ, 'LOG_FILE': str(log_file)}, check=True,
+        )
+        assert not log_file.exists(), (
+            'Проверьте, что логирование настраивается в main()'
+        )
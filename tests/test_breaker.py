@@ -0,0 +1,61 @@
+from homework_bot.breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, breaker_for
+)
+from utils import FakeClock
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker('api', failure_threshold=3, clock=FakeClock())
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow(), (
+            'Проверьте, что при открытом предохранителе запросы не идут'
+        )
+
+    def test_single_probe_when_half_open(self):
+        clock = FakeClock()
+        changes = []
+        breaker = CircuitBreaker(
+            'api', failure_threshold=1, reset_timeout=10, clock=clock,
+            on_change=changes.append
+        )
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow(), (
+            'Проверьте, что в полуоткрытом состоянии идет одна проба'
+        )
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert changes == [OPEN, HALF_OPEN, CLOSED]
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(
+            'api', failure_threshold=1, reset_timeout=10, clock=clock
+        )
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        clock.now = 15
+        assert not breaker.allow()
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker('api', failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_breaker_is_shared_by_name(self):
+        assert breaker_for('test-endpoint') is breaker_for('test-endpoint')
+        assert breaker_for('test-endpoint') is not breaker_for('other')
@@ -0,0 +1,166 @@
+import json
+
+import pytest
+import requests
+import telegram
+
+import homework
+from homework_bot.alerts import AlertThrottle
+from homework_bot.quota import RequestQuota
+from utils import MockBot, MockResponse
+
+
+def practicum(answers):
+    def get(url, headers=None, params=None, **kwargs):
+        token = headers['Authorization'].split()[-1]
+        return answers[token]
+    return get
+
+
+def homeworks(name, status):
+    return MockResponse({
+        'homeworks': [{'id': name, 'homework_name': name, 'status': status}],
+        'current_date': 100,
+    })
+
+
+@pytest.fixture
+def sent(monkeypatch, tmp_path):
+    messages = []
+
+    class ChatBot(MockBot):
+        """Bot of a run, all of them sharing the list of messages."""
+
+        def send_message(self, chat_id, text):
+            messages.append((chat_id, text))
+
+        def get_me(self):
+            return {}
+
+        def get_chat(self, chat_id):
+            if chat_id == 'unknown':
+                raise Exception('Chat not found')
+
+    monkeypatch.setattr(telegram, 'Bot', ChatBot)
+    monkeypatch.setattr(homework, 'init_logger', lambda: None)
+    monkeypatch.setattr(homework, 'init_http_client', lambda: None)
+    monkeypatch.setattr(homework, 'STATE_DB', str(tmp_path / 'state.db'))
+    monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', 'bot-token')
+    monkeypatch.setattr(homework, 'api_quota', RequestQuota())
+    monkeypatch.setattr(homework, 'alert_throttle', AlertThrottle())
+    return messages
+
+
+def tenants_file(tmp_path, tenants):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([
+        {'practicum_token': token, 'chat_id': chat_id}
+        for token, chat_id in tenants
+    ]))
+    return str(path)
+
+
+class TestCli:
+
+    def test_run_is_the_default_command(self):
+        assert homework.parse_args([]).command == 'run'
+        args = homework.parse_args(['batch', 'tenants.json'])
+        assert (args.command, args.file) == ('batch', 'tenants.json')
+
+    def test_batch_polls_every_tenant_once(self, monkeypatch, tmp_path, sent):
+        monkeypatch.setattr(requests, 'get', practicum({
+            'a': homeworks('hw-a', 'approved'),
+            'b': homeworks('hw-b', 'rejected'),
+        }))
+        path = tenants_file(tmp_path, [('a', '1'), ('b', '2')])
+        assert homework.main(['batch', path]) == 0
+        assert sorted(chat_id for chat_id, _ in sent) == ['1', '2']
+        assert '"hw-a"' in dict(sent)['1']
+
+        assert homework.main(['batch', path]) == 0
+        assert len(sent) == 2, (
+            'Проверьте, что состояние сохраняется между запусками '
+            'и статус не отправляется повторно'
+        )
+
+    def test_poll_fails_on_api_error(self, monkeypatch, sent):
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'a')
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '1')
+        monkeypatch.setattr(homework, 'TENANTS_FILE', None)
+        monkeypatch.setattr(requests, 'get', practicum({
+            'a': MockResponse({}, status_code=400),
+        }))
+        assert homework.main(['poll']) == 1, (
+            'Проверьте, что неудачный опрос завершает программу с кодом 1'
+        )
+        assert sent[0][1].startswith('Сбой в работе программы')
+
+    def test_validate_tokens(self, monkeypatch, tmp_path, sent, capsys):
+        monkeypatch.setattr(requests, 'get', practicum({
+            'good': homeworks('hw', 'approved'),
+            'bad': MockResponse({}, status_code=401),
+        }))
+        monkeypatch.setattr(homework, 'TENANTS_FILE', tenants_file(
+            tmp_path, [('good', '1'), ('bad', 'unknown')]
+        ))
+        assert homework.main(['validate-tokens']) == 1
+        output = capsys.readouterr().out
+        assert 'TELEGRAM_TOKEN: ok' in output
+        assert 'chat 1: ok' in output
+        assert 'chat unknown: ошибка' in output
+        assert output.count('ошибка') == 2
+        assert sent == [], 'Проверьте, что проверка токенов ничего не шлёт'
+
+
+class TestBackfill:
+
+    def test_history_is_summed_up_once(self, monkeypatch, tmp_path, sent):
+        requested = []
+        history = MockResponse({
+            'homeworks': [
+                {'id': 3, 'homework_name': 'hw3', 'status': 'reviewing'},
+                {'id': 2, 'homework_name': 'hw2', 'status': 'approved'},
+                {'id': 2, 'homework_name': 'hw2', 'status': 'rejected'},
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            ],
+            'current_date': 100,
+        })
+
+        def get(url, headers=None, params=None, **kwargs):
+            requested.append(params['from_date'])
+            return history
+
+        monkeypatch.setattr(requests, 'get', get)
+        path = tenants_file(tmp_path, [('a', '1')])
+        assert homework.main(['backfill', path]) == 0
+        assert requested == [0], (
+            'Проверьте, что история запрашивается с from_date=0'
+        )
+        [(chat_id, text)] = sent
+        assert chat_id == '1'
+        assert 'работ: 3' in text and 'Принято: 2' in text
+        assert '"hw3"' in text
+
+        assert homework.main(['batch', path]) == 0
+        assert len(sent) == 1, (
+            'Проверьте, что после загрузки истории старые статусы '
+            'не отправляются повторно'
+        )
+        assert requested[1] == 100 - homework.CURSOR_OVERLAP, (
+            'Проверьте, что окно запроса перекрывает прошлый ответ'
+        )
+
+        assert homework.main(['backfill', path, '--since', '50']) == 0
+        assert len(requested) == 2, (
+            'Проверьте, что история известных клиентов не загружается'
+        )
+        assert len(sent) == 1
+
+    def test_failed_tenant(self, monkeypatch, tmp_path, sent):
+        monkeypatch.setattr(requests, 'get', practicum({
+            'a': homeworks('hw', 'approved'),
+            'b': MockResponse({'homeworks': 'none'}),
+        }))
+        path = tenants_file(tmp_path, [('a', '1'), ('b', '2')])
+        assert homework.main(['backfill', path]) == 1
+        assert [chat_id for chat_id, _ in sent] == ['1']
@@ -0,0 +1,117 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from homework_bot.client import DeadlineExceeded, HttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    body_delay = 0
+    trickle = None
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        if Handler.trickle is not None:
+            return self.trickle_response()
+        body = b'{"homeworks": [], "current_date": 1}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body) * 2))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+        time.sleep(Handler.body_delay)
+        self.wfile.write(body)
+
+    def trickle_response(self):
+        headers, body = Handler.trickle
+        head = (b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n'
+                % len(body))
+        try:
+            if headers:
+                for byte in head:
+                    self.wfile.write(bytes([byte]))
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            else:
+                self.wfile.write(head)
+            for byte in body:
+                self.wfile.write(bytes([byte]))
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.connections = set()
+    Handler.body_delay = 0
+    Handler.trickle = None
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestHttpClient:
+
+    def test_connection_is_reused(self, server):
+        client = HttpClient(pool_size=1)
+        for _ in range(5):
+            response = client.get(server)
+            assert response.status_code == 200
+        client.close()
+        assert len(Handler.connections) == 1, (
+            'Проверьте, что клиент переиспользует соединение'
+        )
+
+    def test_body_is_read(self, server):
+        client = HttpClient()
+        response = client.get(server)
+        assert response.content.startswith(b'{"homeworks"')
+        client.close()
+
+    @pytest.mark.parametrize('headers', [False, True])
+    def test_deadline_covers_whole_body(self, server, headers):
+        Handler.trickle = (headers, b'{"homeworks": [], "current_date": 1}')
+        client = HttpClient(deadline=0.5, read_timeout=5)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            client.get(server)
+        assert time.monotonic() - started < 1, (
+            'Проверьте, что медленный ответ прерывается по истечении '
+            'срока, а не после получения всего тела'
+        )
+        Handler.trickle = None
+        assert client.get(server).status_code == 200, (
+            'Проверьте, что клиент работает после прерванного запроса'
+        )
+        client.close()
+
+    def test_calls_share_one_watchdog_thread(self, server):
+        client = HttpClient(pool_size=4)
+        threads = [
+            threading.Thread(target=client.get, args=(server,))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        client.close()
+        watchdogs = [
+            thread for thread in threading.enumerate()
+            if thread.name == 'watchdog' or 'Timer' in type(thread).__name__
+        ]
+        assert len(watchdogs) == 1, (
+            'Проверьте, что сроки всех запросов отслеживает один поток'
+        )
@@ -0,0 +1,160 @@
+import asyncio
+import email.utils
+import time
+
+import pytest
+import requests
+
+import homework
+from homework_bot.clock import SystemClock, VirtualClock
+from homework_bot.engine import Tenant
+from homework_bot.storage import StateStore
+from utils import MockBot, MockResponse
+
+DAY = 24 * 60 * 60
+
+
+class TestVirtualClock:
+
+    def test_timers_fire_in_simulated_order(self):
+        clock = VirtualClock()
+        fired = []
+
+        async def sleeper(name, delay):
+            await asyncio.sleep(delay)
+            fired.append((name, clock.monotonic()))
+
+        async def main():
+            asyncio.get_running_loop().call_later(5, fired.append, 'later')
+            await asyncio.gather(sleeper('week', 7 * DAY), sleeper('min', 60))
+
+        started = time.perf_counter()
+        clock.run(main())
+        assert fired == ['later', ('min', 60), ('week', 7 * DAY)]
+        assert time.perf_counter() - started < 1, (
+            'Проверьте, что виртуальное время не ждёт реального'
+        )
+        assert clock.time() == clock.epoch + 7 * DAY
+
+    def test_wait_for_timeout(self):
+        clock = VirtualClock()
+
+        async def main():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.Event().wait(), 600)
+
+        clock.run(main())
+        assert clock.monotonic() == 600
+
+    def test_clock_waits_for_executor_jobs(self):
+        clock = VirtualClock()
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            job = loop.run_in_executor(None, time.sleep, 0.05)
+            timer = asyncio.ensure_future(asyncio.sleep(10))
+            await job
+            assert not timer.done(), (
+                'Проверьте, что время стоит, пока работает поток исполнителя'
+            )
+            await timer
+
+        clock.run(main())
+        assert clock.monotonic() == 10
+
+    def test_advance(self):
+        clock = VirtualClock(start=5)
+        clock.advance(10)
+        assert clock.monotonic() == 15
+        with pytest.raises(ValueError):
+            clock.advance(-1)
+
+
+@pytest.fixture
+def virtual_clock():
+    clock = VirtualClock()
+    homework.set_clock(clock)
+    yield clock
+    homework.set_clock(SystemClock())
+
+
+class TestSimulation:
+
+    def test_week_of_polling(self, virtual_clock, monkeypatch, tmp_path):
+        clock = virtual_clock
+        polls = []
+
+        def get(*args, **kwargs):
+            polls.append(clock.monotonic())
+            status = 'reviewing' if clock.monotonic() < DAY else 'approved'
+            return MockResponse({
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'hw', 'status': status}
+                ],
+                'current_date': int(clock.time()),
+            })
+
+        monkeypatch.setattr(requests, 'get', get)
+        monkeypatch.setattr(homework, 'TELEGRAM_COMMANDS', False)
+        bot = MockBot()
+        store = StateStore(str(tmp_path / 'state.sqlite3'), clock=clock.time)
+
+        async def simulate():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    homework.run_bot(bot, [Tenant('token', '1')], store),
+                    7 * DAY
+                )
+
+        started = time.perf_counter()
+        clock.run(simulate())
+        store.close()
+        assert time.perf_counter() - started < 30
+        assert len(bot.messages) == 2, (
+            'Проверьте, что за неделю отправлено по сообщению на каждую '
+            'смену статуса'
+        )
+        reviewing = [moment for moment in polls if moment < DAY]
+        assert len(reviewing) == pytest.approx(
+            DAY / homework.REVIEWING_RETRY_TIME, rel=0.15
+        )
+        assert len(polls) - len(reviewing) < 7 * DAY / homework.RETRY_TIME
+
+    def test_retry_after_date_follows_virtual_time(self, virtual_clock,
+                                                   monkeypatch, tmp_path):
+        clock = virtual_clock
+        polls = []
+
+        def get(*args, **kwargs):
+            polls.append(clock.monotonic())
+            if len(polls) == 1:
+                response = MockResponse({}, status_code=429)
+                response.headers = {'Retry-After': email.utils.formatdate(
+                    clock.time() + 3600, usegmt=True
+                )}
+                return response
+            return MockResponse({
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'hw', 'status': 'reviewing'}
+                ],
+                'current_date': int(clock.time()),
+            })
+
+        monkeypatch.setattr(requests, 'get', get)
+        monkeypatch.setattr(homework, 'TELEGRAM_COMMANDS', False)
+        store = StateStore(str(tmp_path / 'state.sqlite3'), clock=clock.time)
+
+        async def simulate():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    homework.run_bot(MockBot(), [Tenant('token', '1')], store),
+                    2 * 3600
+                )
+
+        clock.run(simulate())
+        store.close()
+        assert len(polls) > 1
+        assert polls[1] - polls[0] == pytest.approx(3600, abs=60), (
+            'Проверьте, что дата в Retry-After сравнивается '
+            'с часами бота, а не с системными'
+        )
@@ -0,0 +1,201 @@
+import asyncio
+from operator import attrgetter
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import homework
+from homework_bot.commands import CommandListener, StatusCache, parse_command
+from homework_bot.engine import PollingEngine, Tenant
+from homework_bot.model import Homework
+from homework_bot.scheduler import IDLE
+from homework_bot.storage import TenantState
+from utils import MockDelivery, MockResponse
+
+
+def update(update_id, text, chat_id=1):
+    return SimpleNamespace(
+        update_id=update_id,
+        message=SimpleNamespace(chat_id=chat_id, text=text)
+    )
+
+
+def key(homework):
+    return homework['id']
+
+
+class TestStatusCache:
+
+    def test_latest_homework_wins(self):
+        cache = StatusCache()
+        cache.update('t', [{'id': 1, 'status': 'reviewing'}], key, at=1)
+        cache.update('t', [
+            {'id': 1, 'status': 'approved'},
+            {'id': 1, 'status': 'rejected'},
+            {'id': 2, 'status': 'reviewing'},
+        ], key, at=2)
+        statuses = {hw['id']: hw['status'] for hw in cache.homeworks('t')}
+        assert statuses == {1: 'approved', 2: 'reviewing'}, (
+            'Проверьте, что в кэше остаётся последний статус каждой работы'
+        )
+        assert cache.updated('t') == 2
+        assert cache.homeworks('other') == []
+
+    def test_history_is_bounded_and_newest_first(self):
+        cache = StatusCache(history_size=2)
+        for at in range(3):
+            cache.record_change('t', {'id': at}, at)
+        assert [at for at, _ in cache.history('t')] == [2, 1]
+
+
+class TestParseCommand:
+
+    @pytest.mark.parametrize('text, expected', [
+        ('/status', ('1', 'status', '')),
+        ('/Check@HomeworkBot now ', ('1', 'check', 'now')),
+        ('hello', None),
+        ('/', None),
+        (None, None),
+    ])
+    def test_parse(self, text, expected):
+        assert parse_command(update(1, text)) == expected
+
+    def test_update_without_message(self):
+        assert parse_command(SimpleNamespace(update_id=1)) is None
+
+
+class TestCommandListener:
+
+    def test_dispatch_moves_offset_and_handles_commands(self):
+        handled = []
+
+        async def handle(chat_id, name, args):
+            handled.append((chat_id, name))
+            if name == 'boom':
+                raise RuntimeError('boom')
+
+        listener = CommandListener(lambda **kwargs: [], handle)
+
+        async def main():
+            listener.dispatch([
+                update(5, '/boom'), update(6, 'hi'), update(7, '/status')
+            ])
+            await asyncio.sleep(0)
+
+        asyncio.run(main())
+        assert listener.offset == 8, (
+            'Проверьте, что полученные обновления подтверждаются'
+        )
+        assert handled == [('1', 'boom'), ('1', 'status')]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = StatusCache()
+    monkeypatch.setattr(homework, 'status_cache', cache)
+    return cache
+
+
+def run_command(engine, command, chat_id='1', states=None):
+    delivery = MockDelivery()
+    tenants_by_chat = {}
+    for tenant in engine.tenants.values():
+        tenants_by_chat.setdefault(tenant.chat_id, []).append(tenant)
+    asyncio.run(homework.handle_command(
+        delivery, engine, tenants_by_chat, chat_id, command, '',
+        states=states
+    ))
+    assert all(delivery.immediate), (
+        'Проверьте, что ответы на команды не ждут окна сводки'
+    )
+    return [text for _, text in delivery.messages]
+
+
+class TestHandleCommand:
+
+    def test_status_is_served_from_cache(self, cache):
+        tenant = Tenant('token', '1')
+        polls = []
+
+        async def poll(tenant):
+            polls.append(tenant)
+            return IDLE
+
+        cache.update(tenant.key, [Homework.from_dict(
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+        )], attrgetter('key'), at=0)
+        [reply] = run_command(PollingEngine([tenant], poll), 'status')
+        assert '"hw1": Работа проверена: ревьюеру всё понравилось' in reply
+        assert polls == [], 'Проверьте, что /status не обращается к API'
+
+    def test_check_polls_out_of_schedule(self, cache):
+        tenant = Tenant('token', '1')
+
+        async def poll(tenant):
+            cache.update(tenant.key, [Homework.from_dict(
+                {'id': 1, 'homework_name': 'hw1', 'status': 'rejected'}
+            )], attrgetter('key'), at=0)
+            return IDLE
+
+        engine = PollingEngine([tenant], poll)
+        [reply] = run_command(engine, 'check')
+        assert 'у ревьюера есть замечания' in reply, (
+            'Проверьте, что /check отвечает свежими статусами'
+        )
+        assert tenant.key in engine.scheduler.timers
+
+    def test_check_answers_statuses_outside_of_window(self, cache,
+                                                       monkeypatch):
+        tenant = Tenant('token', '1')
+        states = {tenant.key: TenantState(50, None, {'7': 'approved'})}
+        monkeypatch.setattr(
+            requests, 'get', lambda *args, **kwargs: MockResponse(
+                {'homeworks': [], 'current_date': 100}
+            )
+        )
+
+        async def poll(tenant):
+            return await homework.poll_tenant(
+                MockDelivery(), tenant, states[tenant.key]
+            )
+
+        engine = PollingEngine([tenant], poll)
+        [reply] = run_command(engine, 'check', states=states)
+        assert 'Работа проверена: ревьюеру всё понравилось' in reply, (
+            'Проверьте, что /check отвечает сохранёнными статусами, '
+            'которых нет в окне from_date'
+        )
+        assert '/check' not in reply
+
+    def test_check_without_homeworks(self, cache):
+        tenant = Tenant('token', '1')
+
+        async def poll(tenant):
+            return IDLE
+
+        [reply] = run_command(PollingEngine([tenant], poll), 'check')
+        assert '/check' not in reply, (
+            'Проверьте, что ответ на /check не предлагает отправить /check'
+        )
+
+    def test_history(self, cache):
+        tenant = Tenant('token', '1')
+        engine = PollingEngine([tenant], None)
+        assert run_command(engine, 'history') == [
+            'Статусы работ пока не менялись'
+        ]
+        cache.record_change(tenant.key, Homework.from_dict(
+            {'homework_name': 'hw1', 'status': 'reviewing'}
+        ), 0)
+        [reply] = run_command(engine, 'history')
+        assert '"hw1": Работа взята на проверку ревьюером.' in reply
+
+    def test_unknown_chat(self, cache):
+        engine = PollingEngine([Tenant('token', '1')], None)
+        [reply] = run_command(engine, 'status', chat_id='2')
+        assert 'не подписан' in reply
+
+    def test_help(self, cache):
+        engine = PollingEngine([Tenant('token', '1')], None)
+        assert run_command(engine, 'start') == [homework.COMMANDS_HELP]
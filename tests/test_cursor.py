@@ -0,0 +1,53 @@
+import logging
+
+from homework_bot.cursor import CursorManager
+from utils import FakeClock
+
+
+class TestCursorManager:
+
+    def test_window_overlaps_the_cursor(self):
+        cursors = CursorManager(overlap=60, clock=FakeClock(1000))
+        assert cursors.window(500) == 440, (
+            'Проверьте, что запрос захватывает интервал до курсора'
+        )
+        assert cursors.window(10) == 0
+        assert cursors.window(None) == 940
+
+    def test_cursor_follows_current_date(self):
+        cursors = CursorManager(clock=FakeClock(1000))
+        assert cursors.advance(500, {'current_date': 900}, 1000) == 900
+        assert cursors.advance(900, {'current_date': 800}, 1000) == 900, (
+            'Проверьте, что курсор не сдвигается назад'
+        )
+
+    def test_missing_current_date_uses_corrected_clock(self, caplog):
+        clock = FakeClock(1000)
+        cursors = CursorManager(max_skew=300, clock=clock)
+        with caplog.at_level(logging.WARNING):
+            cursors.advance(None, {'current_date': 5000}, 1000)
+        assert 'расходятся' in caplog.text, (
+            'Проверьте, что большое расхождение часов попадает в лог'
+        )
+        clock.now = 1100
+        assert cursors.now() == 5100
+        assert cursors.advance(5000, {}, 1050) == 5050, (
+            'Проверьте, что без current_date курсор сдвигается по '
+            'локальным часам с поправкой на расхождение'
+        )
+        assert cursors.window(None) == 5040
+
+    def test_offset_ignores_odd_answers(self, caplog):
+        cursors = CursorManager(clock=FakeClock(1_700_000_000))
+        with caplog.at_level(logging.WARNING):
+            cursors.advance(None, {'current_date': 100}, 0)
+        assert cursors.offset == 0, (
+            'Проверьте, что неправдоподобный current_date не меняет '
+            'расхождение часов'
+        )
+        assert 'отброшен' in caplog.text
+        for offset in (10, 12, 5000, 11):
+            cursors.advance(None, {'current_date': 1_700_000_000 + offset}, 0)
+        assert cursors.offset == 11.5, (
+            'Проверьте, что расхождение часов - медиана последних замеров'
+        )
@@ -0,0 +1,120 @@
+import json
+
+import pytest
+import requests
+
+import homework
+from homework_bot.decoding import BodyDecoder, load_backend
+from homework_bot.quota import RequestQuota
+
+
+class CountingLoads:
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, body):
+        self.calls += 1
+        return json.loads(body)
+
+
+class TestBackends:
+
+    def test_stdlib_backend(self):
+        name, loads = load_backend('json')
+        assert name == 'json'
+        assert loads(b'{"a": 1}') == {'a': 1}
+
+    def test_auto_picks_installed_backend(self):
+        name, loads = load_backend()
+        assert name in ('orjson', 'ujson', 'json')
+        with pytest.raises(ValueError):
+            loads(b'{not json')
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            load_backend('yaml')
+
+
+class TestBodyDecoder:
+
+    def test_unchanged_body_is_not_decoded_again(self):
+        loads = CountingLoads()
+        decoder = BodyDecoder(loads)
+        first = decoder.decode('token', b'{"homeworks": []}')
+        second = decoder.decode('token', b'{"homeworks": []}')
+        assert second is first
+        assert loads.calls == 1, (
+            'Проверьте, что неизменившийся ответ не декодируется повторно'
+        )
+        decoder.decode('token', b'{"homeworks": [], "current_date": 1}')
+        decoder.decode('other', b'{"homeworks": []}')
+        assert loads.calls == 3
+        assert decoder.hits == 1
+
+    def test_current_date_is_patched_in(self):
+        loads = CountingLoads()
+        decoder = BodyDecoder(loads)
+        body = '{{"homeworks": [{{"id": 1}}], "current_date": {}}}'
+        first = decoder.decode('token', body.format(100).encode())
+        second = decoder.decode('token', body.format(160).encode())
+        assert loads.calls == 1, (
+            'Проверьте, что ответ, отличающийся только current_date, '
+            'не декодируется повторно'
+        )
+        assert second == {'homeworks': [{'id': 1}], 'current_date': 160}
+        assert first['current_date'] == 100
+
+    def test_nested_current_date_is_not_patched(self):
+        loads = CountingLoads()
+        decoder = BodyDecoder(loads)
+        body = '{{"homeworks": [{{"current_date": {}}}]}}'
+        decoder.decode('token', body.format(1).encode())
+        second = decoder.decode('token', body.format(2).encode())
+        assert second == {'homeworks': [{'current_date': 2}]}
+        assert loads.calls == 2
+
+    def test_cache_is_bounded(self):
+        loads = CountingLoads()
+        decoder = BodyDecoder(loads, cache_size=1)
+        decoder.decode('a', b'1')
+        decoder.decode('b', b'2')
+        decoder.decode('a', b'1')
+        assert loads.calls == 3
+
+    def test_malformed_body_raises_value_error(self):
+        decoder = BodyDecoder()
+        with pytest.raises(ValueError):
+            decoder.decode('token', b'<html>')
+        with pytest.raises(ValueError):
+            decoder.decode('token', b'<html>')
+
+
+class RawResponse:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+
+
+class TestApiAnswer:
+
+    @pytest.fixture(autouse=True)
+    def decoder(self, monkeypatch):
+        monkeypatch.setattr(homework, 'api_quota', RequestQuota())
+        monkeypatch.setattr(homework, 'json_decoder', BodyDecoder())
+
+    def test_body_is_decoded(self, monkeypatch):
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+            RawResponse(b'{"homeworks": [], "current_date": 5}')
+        ))
+        assert homework.get_api_answer(1) == {
+            'homeworks': [], 'current_date': 5
+        }
+
+    def test_malformed_body(self, monkeypatch):
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+            RawResponse(b'Bad Gateway')
+        ))
+        with pytest.raises(ValueError):
+            homework.get_api_answer(1)
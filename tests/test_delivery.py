@@ -0,0 +1,239 @@
+import asyncio
+import threading
+
+from homework_bot.delivery import DIGEST_HEADER, DeliveryQueue, retry_after
+from homework_bot.ratelimit import TokenBucket
+from utils import FakeClock
+
+
+class RetryAfter(Exception):
+
+    def __init__(self, seconds):
+        super().__init__(f'Flood control exceeded. Retry in {seconds} s')
+        self.retry_after = seconds
+
+
+class Unauthorized(Exception):
+    pass
+
+
+def deliver(queue, messages):
+    async def run():
+        worker = asyncio.create_task(queue.run())
+        for message in messages:
+            queue.put(*message)
+        await asyncio.wait_for(queue.join(), 5)
+        worker.cancel()
+
+    asyncio.run(run())
+
+
+class TestTokenBucket:
+
+    def test_rate_and_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0.5
+        clock.now = 0.5
+        assert bucket.try_acquire() == 0
+
+
+class TestDeliveryQueue:
+
+    def test_pending_messages_are_coalesced(self):
+        sent = []
+        release = threading.Event()
+
+        def send(chat_id, text):
+            release.wait(1)
+            sent.append((chat_id, text))
+
+        queue = DeliveryQueue(send, chat_rate=1000, chat_burst=1000)
+
+        async def run():
+            worker = asyncio.create_task(queue.run())
+            queue.put(1, 'first')
+            await asyncio.sleep(0.05)
+            queue.put(1, 'second')
+            queue.put(1, 'third')
+            queue.put(2, 'other chat')
+            release.set()
+            await asyncio.wait_for(queue.join(), 5)
+            worker.cancel()
+
+        asyncio.run(run())
+        assert (1, 'second\n\nthird') in sent, (
+            'Проверьте, что ожидающие сообщения в один чат объединяются'
+        )
+        assert len(sent) == 3
+
+    def test_retry_after_is_honored(self):
+        attempts = []
+
+        def send(chat_id, text):
+            attempts.append(text)
+            if len(attempts) == 1:
+                try:
+                    raise RetryAfter(0.05)
+                except RetryAfter as error:
+                    raise Exception('wrapped') from error
+
+        queue = DeliveryQueue(send)
+        deliver(queue, [(1, 'hello')])
+        assert attempts == ['hello', 'hello']
+
+    def test_message_dropped_after_max_retries(self):
+        attempts = []
+
+        def send(chat_id, text):
+            attempts.append(text)
+            raise Exception('network down')
+
+        queue = DeliveryQueue(
+            send, max_retries=2, retry_delay=0.01, chat_rate=1000
+        )
+        deliver(queue, [(1, 'hello')])
+        assert len(attempts) == 3
+        assert len(queue) == 0
+
+    def test_keyed_message_survives_max_retries(self):
+        attempts = []
+
+        def send(chat_id, text):
+            attempts.append(text)
+            if len(attempts) <= 4:
+                raise Exception('network down')
+
+        delivered = []
+        queue = DeliveryQueue(
+            send, max_retries=2, retry_delay=0.01, chat_rate=1000,
+            on_delivered=delivered.extend
+        )
+        deliver(queue, [(1, 'plain'), (1, 'keyed', 'k1')])
+        assert attempts[-1] == 'keyed', (
+            'Проверьте, что сообщения из outbox не теряются после '
+            'исчерпания попыток'
+        )
+        assert len(attempts) == 5
+        assert delivered == ['k1']
+
+    def test_backoff_reaches_max_retry_delay(self):
+        queue = DeliveryQueue(
+            print, max_retries=5, retry_delay=1, max_retry_delay=300
+        )
+        delays = [queue.backoff(attempt) for attempt in range(1, 12)]
+        assert delays[:6] == [1, 2, 4, 8, 16, 32]
+        assert delays[-1] == 300, (
+            'Проверьте, что задержка растёт до max_retry_delay, '
+            'а не останавливается после max_retries'
+        )
+        assert queue.backoff(10 ** 6) == 300
+
+    def test_permanent_error_is_dead_lettered(self):
+        attempts = []
+
+        def send(chat_id, text):
+            attempts.append(text)
+            try:
+                raise Unauthorized('Forbidden: bot was blocked by the user')
+            except Unauthorized as error:
+                raise Exception('wrapped') from error
+
+        delivered, dead = [], []
+        queue = DeliveryQueue(
+            send, retry_delay=0.01, chat_rate=1000,
+            on_delivered=delivered.extend,
+            on_dead=lambda keys, error: dead.append((keys, error))
+        )
+        deliver(queue, [(1, 'keyed', 'k1')])
+        assert attempts == ['keyed'], (
+            'Проверьте, что постоянные ошибки Telegram не повторяются'
+        )
+        assert dead == [(['k1'], 'wrapped')]
+        assert delivered == []
+
+    def test_retry_after_unwraps_cause(self):
+        try:
+            try:
+                raise RetryAfter(3)
+            except RetryAfter as error:
+                raise Exception('wrapped') from error
+        except Exception as error:
+            assert retry_after(error) == 3
+        assert retry_after(Exception('plain')) is None
+
+    def test_keys_of_delivered_batch_are_reported(self):
+        delivered = []
+        queue = DeliveryQueue(
+            lambda chat_id, text: None, on_delivered=delivered.extend
+        )
+        deliver(queue, [(1, 'plain'), (1, 'keyed', 'k1'), (2, 'other', 'k2')])
+        assert sorted(delivered) == ['k1', 'k2']
+
+    def test_digest_window_merges_burst(self):
+        sent = []
+
+        def send(chat_id, text):
+            sent.append((chat_id, text))
+
+        queue = DeliveryQueue(send, chat_rate=1000, digest_window=0.05)
+
+        async def run():
+            worker = asyncio.create_task(queue.run())
+            queue.put(1, 'first')
+            await asyncio.sleep(0.01)
+            assert sent == [], (
+                'Проверьте, что сообщения ждут закрытия окна сводки'
+            )
+            queue.put(1, 'second')
+            queue.put(2, 'other chat')
+            await asyncio.wait_for(queue.join(), 5)
+            worker.cancel()
+
+        asyncio.run(run())
+        header = DIGEST_HEADER.format(count=2)
+        assert sorted(sent) == [
+            (1, f'{header}\n\nfirst\n\nsecond'), (2, 'other chat')
+        ]
+
+    def test_immediate_message_skips_digest(self):
+        sent = []
+        queue = DeliveryQueue(
+            lambda chat_id, text: sent.append(text), chat_rate=1000,
+            digest_window=60
+        )
+
+        async def run():
+            worker = asyncio.create_task(queue.run())
+            queue.put(1, 'status change')
+            queue.put(1, 'reply', immediate=True)
+            await asyncio.wait_for(queue.join(), 5)
+            worker.cancel()
+
+        asyncio.run(run())
+        assert sent == ['status change', 'reply'], (
+            'Проверьте, что срочное сообщение закрывает окно сводки '
+            'и отправляется без заголовка'
+        )
+
+    def test_digest_size_closes_window_early(self):
+        sent = []
+        queue = DeliveryQueue(
+            lambda chat_id, text: sent.append(text), chat_rate=1000,
+            digest_window=60, digest_size=3
+        )
+
+        async def run():
+            worker = asyncio.create_task(queue.run())
+            for text in ('a', 'b', 'c'):
+                queue.put(1, text)
+            await asyncio.wait_for(queue.join(), 5)
+            worker.cancel()
+
+        asyncio.run(run())
+        assert sent == [f'{DIGEST_HEADER.format(count=3)}\n\na\n\nb\n\nc'], (
+            'Проверьте, что сводка отправляется сразу при достижении '
+            'порога размера'
+        )
@@ -0,0 +1,60 @@
+from homework_bot.diff import diff_statuses
+
+
+def key(homework):
+    return str(homework['id'])
+
+
+class TestDiffStatuses:
+
+    def test_only_transitions_are_returned(self):
+        known = {'1': 'reviewing', '2': 'approved'}
+        homeworks = [
+            {'id': 3, 'status': 'reviewing'},
+            {'id': 2, 'status': 'approved'},
+            {'id': 1, 'status': 'rejected'},
+        ]
+        changed = diff_statuses(known, homeworks, key)
+        assert [hw['id'] for hw in changed] == [1, 3], (
+            'Проверьте, что возвращаются все изменившиеся работы, '
+            'начиная со старых'
+        )
+        assert known == {'1': 'reviewing', '2': 'approved'}
+
+    def test_latest_entry_wins(self):
+        homeworks = [
+            {'id': 1, 'status': 'approved'},
+            {'id': 1, 'status': 'reviewing'},
+        ]
+        changed = diff_statuses({}, homeworks, key)
+        assert changed == [homeworks[0]]
+
+    def test_no_changes(self):
+        homeworks = [{'id': 1, 'status': 'approved'}]
+        assert diff_statuses({'1': 'approved'}, homeworks, key) == []
+        assert diff_statuses({}, [], key) == []
+
+    def test_return_to_known_status_is_a_transition(self):
+        homeworks = [
+            {'id': 1, 'status': 'reviewing', 'date': '2022-01-02T10:00:00Z'},
+        ]
+        changed = diff_statuses(
+            {'1': 'reviewing'}, homeworks, key,
+            updated={'1': '2022-01-01T10:00:00Z'}, date=lambda hw: hw['date']
+        )
+        assert changed == homeworks, (
+            'Проверьте, что работа, вернувшаяся в известный статус '
+            'между опросами, считается изменившейся'
+        )
+
+    def test_overlap_is_not_reported_twice(self):
+        homeworks = [
+            {'id': 1, 'status': 'reviewing', 'date': '2022-01-01T10:00:00Z'},
+            {'id': 2, 'status': 'approved'},
+        ]
+        changed = diff_statuses(
+            {'1': 'reviewing', '2': 'approved'}, homeworks, key,
+            updated={'1': '2022-01-01T10:00:00Z'},
+            date=lambda hw: hw.get('date')
+        )
+        assert changed == []
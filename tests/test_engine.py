@@ -0,0 +1,156 @@
+import asyncio
+
+from homework_bot.engine import PollingEngine, Tenant
+
+
+class TestPollingEngine:
+
+    def test_run_once_polls_every_tenant(self):
+        tenants = [Tenant(f'token{i}', str(i)) for i in range(50)]
+        polled = []
+
+        async def poll(tenant):
+            await asyncio.sleep(0)
+            polled.append(tenant)
+
+        engine = PollingEngine(tenants, poll, concurrency=5)
+        asyncio.run(engine.run_once())
+        assert sorted(polled, key=lambda t: int(t.chat_id)) == tenants, (
+            'Проверьте, что за цикл опрашивается каждый клиент'
+        )
+
+    def test_concurrency_is_bounded(self):
+        tenants = [Tenant(f'token{i}', str(i)) for i in range(20)]
+        in_flight = []
+        peak = []
+
+        async def poll(tenant):
+            in_flight.append(tenant)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.001)
+            in_flight.remove(tenant)
+
+        engine = PollingEngine(tenants, poll, concurrency=3)
+        asyncio.run(engine.run_once())
+        assert max(peak) == 3, (
+            'Проверьте, что одновременно выполняется не больше '
+            '`concurrency` опросов'
+        )
+
+    def test_poll_error_does_not_stop_cycle(self):
+        tenants = [Tenant('bad', '1'), Tenant('good', '2')]
+        polled = []
+
+        async def poll(tenant):
+            if tenant.practicum_token == 'bad':
+                raise RuntimeError('boom')
+            polled.append(tenant)
+
+        asyncio.run(PollingEngine(tenants, poll).run_once())
+        assert polled == [tenants[1]]
+
+    def test_tenant_key_hides_token(self):
+        tenant = Tenant('secret-token', '42')
+        assert 'secret-token' not in tenant.key
+        assert tenant.key.startswith('42:')
+
+    def test_run_follows_adaptive_schedule(self):
+        from homework_bot.scheduler import (
+            IDLE, REVIEWING, AdaptivePolicy, AdaptiveScheduler
+        )
+        reviewing = Tenant('reviewing', '1')
+        idle = Tenant('idle', '2')
+        polls = {reviewing: 0, idle: 0}
+
+        async def poll(tenant):
+            polls[tenant] += 1
+            return REVIEWING if tenant is reviewing else IDLE
+
+        policy = AdaptivePolicy(
+            interval=0.05, reviewing_interval=0.01, jitter=0
+        )
+        engine = PollingEngine(
+            [reviewing, idle], poll, scheduler=AdaptiveScheduler(policy)
+        )
+
+        async def run_briefly():
+            try:
+                await asyncio.wait_for(engine.run(), 0.2)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run_briefly())
+        assert polls[reviewing] > 2 * polls[idle] > 0, (
+            'Проверьте, что работы на проверке опрашиваются чаще'
+        )
+
+    def test_quota_postpones_polls(self):
+        from homework_bot.quota import RequestQuota
+        from homework_bot.scheduler import AdaptivePolicy, AdaptiveScheduler
+        tenant = Tenant('token', '1')
+        polls = []
+
+        async def poll(tenant):
+            polls.append(tenant)
+            return 'idle'
+
+        policy = AdaptivePolicy(interval=0.01, jitter=0, backoff=1)
+        quota = RequestQuota(global_rate=100, token_rate=10, token_burst=1)
+        engine = PollingEngine(
+            [tenant], poll, scheduler=AdaptiveScheduler(policy), quota=quota
+        )
+
+        async def run_briefly():
+            try:
+                await asyncio.wait_for(engine.run(), 0.3)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run_briefly())
+        assert 0 < len(polls) <= 4, (
+            'Проверьте, что опросы не превышают бюджет запросов токена'
+        )
+
+    def test_poll_now_skips_tenant_in_flight(self):
+        tenant = Tenant('token', '1')
+        release = []
+
+        async def poll(tenant):
+            while not release:
+                await asyncio.sleep(0)
+            return 'idle'
+
+        engine = PollingEngine([tenant], poll)
+
+        async def main():
+            first = asyncio.ensure_future(engine.poll_now(tenant.key))
+            await asyncio.sleep(0)
+            assert await engine.poll_now(tenant.key) is None, (
+                'Проверьте, что клиент не опрашивается дважды одновременно'
+            )
+            release.append(True)
+            return await first
+
+        assert asyncio.run(main()) == 'idle'
+        assert asyncio.run(engine.poll_now('unknown')) is None
+
+    def test_run_keeps_default_executor(self):
+        async def poll(tenant):
+            return 'idle'
+
+        engine = PollingEngine([Tenant('token', '1')], poll)
+
+        def replace(executor):
+            raise AssertionError(
+                'Проверьте, что движок не подменяет пул потоков по умолчанию'
+            )
+
+        async def main():
+            asyncio.get_running_loop().set_default_executor = replace
+            for _ in range(2):
+                try:
+                    await asyncio.wait_for(engine.run(), 0.01)
+                except asyncio.TimeoutError:
+                    pass
+
+        asyncio.run(main())
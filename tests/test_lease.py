@@ -0,0 +1,160 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import homework
+from homework_bot.clock import SystemClock, VirtualClock
+from homework_bot.engine import Tenant
+from homework_bot.lease import Lease
+from homework_bot.storage import StateStore, TenantState
+from utils import FakeClock, MockBot, MockResponse
+
+
+class TestLease:
+
+    def test_only_one_holder(self, tmp_path):
+        clock = FakeClock(1000)
+        path = str(tmp_path / 'db')
+        first = Lease(path, 'leader', 'a', ttl=10, clock=clock)
+        second = Lease(path, 'leader', 'b', ttl=10, clock=clock)
+        assert first.try_acquire()
+        assert not second.try_acquire(), (
+            'Проверьте, что аренду не может взять второй процесс'
+        )
+        clock.now += 5
+        assert first.try_acquire(), 'Проверьте продление аренды'
+        clock.now += 7
+        assert not second.try_acquire()
+        assert first.held()
+
+    def test_takeover_after_expiry(self, tmp_path):
+        clock = FakeClock(1000)
+        path = str(tmp_path / 'db')
+        first = Lease(path, 'leader', 'a', ttl=10, clock=clock)
+        second = Lease(path, 'leader', 'b', ttl=10, clock=clock)
+        first.try_acquire()
+        clock.now += 8
+        assert not first.held(), (
+            'Проверьте, что ведущий перестаёт считать себя ведущим '
+            'раньше, чем аренду сможет взять другой процесс'
+        )
+        assert not second.try_acquire()
+        clock.now += 2
+        assert second.try_acquire()
+        assert not first.try_acquire()
+
+    def test_release(self, tmp_path):
+        path = str(tmp_path / 'db')
+        first = Lease(path, 'leader', 'a')
+        second = Lease(path, 'leader', 'b')
+        first.try_acquire()
+        first.release()
+        assert not first.held()
+        assert second.try_acquire()
+
+    def test_renewal_does_not_wait_for_default_executor(self, tmp_path):
+        lease = Lease(str(tmp_path / 'db'), 'leader', 'a')
+        blocker = threading.Event()
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(1))
+            busy = loop.run_in_executor(None, blocker.wait)
+            try:
+                await asyncio.wait_for(lease.acquire(1), 5)
+            finally:
+                blocker.set()
+                await busy
+
+        asyncio.run(run())
+        assert lease.held(), (
+            'Проверьте, что аренда продлевается, даже когда пул потоков '
+            'по умолчанию занят'
+        )
+        lease.close()
+
+
+class TestFence:
+
+    def test_flush_is_dropped_when_fenced(self, tmp_path):
+        path = str(tmp_path / 'db')
+        leading = [True]
+        store = StateStore(path, fence=lambda: leading[0])
+        store.checkpoint('t', TenantState(1))
+        store.flush()
+        leading[0] = False
+        store.checkpoint('t', TenantState(2))
+        store.flush()
+        assert store.load()['t'].current_timestamp == 1, (
+            'Проверьте, что процесс, потерявший аренду, не пишет состояние'
+        )
+        assert not store.has_queued()
+        store.close()
+
+
+class TestReplicas:
+
+    def test_standby_takes_over_without_duplicates(self, monkeypatch,
+                                                   tmp_path):
+        clock = VirtualClock()
+        statuses = {0: 'reviewing', 100: 'rejected', 1000: 'approved'}
+
+        def get(*args, **kwargs):
+            stage = max(
+                moment for moment in statuses if moment <= clock.monotonic()
+            )
+            return MockResponse({
+                'homeworks': [{
+                    'id': 1, 'homework_name': 'hw',
+                    'status': statuses[stage], 'date_updated': stage,
+                }],
+                'current_date': 1,
+            })
+
+        monkeypatch.setattr(requests, 'get', get)
+        monkeypatch.setattr(homework, 'STATE_DB', str(tmp_path / 'db'))
+        monkeypatch.setattr(homework, 'TELEGRAM_COMMANDS', False)
+        homework.set_clock(clock)
+        tenants = [Tenant('token', '1')]
+        bots = {'a': MockBot(), 'b': MockBot()}
+        stores = {
+            name: StateStore(homework.STATE_DB, clock=clock.time)
+            for name in bots
+        }
+
+        async def replica(name):
+            await homework.run_leader(
+                bots[name], tenants, stores[name], holder=name
+            )
+
+        async def simulate():
+            first = asyncio.create_task(replica('a'))
+            await asyncio.sleep(1)
+            second = asyncio.create_task(replica('b'))
+            await asyncio.sleep(150)
+            first.cancel()
+            await asyncio.sleep(2000)
+            second.cancel()
+            await asyncio.gather(first, second, return_exceptions=True)
+
+        try:
+            clock.run(simulate())
+        finally:
+            homework.set_clock(SystemClock())
+            for store in stores.values():
+                store.close()
+        assert len(bots['a'].messages) == 2
+        assert len(bots['b'].messages) == 1, (
+            'Проверьте, что резервный процесс продолжает работу ведущего '
+            'и не повторяет его сообщения'
+        )
+        assert 'у ревьюера есть замечания' in bots['a'].messages[1]
+        assert 'ревьюеру всё понравилось' in bots['b'].messages[0]
+
+
+@pytest.fixture(autouse=True)
+def no_commands(monkeypatch):
+    monkeypatch.setattr(homework, 'TELEGRAM_COMMANDS', False)
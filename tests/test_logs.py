@@ -0,0 +1,67 @@
+import gzip
+import json
+import logging
+import os
+import threading
+
+import pytest
+
+from homework_bot import logs
+
+
+@pytest.fixture
+def restore_logging():
+    level = logging.getLogger().level
+    yield
+    logs.shutdown()
+    logging.getLogger().setLevel(level)
+
+
+class TestLogs:
+
+    def test_json_formatter(self):
+        record = logging.LogRecord(
+            'bot', logging.ERROR, __file__, 1, 'Сбой %s', ('API',), None
+        )
+        data = json.loads(logs.JsonFormatter().format(record))
+        assert data['message'] == 'Сбой API'
+        assert data['level'] == 'ERROR'
+        assert data['logger'] == 'bot'
+
+    def test_rotated_files_are_compressed(self, tmp_path):
+        path = str(tmp_path / 'bot.log')
+        handler = logs.file_handler(path, max_bytes=100, backup_count=2)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        for number in range(10):
+            handler.emit(logging.LogRecord(
+                'bot', logging.INFO, __file__, 1, 'x' * 40 + str(number),
+                (), None
+            ))
+        handler.close()
+        for thread in threading.enumerate():
+            if thread.name == 'log-compress':
+                thread.join(10)
+        assert not any(
+            name.endswith('.tmp') for name in os.listdir(tmp_path)
+        ), 'Проверьте, что ротированные файлы сжимаются'
+        with gzip.open(path + '.1.gz', 'rt') as packed:
+            assert 'x' * 40 in packed.read()
+        assert not os.path.exists(path + '.3.gz')
+
+    def test_records_written_by_background_thread(self, tmp_path,
+                                                  restore_logging):
+        path = str(tmp_path / 'bot.log')
+        logs.setup_logging(path, json_format=True)
+        root = logging.getLogger()
+        assert not any(
+            getattr(handler, 'baseFilename', None) == path
+            for handler in root.handlers
+        ), 'Проверьте, что корневой логгер не пишет в файл напрямую'
+        assert any(
+            isinstance(handler, logging.handlers.QueueHandler)
+            for handler in root.handlers
+        )
+        logging.getLogger('bot').debug('отладка')
+        logs.shutdown()
+        with open(path, encoding='utf-8') as file:
+            assert json.loads(file.readline())['message'] == 'отладка'
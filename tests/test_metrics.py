@@ -0,0 +1,69 @@
+import urllib.request
+
+import pytest
+
+from homework_bot import metrics
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+class TestMetrics:
+
+    def test_counter(self, registry):
+        counter = metrics.Counter(
+            'errors_total', 'Errors', ['error'], registry=registry
+        )
+        counter.inc(error='KeyError')
+        counter.inc(2, error='KeyError')
+        assert counter.value(error='KeyError') == 3
+        assert 'errors_total{error="KeyError"} 3' in registry.render()
+
+    def test_labels_are_checked(self, registry):
+        counter = metrics.Counter('c', 'C', ['a'], registry=registry)
+        with pytest.raises(ValueError):
+            counter.inc(b='1')
+
+    def test_gauge_function(self, registry):
+        gauge = metrics.Gauge('depth', 'Depth', ['queue'], registry=registry)
+        items = [1, 2]
+        gauge.set_function(lambda: len(items), queue='fetch')
+        items.append(3)
+        assert 'depth{queue="fetch"} 3' in registry.render()
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        histogram = metrics.Histogram(
+            'latency', 'Latency', buckets=(0.1, 1), registry=registry
+        )
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        text = registry.render()
+        assert 'latency_bucket{le="0.1"} 1' in text
+        assert 'latency_bucket{le="1"} 2' in text
+        assert 'latency_bucket{le="+Inf"} 3' in text
+        assert 'latency_count 3' in text
+        assert '# TYPE latency histogram' in text
+
+    def test_histogram_time_observes_on_error(self, registry):
+        histogram = metrics.Histogram('duration', 'D', registry=registry)
+        with pytest.raises(RuntimeError):
+            with histogram.time():
+                raise RuntimeError
+        assert histogram.count() == 1
+
+    def test_duplicate_name(self, registry):
+        metrics.Counter('dup', 'Dup', registry=registry)
+        with pytest.raises(ValueError):
+            metrics.Counter('dup', 'Dup', registry=registry)
+
+    def test_http_endpoint(self, registry):
+        metrics.Counter('served_total', 'Served', registry=registry).inc()
+        server = metrics.start_http_server(0, registry=registry)
+        url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+        server.shutdown()
+        server.server_close()
+        assert 'served_total 1' in body
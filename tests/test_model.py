@@ -0,0 +1,73 @@
+import hashlib
+
+import pytest
+
+import homework
+from homework_bot.engine import Tenant
+from homework_bot.model import (
+    Homework, HomeworkStatus, parse_response
+)
+
+
+class TestParseResponse:
+
+    def test_records(self):
+        homeworks = parse_response({'homeworks': [
+            {'id': 7, 'homework_name': 'hw', 'status': 'approved',
+             'date_updated': '2022-01-01T00:00:00Z', 'lesson_name': 'x'},
+            {'homework_name': 'old', 'status': 'reviewing'},
+        ]})
+        assert homeworks == [
+            Homework('7', 'hw', HomeworkStatus.APPROVED,
+                     '2022-01-01T00:00:00Z'),
+            Homework('old', 'old', HomeworkStatus.REVIEWING),
+        ]
+        assert homeworks[0].status == 'approved', (
+            'Проверьте, что статус сравнивается со строкой из API'
+        )
+        assert not hasattr(homeworks[0], '__dict__'), (
+            'Проверьте, что Homework хранит поля в __slots__'
+        )
+
+    def test_keys_are_interned(self):
+        name = ''.join(['h', 'w'])
+        first, = parse_response({'homeworks': [
+            {'homework_name': name, 'status': 'approved'}
+        ]})
+        second, = parse_response({'homeworks': [
+            {'homework_name': ''.join(['h', 'w']), 'status': 'rejected'}
+        ]})
+        assert first.key is second.key
+
+    @pytest.mark.parametrize('response, error', [
+        ({}, KeyError),
+        ({'homeworks': {}}, TypeError),
+        ([], TypeError),
+        ({'homeworks': ['hw']}, TypeError),
+        ({'homeworks': [{'status': 'approved'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw', 'status': '?'}]}, KeyError),
+    ])
+    def test_invalid_answers(self, response, error):
+        with pytest.raises(error):
+            parse_response(response)
+
+
+class TestMessages:
+
+    def test_parse_status_accepts_records(self):
+        record = Homework('1', 'hw', HomeworkStatus.REJECTED)
+        assert homework.parse_status(record) == homework.parse_status(
+            {'id': 1, 'homework_name': 'hw', 'status': 'rejected'}
+        )
+
+    def test_notification_key_is_stable(self):
+        tenant = Tenant('token', '1')
+        record = Homework.from_dict({
+            'id': 5, 'homework_name': 'hw', 'status': 'approved',
+            'date_updated': '2022-01-01T00:00:00Z',
+        })
+        event = f'{tenant.key}:5:approved:2022-01-01T00:00:00Z'
+        assert homework.notification_key(tenant, record) == (
+            hashlib.sha1(event.encode()).hexdigest()
+        ), 'Проверьте, что ключи уведомлений не изменились'
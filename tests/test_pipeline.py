@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from homework_bot.pipeline import Pipeline, Stage
+
+
+def run_pipeline(pipeline, items):
+    async def run():
+        workers = asyncio.create_task(pipeline.run())
+        for item in items:
+            await pipeline.put(item)
+        await asyncio.wait_for(pipeline.join(), 5)
+        workers.cancel()
+
+    asyncio.run(run())
+
+
+class TestPipeline:
+
+    def test_items_pass_all_stages(self):
+        results = []
+        pipeline = Pipeline([
+            Stage('double', lambda x: x * 2, workers=2),
+            Stage('skip odd', lambda x: x if x % 4 == 0 else None),
+            Stage('collect', results.append),
+        ])
+        run_pipeline(pipeline, range(6))
+        assert sorted(results) == [0, 4, 8]
+        stats = pipeline.stats()
+        assert stats['double']['processed'] == 6
+        assert stats['collect']['processed'] == 3
+
+    def test_errors_go_to_handler(self):
+        errors = []
+
+        def fail_on_two(x):
+            if x == 2:
+                raise ValueError('two')
+            return x
+
+        pipeline = Pipeline(
+            [Stage('check', fail_on_two)],
+            on_error=lambda item, error: errors.append((item, str(error))),
+        )
+        run_pipeline(pipeline, [1, 2, 3])
+        assert errors == [(2, 'two')]
+        assert pipeline.stats()['check']['failed'] == 1
+
+    def test_blocking_stage_runs_in_executor(self):
+        results = []
+        # passes only once all four handlers run at the same time
+        barrier = threading.Barrier(4, timeout=5)
+
+        def wait_for_others(x):
+            barrier.wait()
+            return x
+
+        pipeline = Pipeline([
+            Stage('slow', wait_for_others, workers=4, blocking=True),
+            Stage('collect', results.append),
+        ])
+        run_pipeline(pipeline, range(4))
+        assert pipeline.stats()['slow']['failed'] == 0, (
+            'Проверьте, что блокирующие этапы выполняются параллельно'
+        )
+        assert sorted(results) == [0, 1, 2, 3]
+
+    def test_blocking_stage_uses_its_executor(self):
+        threads = []
+        executor = ThreadPoolExecutor(1, thread_name_prefix='fetch')
+        pipeline = Pipeline([
+            Stage('fetch', lambda x: threads.append(
+                threading.current_thread().name
+            ), blocking=True, executor=executor),
+        ])
+        run_pipeline(pipeline, [1])
+        executor.shutdown()
+        assert threads[0].startswith('fetch'), (
+            'Проверьте, что этап выполняется в своем пуле потоков'
+        )
+
+    def test_full_queue_applies_backpressure(self):
+        pipeline = Pipeline([Stage('stuck', lambda x: x, maxsize=2)])
+
+        async def run():
+            await pipeline.put(1)
+            await pipeline.put(2)
+            try:
+                await asyncio.wait_for(pipeline.put(3), 0.05)
+            except asyncio.TimeoutError:
+                return True
+            return False
+
+        assert asyncio.run(run()), (
+            'Проверьте, что переполненная очередь этапа '
+            'задерживает предыдущий этап'
+        )
@@ -0,0 +1,223 @@
+import asyncio
+from functools import partial
+
+import pytest
+import requests
+
+import homework
+from homework_bot.alerts import AlertThrottle
+from homework_bot.breaker import OPEN, CircuitBreaker
+from homework_bot.engine import Tenant
+from homework_bot.quota import RequestQuota
+from homework_bot.scheduler import CHANGED, ERROR, IDLE, REVIEWING
+from homework_bot.storage import TenantState
+from utils import MockDelivery, MockResponse
+
+
+@pytest.fixture(autouse=True)
+def fresh_alert_throttle(monkeypatch):
+    monkeypatch.setattr(homework, 'alert_throttle', AlertThrottle())
+    monkeypatch.setattr(homework, 'api_quota', RequestQuota())
+
+
+def poll(monkeypatch, data, state):
+    monkeypatch.setattr(
+        requests, 'get', lambda *args, **kwargs: MockResponse(data)
+    )
+    delivery = MockDelivery()
+    outcome = asyncio.run(
+        homework.poll_tenant(delivery, Tenant('token', '1'), state)
+    )
+    return outcome, [text for _, text in delivery.messages]
+
+
+class TestPollTenant:
+
+    def test_every_transition_is_notified_once(self, monkeypatch):
+        data = {
+            'homeworks': [
+                {'id': 2, 'homework_name': 'hw2', 'status': 'approved'},
+                {'id': 1, 'homework_name': 'hw1', 'status': 'rejected'},
+            ],
+            'current_date': 100,
+        }
+        state = TenantState(1, None, {'2': 'reviewing'})
+        outcome, messages = poll(monkeypatch, data, state)
+        assert outcome == CHANGED
+        assert len(messages) == 2
+        assert '"hw1"' in messages[0] and '"hw2"' in messages[1]
+        assert state.statuses == {'1': 'rejected', '2': 'approved'}
+        assert state.current_timestamp == 100
+
+        outcome, messages = poll(monkeypatch, data, state)
+        assert messages == [], (
+            'Проверьте, что без смены статуса сообщения не отправляются'
+        )
+        assert outcome == IDLE
+
+    def test_returning_status_gets_new_key(self):
+        state = TenantState(1)
+        keys = []
+        for status in ('approved', 'rejected', 'approved'):
+            job = homework.PollJob(Tenant('token', '1'), state, response={
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'hw1', 'status': status}
+                ],
+                'current_date': 100,
+            })
+            homework.render_messages(homework.validate_homeworks(job))
+            keys.extend(notification.key for notification in job.notifications)
+        assert len(keys) == len(set(keys)) == 3, (
+            'Проверьте, что возврат к прежнему статусу без date_updated '
+            'не повторяет ключ первого уведомления'
+        )
+        assert state.transitions == {'1': 3}
+
+    def test_overlapping_window(self, monkeypatch):
+        requested = []
+        data = {
+            'homeworks': [{
+                'id': 1, 'homework_name': 'hw1', 'status': 'reviewing',
+                'date_updated': '2022-01-01T10:00:00Z',
+            }],
+            'current_date': 1000,
+        }
+
+        def get(url, params=None, **kwargs):
+            requested.append(params['from_date'])
+            return MockResponse(data)
+
+        monkeypatch.setattr(requests, 'get', get)
+        state = TenantState(500)
+        delivery = MockDelivery()
+        for _ in range(2):
+            asyncio.run(homework.poll_tenant(
+                delivery, Tenant('token', '1'), state
+            ))
+        assert requested == [
+            500 - homework.CURSOR_OVERLAP, 1000 - homework.CURSOR_OVERLAP
+        ]
+        assert len(delivery.messages) == 1, (
+            'Проверьте, что работы из перекрытия окон не отправляются '
+            'повторно'
+        )
+
+        data['homeworks'][0]['date_updated'] = '2022-01-01T11:00:00Z'
+        asyncio.run(homework.poll_tenant(
+            delivery, Tenant('token', '1'), state
+        ))
+        assert len(delivery.messages) == 2, (
+            'Проверьте, что возврат в прежний статус между опросами '
+            'отправляется'
+        )
+
+    def test_empty_response_is_silent(self, monkeypatch):
+        data = {'homeworks': [], 'current_date': 100}
+        outcome, messages = poll(monkeypatch, data, TenantState(1))
+        assert outcome == IDLE
+        assert messages == []
+
+    def test_reviewing_outcome(self, monkeypatch):
+        data = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'},
+            ],
+            'current_date': 100,
+        }
+        outcome, _ = poll(monkeypatch, data, TenantState(1))
+        assert outcome == REVIEWING
+
+    def test_error_does_not_advance_state(self, monkeypatch):
+        data = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+                {'id': 2, 'homework_name': 'hw2', 'status': 'unknown'},
+            ],
+            'current_date': 100,
+        }
+        state = TenantState(1)
+        outcome, messages = poll(monkeypatch, data, state)
+        assert outcome == ERROR
+        assert state.statuses == {}
+        assert state.current_timestamp == 1
+        assert messages[0].startswith('Сбой в работе программы')
+
+    def test_alternating_errors_are_not_repeated(self, monkeypatch):
+        state = TenantState(1)
+        bad_status = {
+            'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': '?'}],
+            'current_date': 100,
+        }
+        no_homeworks = {'current_date': 100}
+        sent = []
+        for data in (bad_status, no_homeworks, bad_status, no_homeworks):
+            sent.extend(poll(monkeypatch, data, state)[1])
+        assert len(sent) == 2, (
+            'Проверьте, что оповещение об одной и той же ошибке '
+            'не отправляется повторно'
+        )
+
+    def test_outage_is_reported_once(self, monkeypatch):
+        def refuse(*args, **kwargs):
+            raise requests.ConnectionError('Connection refused')
+
+        delivery = MockDelivery()
+        circuit = CircuitBreaker('api', failure_threshold=5)
+        circuit.on_change = partial(homework.report_outage, delivery)
+        monkeypatch.setattr(homework, 'api_breaker', lambda: circuit)
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 'operator')
+        monkeypatch.setattr(requests, 'get', refuse)
+
+        async def run():
+            return await asyncio.gather(*(
+                homework.poll_tenant(
+                    delivery, Tenant(f'token{number}', str(number)),
+                    TenantState(1)
+                )
+                for number in range(50)
+            ))
+
+        assert set(asyncio.run(run())) == {ERROR}
+        assert circuit.state == OPEN
+        assert [chat_id for chat_id, _ in delivery.messages] == [
+            'operator'
+        ], (
+            'Проверьте, что о недоступности API сообщается один раз '
+            'оператору, а не каждому клиенту'
+        )
+
+    def test_rate_limit_blocks_token_silently(self, monkeypatch):
+        class Throttled:
+            status_code = 429
+            headers = {'Retry-After': '120'}
+
+        monkeypatch.setattr(
+            requests, 'get', lambda *args, **kwargs: Throttled()
+        )
+        delivery = MockDelivery()
+        state = TenantState(1)
+        outcome = asyncio.run(
+            homework.poll_tenant(delivery, Tenant('token', '1'), state)
+        )
+        assert outcome == ERROR
+        assert delivery.messages == [], (
+            'Проверьте, что об ограничении частоты запросов '
+            'клиенту не сообщается'
+        )
+        assert homework.api_quota.blocked_for('token') == pytest.approx(
+            120, abs=1
+        )
+        assert state.current_timestamp == 1
+
+    def test_zero_timestamp_is_requested(self, monkeypatch):
+        requested = []
+
+        def get(url, params=None, **kwargs):
+            requested.append(params['from_date'])
+            return MockResponse({'homeworks': [], 'current_date': 100})
+
+        monkeypatch.setattr(requests, 'get', get)
+        homework.get_api_answer(0)
+        assert requested == [0], (
+            'Проверьте, что from_date=0 не заменяется текущим временем'
+        )
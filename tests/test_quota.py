@@ -0,0 +1,78 @@
+import pytest
+
+from homework_bot.quota import RequestQuota, parse_retry_after
+from utils import FakeClock
+
+
+class TestParseRetryAfter:
+
+    @pytest.mark.parametrize('value, expected', [
+        ('120', 120),
+        (' 5 ', 5),
+        (None, 60),
+        ('', 60),
+        ('soon', 60),
+    ])
+    def test_seconds_and_fallback(self, value, expected):
+        assert parse_retry_after(value, default=60) == expected
+
+    def test_http_date(self):
+        value = 'Wed, 21 Oct 2015 07:28:30 GMT'
+        now = 1445412480  # 07:28:00 того же дня
+        assert parse_retry_after(value, now=lambda: now) == 30
+
+    def test_date_in_the_past(self):
+        value = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        assert parse_retry_after(value, now=lambda: 1445412600) == 0
+
+
+class TestRequestQuota:
+
+    def test_token_budget(self):
+        clock = FakeClock()
+        quota = RequestQuota(
+            global_rate=100, token_rate=0.5, token_burst=2, clock=clock
+        )
+        assert quota.try_acquire('a') == 0
+        assert quota.try_acquire('a') == 0
+        assert quota.try_acquire('a') == pytest.approx(2), (
+            'Проверьте, что токен не превышает свой бюджет запросов'
+        )
+        assert quota.try_acquire('b') == 0, (
+            'Проверьте, что бюджеты токенов независимы'
+        )
+        clock.now = 2
+        assert quota.try_acquire('a') == 0
+
+    def test_global_budget(self):
+        clock = FakeClock()
+        quota = RequestQuota(global_rate=2, token_rate=10, clock=clock)
+        assert quota.try_acquire('a') == 0
+        assert quota.try_acquire('b') == 0
+        assert quota.try_acquire('c') == pytest.approx(0.5), (
+            'Проверьте, что общий бюджет ограничивает все токены'
+        )
+
+    def test_denied_token_does_not_spend_global_budget(self):
+        clock = FakeClock()
+        quota = RequestQuota(
+            global_rate=2, token_rate=0.1, token_burst=1, clock=clock
+        )
+        assert quota.try_acquire('a') == 0
+        assert quota.try_acquire('a') > 0
+        assert quota.try_acquire('b') == 0
+
+    def test_retry_after_blocks_token(self):
+        clock = FakeClock()
+        quota = RequestQuota(clock=clock)
+        quota.throttle('a', 30)
+        assert quota.blocked_for('a') == 30
+        assert quota.try_acquire('a') == 30
+        assert quota.blocked_for('b') == 0
+        quota.throttle('a', 10)
+        assert quota.blocked_for('a') == 30, (
+            'Проверьте, что более короткий Retry-After не сокращает паузу'
+        )
+        clock.now = 30
+        assert quota.blocked_for('a') == 0
+        assert quota.try_acquire('a') == 0
@@ -0,0 +1,92 @@
+import homework
+from homework_bot.delivery import DIGEST_HEADER
+from homework_bot.recording import Recorder, Transcript, read_events
+
+
+def record(path, events):
+    recorder = Recorder(str(path), clock=iter(range(1000)).__next__)
+    for kind, args in events:
+        getattr(recorder, kind)(*args)
+    recorder.close()
+
+
+HOMEWORK = {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+APPROVED = ('Изменился статус проверки работы "hw1". '
+            'Работа проверена: ревьюеру всё понравилось. Ура!')
+
+
+class TestRecorder:
+
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / 'log.jsonl'
+        record(path, [
+            ('api', ('t', 1, 10, {'homeworks': [], 'current_date': 11})),
+            ('api', ('t', 1, 11, None, ValueError('bad json'))),
+            ('send', (1, 'привет')),
+        ])
+        events = list(read_events(str(path)))
+        assert [event['kind'] for event in events] == ['api', 'api', 'send']
+        assert events[0]['response']['current_date'] == 11
+        assert events[1]['error_type'] == 'ValueError'
+        assert 'response' not in events[1]
+        assert events[2] == {
+            'kind': 'send', 'chat_id': '1', 'text': 'привет', 'time': 2
+        }
+
+    def test_truncated_last_line_is_skipped(self, tmp_path):
+        path = tmp_path / 'log.jsonl'
+        record(path, [('send', (1, 'a'))])
+        with open(path, 'a', encoding='utf-8') as log:
+            log.write('{"kind": "se')
+        assert len(list(read_events(str(path)))) == 1
+
+    def test_transcript_joins_like_delivery(self):
+        transcript = Transcript()
+        transcript.put(1, 'a')
+        transcript.put('1', 'b')
+        assert transcript.text(1) == 'a\n\nb'
+        assert len(transcript) == 2
+
+    def test_transcript_drops_digest_header(self):
+        transcript = Transcript()
+        transcript.put(1, f'{DIGEST_HEADER.format(count=2)}\n\na\n\nb')
+        assert transcript.text(1) == 'a\n\nb', (
+            'Проверьте, что сводка сравнивается без заголовка'
+        )
+
+
+class TestReplay:
+
+    def test_matching_log(self, tmp_path):
+        path = tmp_path / 'log.jsonl'
+        record(path, [
+            ('api', ('t', 1, 0, {'homeworks': [HOMEWORK], 'current_date': 5})),
+            ('api', ('t', 1, 5, {'homeworks': [HOMEWORK], 'current_date': 6})),
+            ('api', ('t', 1, 6, None, Exception('timeout'))),
+            ('send', (1, APPROVED)),
+            ('send', (1, 'Сбой в работе программы: timeout')),
+        ])
+        report = homework.replay(str(path))
+        assert report['polls'] == 3
+        assert report['messages'] == 2
+        assert report['mismatched_chats'] == [], (
+            'Проверьте, что воспроизведение даёт те же сообщения, '
+            'что были записаны'
+        )
+
+    def test_mismatch_is_reported(self, tmp_path):
+        path = tmp_path / 'log.jsonl'
+        record(path, [
+            ('api', ('t', 1, 0, {'homeworks': [HOMEWORK], 'current_date': 5})),
+            ('send', (1, 'другой текст')),
+        ])
+        assert homework.replay(str(path))['mismatched_chats'] == ['1']
+
+    def test_repeated_alerts_follow_recorded_time(self, tmp_path):
+        path = tmp_path / 'log.jsonl'
+        error = ('api', ('t', 1, 0, None, Exception('timeout')))
+        record(path, [error] * 3)
+        assert homework.replay(str(path))['messages'] == 1, (
+            'Проверьте, что при воспроизведении оповещения о той же ошибке '
+            'подавляются так же, как при записи'
+        )
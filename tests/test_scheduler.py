@@ -0,0 +1,85 @@
+import pytest
+
+from homework_bot.scheduler import (
+    CHANGED, ERROR, IDLE, REVIEWING, AdaptivePolicy, AdaptiveScheduler,
+    TimerHeap
+)
+from utils import FakeClock
+
+
+class TestAdaptivePolicy:
+
+    def test_reviewing_polls_faster(self):
+        policy = AdaptivePolicy(interval=600, reviewing_interval=60, jitter=0)
+        assert policy.delay(REVIEWING) < policy.delay(CHANGED)
+
+    def test_idle_backs_off_up_to_max(self):
+        policy = AdaptivePolicy(interval=600, max_interval=3600, jitter=0)
+        delays = [policy.delay(IDLE, streak) for streak in range(5)]
+        assert delays == [600, 1200, 2400, 3600, 3600]
+
+    def test_error_backs_off(self):
+        policy = AdaptivePolicy(error_interval=10, jitter=0)
+        assert policy.delay(ERROR, 0) == 10
+        assert policy.delay(ERROR, 3) == 80
+
+    @pytest.mark.parametrize('value', [0.0, 0.999])
+    def test_jitter_bounds(self, value):
+        policy = AdaptivePolicy(interval=100, jitter=0.1, rng=lambda: value)
+        assert 90 <= policy.delay(CHANGED) <= 110
+
+
+class TestTimerHeap:
+
+    def test_pop_due_in_deadline_order(self):
+        timers = TimerHeap()
+        timers.push('b', 2)
+        timers.push('a', 1)
+        timers.push('c', 5)
+        assert [key for key, _ in timers.pop_due(3)] == ['a', 'b']
+        assert timers.next_deadline() == 5
+        assert len(timers) == 1
+
+    def test_push_reschedules(self):
+        timers = TimerHeap()
+        timers.push('a', 1)
+        timers.push('a', 10)
+        assert timers.pop_due(5) == []
+        assert timers.pop_due(10) == [('a', 10)]
+
+    def test_discard(self):
+        timers = TimerHeap()
+        timers.push('a', 1)
+        timers.discard('a')
+        assert timers.next_deadline() is None
+        assert 'a' not in timers
+
+
+class TestAdaptiveScheduler:
+
+    def test_streak_resets_on_other_outcome(self):
+        clock = FakeClock()
+        policy = AdaptivePolicy(interval=100, error_interval=10, jitter=0)
+        schedule = AdaptiveScheduler(policy, clock=clock)
+        assert schedule.report('t', IDLE) == 100
+        assert schedule.report('t', IDLE) == 200
+        assert schedule.report('t', ERROR) == 10
+        assert schedule.report('t', IDLE) == 100
+
+    def test_pop_due_uses_clock(self):
+        clock = FakeClock()
+        schedule = AdaptiveScheduler(clock=clock)
+        schedule.add('t', delay=5)
+        assert schedule.pop_due() == []
+        assert schedule.time_to_next() == 5
+        clock.now = 5
+        assert schedule.pop_due() == [('t', 5)]
+
+    def test_min_delay_overrides_policy(self):
+        clock = FakeClock()
+        policy = AdaptivePolicy(error_interval=10, jitter=0)
+        schedule = AdaptiveScheduler(policy, clock=clock)
+        assert schedule.report('t', ERROR, min_delay=120) == 120, (
+            'Проверьте, что Retry-After продлевает паузу до следующего опроса'
+        )
+        assert schedule.report('t', ERROR, min_delay=5) == 20
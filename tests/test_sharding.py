@@ -0,0 +1,190 @@
+import asyncio
+from collections import Counter
+
+from homework_bot.engine import PollingEngine, Tenant
+from homework_bot.sharding import HashRing, ShardCoordinator, WorkerRegistry
+from homework_bot.storage import Notification, StateStore, TenantState
+from utils import FakeClock, MockResponse
+
+
+KEYS = [str(chat_id) for chat_id in range(3000)]
+
+
+class TestHashRing:
+
+    def test_keys_spread_evenly(self):
+        ring = HashRing(['a', 'b', 'c'])
+        shares = Counter(ring.node_for(key) for key in KEYS)
+        assert set(shares) == {'a', 'b', 'c'}
+        assert min(shares.values()) > len(KEYS) / 3 * 0.7
+
+    def test_joining_worker_moves_only_its_share(self):
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+        moved = [
+            key for key in KEYS if before.node_for(key) != after.node_for(key)
+        ]
+        assert all(after.node_for(key) == 'd' for key in moved), (
+            'Проверьте, что при добавлении процесса чаты переходят '
+            'только к нему'
+        )
+        assert len(moved) < len(KEYS) / 4 * 1.3
+
+    def test_same_ring_in_every_process(self):
+        assert HashRing(['b', 'a']).node_for('42') == (
+            HashRing(['a', 'b']).node_for('42')
+        )
+
+    def test_empty_ring(self):
+        assert HashRing([]).node_for('42') is None
+
+
+class TestWorkerRegistry:
+
+    def test_heartbeats_expire(self, tmp_path):
+        clock = FakeClock(1000)
+        registry = WorkerRegistry(str(tmp_path / 'db'), clock=clock)
+        registry.heartbeat('a')
+        clock.now += 10
+        registry.heartbeat('b')
+        assert registry.alive(ttl=15) == ['a', 'b']
+        clock.now += 10
+        assert registry.alive(ttl=15) == ['b']
+        registry.leave('b')
+        assert registry.alive(ttl=15) == []
+
+    def test_commands_go_to_owner(self, tmp_path):
+        registry = WorkerRegistry(str(tmp_path / 'db'))
+        registry.push_command('1', 'status', '')
+        registry.push_command('2', 'check', 'now')
+        assert registry.take_commands(lambda chat_id: chat_id == '2') == [
+            ('2', 'check', 'now')
+        ]
+        assert registry.take_commands(lambda chat_id: True) == [
+            ('1', 'status', '')
+        ]
+        assert registry.take_commands(lambda chat_id: True) == []
+
+
+class TestShardCoordinator:
+
+    def test_workers_split_chats(self, tmp_path):
+        path = str(tmp_path / 'db')
+        clock = FakeClock(1000)
+        owned = {}
+        commands = []
+
+        def coordinator(worker_id):
+            return ShardCoordinator(
+                WorkerRegistry(path, clock=clock), worker_id,
+                on_rebalance=lambda ring: owned.__setitem__(
+                    worker_id, {key for key in KEYS if ring.node_for(key)
+                                == worker_id}
+                ),
+                on_command=lambda *command: commands.append(
+                    (worker_id, command)
+                ),
+            )
+
+        first, second = coordinator('w1'), coordinator('w2')
+
+        async def main():
+            await first.step()
+            assert owned['w1'] == set(KEYS)
+            await second.step()
+            await first.step()
+            assert owned['w1'] | owned['w2'] == set(KEYS)
+            assert not owned['w1'] & owned['w2'], (
+                'Проверьте, что каждый чат опрашивает только один процесс'
+            )
+            chat_id = next(iter(owned['w2']))
+            await first.forward(chat_id, 'status', '')
+            await first.step()
+            await second.step()
+            assert commands == [('w2', (chat_id, 'status', ''))]
+            clock.now += 60
+            await first.step()
+            assert owned['w1'] == set(KEYS), (
+                'Проверьте, что чаты пропавшего процесса переходят к '
+                'оставшимся'
+            )
+
+        asyncio.run(main())
+
+
+class TestRebalanceSupport:
+
+    def test_set_tenants(self):
+        tenants = [Tenant(f'token{i}', str(i)) for i in range(3)]
+        engine = PollingEngine(tenants[:2], None)
+        engine.scheduler.add(tenants[0].key)
+        engine.scheduler.add(tenants[1].key)
+        added = engine.set_tenants(tenants[1:])
+        assert added == [tenants[2]]
+        assert tenants[0].key not in engine.scheduler.timers
+        assert tenants[2].key in engine.scheduler.timers
+
+    def test_store_loads_selected_tenants(self, tmp_path):
+        store = StateStore(str(tmp_path / 'db'))
+        store.checkpoint('a', TenantState(1, None, {'1': 'approved'}))
+        store.checkpoint('b', TenantState(2), notifications=[
+            Notification('k1', '1', 'one'), Notification('k2', '2', 'two')
+        ])
+        store.flush()
+        states = store.load(['a'])
+        assert list(states) == ['a']
+        assert states['a'].statuses == {'1': 'approved'}
+        assert store.load([]) == {}
+        assert [n.key for n in store.pending_notifications({'2'})] == ['k2']
+        store.close()
+
+
+class TestShardedBot:
+
+    def test_worker_polls_its_shard(self, monkeypatch, tmp_path):
+        import requests
+
+        import homework
+        from homework_bot.clock import SystemClock, VirtualClock
+
+        polled = set()
+
+        def get(url, headers, **kwargs):
+            polled.add(headers['Authorization'])
+            return MockResponse({'homeworks': [], 'current_date': 1})
+
+        monkeypatch.setattr(requests, 'get', get)
+        monkeypatch.setattr(homework, 'WORKER_ID', 'w1')
+        monkeypatch.setattr(homework, 'STATE_DB', str(tmp_path / 'db'))
+        monkeypatch.setattr(homework, 'TELEGRAM_COMMANDS', False)
+        clock = VirtualClock()
+        homework.set_clock(clock)
+        other = WorkerRegistry(homework.STATE_DB, clock=clock.time)
+        other.heartbeat('w2')
+        tenants = [Tenant(f'token{i}', str(i)) for i in range(20)]
+        ring = HashRing(['w1', 'w2'])
+        mine = {
+            f'OAuth {tenant.practicum_token}' for tenant in tenants
+            if ring.node_for(tenant.chat_id) == 'w1'
+        }
+        store = StateStore(homework.STATE_DB, clock=clock.time)
+
+        async def simulate():
+            try:
+                await asyncio.wait_for(
+                    homework.run_bot(None, tenants, store), 10
+                )
+            except asyncio.TimeoutError:
+                pass
+
+        try:
+            clock.run(simulate())
+        finally:
+            homework.set_clock(SystemClock())
+            store.close()
+        assert polled == mine, (
+            'Проверьте, что процесс опрашивает только клиентов своей доли'
+        )
+        assert other.alive(ttl=3600) == ['w2'], (
+            'Проверьте, что остановленный процесс покидает реестр'
+        )
@@ -0,0 +1,169 @@
+import sqlite3
+import time
+
+from homework_bot.storage import Notification, StateStore, TenantState
+
+
+class TestStateStore:
+
+    def test_state_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        state = TenantState(
+            123, "('boom',)", {'1': 'reviewing'}, names={'1': 'hw1'},
+            transitions={'1': 2}
+        )
+        store.checkpoint('tenant', state)
+        store.close()
+
+        states = StateStore(path).load()
+        assert states['tenant'] == state, (
+            'Проверьте, что состояние клиента восстанавливается '
+            'после перезапуска'
+        )
+
+    def test_checkpoints_are_batched(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path, batch_size=100)
+        state = TenantState(1)
+        for cursor in range(10):
+            state.current_timestamp = cursor
+            store.checkpoint('tenant', state)
+        assert StateStore(path).load() == {}, (
+            'Проверьте, что состояние пишется на диск пачками'
+        )
+        store.flush()
+        assert StateStore(path).load()['tenant'].current_timestamp == 9
+
+    def test_batch_size_triggers_flush(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path, batch_size=3)
+        for key in 'abc':
+            store.checkpoint(key, TenantState(1))
+        assert len(StateStore(path).load()) == 3
+
+    def test_only_given_homeworks_are_saved(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        state = TenantState(1, None, {'1': 'approved', '2': 'reviewing'})
+        store.checkpoint('tenant', state, homework_keys=['2'])
+        store.flush()
+        assert StateStore(path).load()['tenant'].statuses == {
+            '2': 'reviewing'
+        }
+
+    def test_update_times_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        state = TenantState(1, None, {'1': 'approved', '2': 'reviewing'})
+        state.updated['1'] = '2022-01-01T10:00:00Z'
+        store.checkpoint('tenant', state)
+        store.close()
+        assert StateStore(path).load()['tenant'] == state
+
+    def test_old_database_is_migrated(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.executescript(
+            'CREATE TABLE homework_status (tenant_key TEXT NOT NULL, '
+            'homework_key TEXT NOT NULL, status TEXT NOT NULL, '
+            'PRIMARY KEY (tenant_key, homework_key));'
+            "INSERT INTO homework_status VALUES ('tenant', '1', 'approved');"
+        )
+        connection.close()
+        store = StateStore(path)
+        state = store.load()['tenant']
+        assert state.statuses == {'1': 'approved'}
+        assert state.updated == state.names == {}, (
+            'Проверьте, что старая база без date_updated читается'
+        )
+        state.updated['1'] = '2022-01-01T10:00:00Z'
+        store.checkpoint('tenant', state)
+        store.close()
+        assert StateStore(path).load()['tenant'].updated == state.updated
+
+    def test_wal_mode(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        StateStore(path)
+        mode = sqlite3.connect(path).execute('PRAGMA journal_mode').fetchone()
+        assert mode == ('wal',)
+
+
+class TestOutbox:
+
+    def test_notifications_are_handed_out_after_commit(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        notification = Notification('key', '1', 'text')
+        store.checkpoint('tenant', TenantState(1), notifications=[
+            notification
+        ])
+        assert store.take_committed() == [], (
+            'Проверьте, что уведомление не отправляется до записи на диск'
+        )
+        store.flush()
+        assert store.take_committed() == [notification]
+        assert store.take_committed() == []
+
+    def test_same_key_is_committed_once(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        notification = Notification('key', '1', 'text')
+        store.checkpoint('tenant', TenantState(1), notifications=[
+            notification
+        ])
+        store.flush()
+        store.take_committed()
+        store.checkpoint('tenant', TenantState(1), notifications=[
+            notification
+        ])
+        store.flush()
+        assert store.take_committed() == [], (
+            'Проверьте, что повторное уведомление не отправляется'
+        )
+
+    def test_undelivered_are_pending_after_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        first = Notification('first', '1', 'one')
+        second = Notification('second', '1', 'two')
+        store.checkpoint('tenant', TenantState(1), notifications=[
+            first, second
+        ])
+        store.flush()
+        store.mark_delivered(['first'])
+        store.close()
+        assert StateStore(path).pending_notifications() == [second]
+
+    def test_prune_keeps_pending(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        store.checkpoint('tenant', TenantState(1), notifications=[
+            Notification('sent', '1', 'one'),
+            Notification('pending', '1', 'two'),
+        ])
+        store.flush()
+        store.mark_delivered(['sent'])
+        store.flush()
+        store.prune(older_than=time.time() + 1)
+        rows = store._connection.execute(
+            'SELECT key FROM outbox'
+        ).fetchall()
+        assert rows == [('pending',)]
+
+    def test_dead_letters_are_not_pending(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        store.checkpoint('tenant', TenantState(1), notifications=[
+            Notification('blocked', '1', 'one'),
+            Notification('pending', '1', 'two'),
+        ])
+        store.flush()
+        store.mark_failed(['blocked'], 'Forbidden: bot was blocked')
+        store.flush()
+        assert [n.key for n in store.pending_notifications()] == [
+            'pending'
+        ], 'Проверьте, что недоставляемые уведомления не отправляются снова'
+        rows = store._connection.execute(
+            'SELECT key, failed FROM outbox WHERE failed IS NOT NULL'
+        ).fetchall()
+        assert rows == [('blocked', 'Forbidden: bot was blocked')], (
+            'Проверьте, что ошибка сохраняется в outbox'
+        )
@@ -37,3 +37,45 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class FakeClock:
+    """Clock standing still at ``now`` until a test moves it."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class MockResponse:
+    """Answer of ``requests.get`` with a JSON body."""
+
+    def __init__(self, data, status_code: int = 200):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+class MockBot:
+    """Telegram bot collecting the texts it is asked to send."""
+
+    def __init__(self, *args, **kwargs):
+        self.messages = []
+
+    def send_message(self, chat_id, text):
+        self.messages.append(text)
+
+
+class MockDelivery:
+    """Delivery queue collecting ``(chat_id, text)`` of queued messages."""
+
+    def __init__(self):
+        self.messages = []
+        self.immediate = []
+
+    def put(self, chat_id, text, key=None, immediate=False):
+        self.messages.append((chat_id, text))
+        self.immediate.append(immediate)